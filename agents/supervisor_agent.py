@@ -56,14 +56,18 @@ class SupervisorAgent:
 2. verify_hypotheses: 仮説検証エージェント - 生成された仮説を証拠に基づいて検証
 
 監査プロセス:
-1. 関連文書とデータを収集（search_all_files, extract_data）
-2. ドメイン知識を参照（lookup_knowledge）
+1. 関連文書とデータを収集（reconcile_transactions, evaluate_audit_rules, query_transactions, find_entities, search_all_files, extract_data）
+2. ドメイン知識を参照（lookup_knowledge。単価は derive_unit_prices の取引別単価表で確認し、相場は check_market_price で数値照合）
 3. 仮説を生成（generate_hypotheses）
 4. 仮説を検証（verify_hypotheses）
 5. 結果を集約してレポートを作成
 
 重要な原則:
 - 各ステップの根拠を明確に記録する
+- reconcile_transactions / evaluate_audit_rules の検出結果は機械的な照合による確定値として扱う
+- 取引IDや金額に言及している文書は、全文検索の前に find_entities で引く
+- check_market_price の判定は市場価格の知識との数値照合の結果として扱う
+- 単価は文書の金額と数量から自分で計算せず、derive_unit_prices の計算結果を使う
 - 専門エージェントの出力を批判的に評価する
 - 信頼度スコアを考慮して判断する
 - 不確実な場合は追加調査を提案する
@@ -77,6 +81,8 @@ class SupervisorAgent:
         knowledge_lookup_fn: Callable[[str, str], str] | None = None,
         extract_data_fn: Callable[[str, str], str] | None = None,
         analyze_data_fn: Callable[[str, str, str], str] | None = None,
+        findings_fn: Callable[[], list[dict[str, Any]]] | None = None,
+        transaction_data_fn: Callable[[], str] | None = None,
     ):
         """
         Initialize the supervisor agent.
@@ -87,6 +93,12 @@ class SupervisorAgent:
             knowledge_lookup_fn: Function to lookup domain knowledge
             extract_data_fn: Function to extract data from documents
             analyze_data_fn: Function to analyze data
+            findings_fn: Function returning pre-computed findings (e.g. the
+                three-way match of the transaction table) that seed the
+                shared context of every task
+            transaction_data_fn: Function returning the transaction data handed
+                to hypothesis generation by default (e.g. only the transactions
+                flagged by the rule engine)
         """
         self.model = model
         self.base_tools = base_tools or []
@@ -99,6 +111,8 @@ class SupervisorAgent:
         self._knowledge_lookup_fn = knowledge_lookup_fn
         self._extract_data_fn = extract_data_fn
         self._analyze_data_fn = analyze_data_fn
+        self._findings_fn = findings_fn
+        self._transaction_data_fn = transaction_data_fn
 
         # Shared context between agents
         self._shared_context: dict[str, Any] = {}
@@ -146,6 +160,9 @@ class SupervisorAgent:
                 "transaction_data": transaction_data
                 or supervisor._shared_context.get("transaction_data", ""),
             }
+            findings = supervisor._shared_context.get("precomputed_findings")
+            if findings:
+                context["previous_findings"] = json.dumps(findings, ensure_ascii=False, indent=2)
 
             result = supervisor.hypothesis_agent.run(task, context)
 
@@ -186,6 +203,9 @@ class SupervisorAgent:
                 "domain_knowledge": domain_knowledge
                 or supervisor._shared_context.get("domain_knowledge", ""),
             }
+            findings = supervisor._shared_context.get("precomputed_findings")
+            if findings:
+                context["precomputed_findings"] = findings
 
             result = supervisor.verifier_agent.run(task, context)
 
@@ -225,8 +245,8 @@ class SupervisorAgent:
             データを分析して結果を返します。
 
             Args:
-                data: 分析対象のデータ
-                analysis_type: 分析タイプ（"compare_values", "validate_sequence", "detect_anomalies", "calculate_variance"）
+                data: 分析対象のデータ（文章、JSON 配列、または取引テーブルを使う "transactions"）
+                analysis_type: 分析タイプ（"compare_values", "validate_sequence", "detect_anomalies", "calculate_variance", "detect_split_orders", "period_end_timing"）
                 parameters: 追加パラメータ（JSON形式）
 
             Returns:
@@ -273,6 +293,7 @@ class SupervisorAgent:
         """
         # Clear shared context for new task
         self._shared_context.clear()
+        self._seed_context()
 
         # Stream through the agent
         final_response = ""
@@ -301,8 +322,16 @@ class SupervisorAgent:
             Events from the agent's execution
         """
         self._shared_context.clear()
+        self._seed_context()
         yield from self._agent.stream({"messages": [{"role": "user", "content": task}]})
 
+    def _seed_context(self) -> None:
+        """Put pre-computed evidence into the shared context of a new task."""
+        if self._findings_fn:
+            self._shared_context["precomputed_findings"] = self._findings_fn()
+        if self._transaction_data_fn:
+            self._shared_context["transaction_data"] = self._transaction_data_fn()
+
     def _build_report(
         self, transaction_id: str, task: str, final_response: str
     ) -> AuditReport:
@@ -347,5 +376,8 @@ class SupervisorAgent:
                     "verifications_completed": len(verifications),
                     "reasoning": self._shared_context.get("verification_reasoning", ""),
                 },
+                "match_engine": {
+                    "findings": len(self._shared_context.get("precomputed_findings", [])),
+                },
             },
         )
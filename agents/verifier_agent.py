@@ -126,6 +126,10 @@ class VerifierAgent(BaseSpecialistAgent):
         if "domain_knowledge" in context:
             prompt_parts.append(f"ドメイン知識:\n{context['domain_knowledge']}\n")
 
+        if "precomputed_findings" in context:
+            findings_str = json.dumps(context["precomputed_findings"], ensure_ascii=False, indent=2)
+            prompt_parts.append(f"機械的な突合で検出済みの不整合（確定値）:\n{findings_str}\n")
+
         if "market_data" in context:
             prompt_parts.append(f"市場データ:\n{context['market_data']}\n")
 
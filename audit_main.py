@@ -9,7 +9,7 @@ Usage:
     python audit_main.py
 
 The system will:
-1. Load input documents into vector stores
+1. Load input documents into the shared vector index
 2. Initialize the domain knowledge base with sample data
 3. Run a supervisor agent that coordinates hypothesis generation and verification
 4. Output an audit report with findings
@@ -18,77 +18,50 @@ The system will:
 from __future__ import annotations
 
 import json
-from pathlib import Path
 
 import dotenv
-from langchain_core.documents import Document
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from agents.supervisor_agent import SupervisorAgent
+from ingestion import FileManifest, IngestOptions, collect_input_files, load_input_files
 from knowledge.knowledge_store import (
     KnowledgeCategory,
     load_sample_knowledge,
     lookup_knowledge,
     register_knowledge,
 )
+from knowledge.market_prices import MarketPriceIndex
+from retrieval.corpus_store import CorpusStore
+from retrieval.embedding_cache import CachedEmbeddings, PersistentEmbeddingCache
+from transactions import load_transaction_table
+from transactions.line_items import market_unit_price
+from transactions.rules import RuleEngine
 from tools import (
-    _FILE_CHUNKS,
     aggregate_results,
     analyze_data,
+    check_market_price,
+    derive_unit_prices,
+    evaluate_audit_rules,
     extract_data,
+    find_entities,
+    get_line_items,
+    get_match_findings,
+    get_query_embedding_stats,
+    get_review_transactions,
+    get_rule_evaluation,
     list_indexed_files,
+    query_transactions,
     read_file,
-    register_vector_store,
+    reconcile_transactions,
+    register_market_prices,
+    register_rule_engine,
+    register_transaction_table,
     search_all_files,
     search_file,
 )
-from utils import _chunk_text, _make_file_id, pretty_print_event
+from utils import pretty_print_event
 
-
-def load_input_files(
-    input_files: list[str], embeddings: OpenAIEmbeddings
-) -> dict[str, list[str]]:
-    """
-    Load input files into vector stores.
-
-    Args:
-        input_files: List of file paths to load
-        embeddings: Embeddings model for vector stores
-
-    Returns:
-        Dict mapping file_id to chunks
-    """
-    used_ids: set[str] = set()
-    file_chunks: dict[str, list[str]] = {}
-
-    for file_str in input_files:
-        path = Path(file_str)
-        if not path.exists():
-            print(f"Warning: File not found: {path}")
-            continue
-
-        text = path.read_text(encoding="utf-8")
-        file_id = _make_file_id(path, used_ids)
-
-        chunks = _chunk_text(text, chunk_size=900, chunk_overlap=150)
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={"file_id": file_id, "path": str(path), "chunk": i},
-            )
-            for i, chunk in enumerate(chunks)
-        ]
-
-        store = InMemoryVectorStore(embeddings)
-        store.add_documents(docs)
-
-        register_vector_store(
-            file_id=file_id, vector_store=store, source_path=str(path), chunks=chunks
-        )
-        file_chunks[file_id] = chunks
-
-    return file_chunks
+TRANSACTION_WORKBOOK = "sample_audit_data/order_invoice_data/order_invoice_data.xlsx"
 
 
 def create_extract_data_fn():
@@ -134,17 +107,31 @@ def main():
 
     # Initialize models
     model = ChatOpenAI(model="gpt-4o-mini")
-    embeddings = OpenAIEmbeddings()
+    # Chunk and knowledge embeddings are cached on disk across runs
+    embedding_cache = PersistentEmbeddingCache(".cache/embeddings.sqlite")
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(), document_cache=embedding_cache)
 
-    # Define input files
+    # Define input files: the text inputs plus the audit evidence bundle
+    # (quotations, purchase orders and acceptance documents as PDF/XLSX/PPTX)
     input_files = [
         f"input_files/input_file_{i}.txt" for i in range(1, 18)
-    ]
+    ] + collect_input_files("sample_audit_data")
 
     # Load input files
     print("\n[1/4] Loading input documents...")
-    file_chunks = load_input_files(input_files, embeddings)
+    # The manifest lets later runs skip unchanged files and re-embed only changed chunks
+    # Chunk text lives in a memory-mapped corpus on disk, shared with other processes
+    # (kept apart from main.py's, whose different input set would evict these files)
+    manifest = FileManifest(".cache/audit/manifest.json")
+    corpus = CorpusStore(".cache/audit/corpus")
+    options = IngestOptions(extraction_cache_dir=".cache/extracted")
+    file_chunks = load_input_files(input_files, embeddings, manifest, options, corpus=corpus)
     print(f"  Loaded {len(file_chunks)} documents")
+    # The order/invoice workbook is also loaded as a columnar table for structured queries
+    transactions = load_transaction_table(TRANSACTION_WORKBOOK)
+    register_transaction_table(transactions)
+    print(f"  Loaded transaction table: {transactions.stats()}")
+    print(f"  Three-way match findings: {len(get_match_findings())}")
 
     # Initialize knowledge base
     print("\n[2/4] Initializing domain knowledge base...")
@@ -153,10 +140,46 @@ def main():
     print(f"  Knowledge base initialized with:")
     for category, count in stats.items():
         print(f"    - {category}: {count} entries")
+    # Market-pricing entries parsed into numeric ranges for check_market_price and AR001
+    market_prices = MarketPriceIndex.from_knowledge(
+        knowledge_store.get_entries(KnowledgeCategory.MARKET_PRICING)
+    )
+    register_market_prices(market_prices)
+    print(f"  Market price ranges: {len(market_prices.ranges)} in {len(market_prices.categories())} categories")
+    # Audit rules and compliance criteria with a registered predicate run over the whole table
+    rule_engine = RuleEngine.from_knowledge(
+        knowledge_store.get_entries(KnowledgeCategory.AUDIT_RULES)
+        + knowledge_store.get_entries(KnowledgeCategory.COMPLIANCE),
+        params={"AR001": {"market_unit_price": market_unit_price(market_prices)}},
+    )
+    register_rule_engine(rule_engine)
+    rule_summary = get_rule_evaluation().summary()
+    print(
+        f"  Rules: {[rule.id for rule in rule_engine.rules]}"
+        f" flagged={rule_summary['flagged']}/{rule_summary['transactions']}"
+        f" skipped={list(rule_summary['skipped'])}"
+    )
+    print(f"  Transactions for review: {len(get_review_transactions())}")
+    line_items = get_line_items()
+    print(
+        f"  Line items: {len(line_items)} in {len(set(line_items.transaction_id.tolist()))} transactions"
+        f" (unit prices derived from 金額 / 数量)"
+    )
 
     # Create the supervisor agent
     print("\n[3/4] Creating supervisor agent...")
-    base_tools = [list_indexed_files, search_all_files, search_file, read_file]
+    base_tools = [
+        list_indexed_files,
+        search_all_files,
+        search_file,
+        read_file,
+        find_entities,
+        query_transactions,
+        reconcile_transactions,
+        evaluate_audit_rules,
+        check_market_price,
+        derive_unit_prices,
+    ]
 
     supervisor = SupervisorAgent(
         model=model,
@@ -164,6 +187,10 @@ def main():
         knowledge_lookup_fn=create_knowledge_lookup_fn(),
         extract_data_fn=create_extract_data_fn(),
         analyze_data_fn=create_analyze_data_fn(),
+        findings_fn=lambda: [f.to_dict() for f in get_match_findings()]
+        + [hit.to_dict() for hit in get_rule_evaluation().hits()],
+        # Only transactions flagged by the match or the rules go to hypothesis generation
+        transaction_data_fn=lambda: json.dumps(get_review_transactions(), ensure_ascii=False),
     )
     print("  Supervisor agent created with specialist agents:")
     print("    - hypothesis_generator: Generates hypotheses about discrepancies")
@@ -176,7 +203,7 @@ def main():
     audit_prompt = """
 以下の監査タスクを実行してください:
 
-1. まず、list_indexed_files で利用可能なドキュメントを確認
+1. まず、list_indexed_files で利用可能なドキュメントを確認し、query_transactions で取引データを確認
 2. search_all_files で「取引」「価格」「セキュリティ」に関連する情報を検索
 3. lookup_knowledge で監査ルールと市場価格情報を参照
 4. generate_hypotheses で潜在的な問題についての仮説を生成
@@ -189,6 +216,16 @@ def main():
     for event in supervisor.stream(audit_prompt):
         pretty_print_event(event)
 
+    cache_stats = get_query_embedding_stats()
+    print(
+        f"\nQuery embedding cache: hits={cache_stats['hits']} misses={cache_stats['misses']}"
+    )
+    doc_cache_stats = embedding_cache.stats()
+    print(
+        f"Document embedding cache: hits={doc_cache_stats['hits']}"
+        f" misses={doc_cache_stats['misses']}"
+    )
+
     print("\n" + "=" * 60)
     print("Audit task completed")
     print("=" * 60)
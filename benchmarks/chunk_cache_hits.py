@@ -0,0 +1,86 @@
+"""
+Benchmark: embedding-cache hit rate of chunkers under small edits.
+
+For every input file a few typical edits are applied (a line inserted at the
+top, a line inserted in the middle, one sentence deleted, one word
+replaced). Both versions are chunked and a chunk of the edited file counts
+as a cache hit when a chunk with identical text existed before the edit,
+i.e. when its embedding would be reused.
+
+Usage:
+    python -m benchmarks.chunk_cache_hits [files...]
+"""
+
+from __future__ import annotations
+
+import glob
+import io
+import sys
+from typing import Callable
+
+from utils import _iter_cdc_chunks, _iter_chunks
+
+Chunker = Callable[[str], list[str]]
+
+
+def _fixed(chunk_size: int, chunk_overlap: int) -> Chunker:
+    return lambda text: [c for *_, c in _iter_chunks(io.StringIO(text), chunk_size, chunk_overlap)]
+
+
+def _content(min_size: int, max_size: int, boundary_bits: int) -> Chunker:
+    return lambda text: [
+        c
+        for *_, c in _iter_cdc_chunks(
+            io.StringIO(text), min_size, max_size, boundary_bits=boundary_bits
+        )
+    ]
+
+
+CHUNKERS: dict[str, Chunker] = {
+    "fixed 900/150": _fixed(900, 150),
+    "content 200-1800 b4": _content(200, 1800, 4),
+    "content 200-1800 b5": _content(200, 1800, 5),
+    "content 200-2000 b6": _content(200, 2000, 6),
+}
+
+
+def _edits(text: str) -> dict[str, str]:
+    middle = text.find("\n", len(text) // 2) + 1
+    sentence_start = text.find("。", len(text) // 3) + 1
+    sentence_end = text.find("。", sentence_start) + 1
+    word_at = len(text) * 2 // 3
+    return {
+        "insert line at top": "【改訂】本文書は改訂されました。\n" + text,
+        "insert line in middle": text[:middle] + "（追記）確認事項を追加しました。\n" + text[middle:],
+        "delete one sentence": text[:sentence_start] + text[sentence_end:],
+        "replace one word": text[:word_at] + "変更" + text[word_at + 2 :],
+    }
+
+
+def run(files: list[str]) -> None:
+    texts = [open(f, encoding="utf-8").read() for f in files]
+    print(f"{len(files)} files, {sum(map(len, texts))} chars\n")
+    header = f"{'chunker':<22}{'avg len':>8}{'chunks':>8}"
+    edit_names = list(_edits("。\n。。"))
+    for name in edit_names:
+        header += f"{name:>24}"
+    print(header)
+
+    for label, chunker in CHUNKERS.items():
+        before = [chunker(t) for t in texts]
+        n_chunks = sum(map(len, before))
+        avg = sum(len(c) for chunks in before for c in chunks) / max(n_chunks, 1)
+        row = f"{label:<22}{avg:>8.0f}{n_chunks:>8}"
+        for name in edit_names:
+            hits = total = 0
+            for text, old in zip(texts, before):
+                old_set = set(old)
+                new = chunker(_edits(text)[name])
+                hits += sum(c in old_set for c in new)
+                total += len(new)
+            row += f"{f'{hits / total:.1%} ({total - hits} new)':>24}"
+        print(row)
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:] or sorted(glob.glob("input_files/*.txt")))
@@ -0,0 +1,90 @@
+"""
+Benchmark: PDF/XLSX/PPTX text extraction throughput.
+
+The extractable files under sample_audit_data are copied ``--scale`` times
+into a temporary directory and extracted with DocumentExtractor with 1, 2,
+4, ... worker processes up to ``--workers`` (the CPU count, at least 2),
+each into an empty cache; a final pass re-runs the largest pool against the
+warm cache.
+
+Usage:
+    python -m benchmarks.extraction_throughput [--scale 20] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from ingestion.extractors import DocumentExtractor, collect_input_files, needs_extraction
+from ingestion.manifest import hash_file
+
+
+def _scaled_copy(root: str, scale: int, target: Path) -> list[Path]:
+    sources = [Path(p) for p in collect_input_files(root) if needs_extraction(p)]
+    copies = []
+    for copy in range(scale):
+        for i, source in enumerate(sources):
+            path = target / f"{copy:03d}_{i:03d}{source.suffix}"
+            shutil.copyfile(source, path)
+            copies.append(path)
+    return copies
+
+
+def _processes(n: int) -> str:
+    return f"{n} process" if n == 1 else f"{n} processes"
+
+
+def _sweep(most: int) -> list[int]:
+    """Worker counts 1, 2, 4, ... below ``most``, then ``most`` itself."""
+    counts = []
+    n = 1
+    while n < most:
+        counts.append(n)
+        n *= 2
+    return counts + [most]
+
+
+def _run(files: list[Path], cache_dir: Path, workers: int) -> float:
+    with DocumentExtractor(cache_dir, workers) as extractor:
+        extractor.start()
+        start = time.perf_counter()
+        # Copies share bytes with their original, so key each copy by path as
+        # well; otherwise every copy after the first would be a cache hit
+        futures = [
+            extractor.submit(path, f"{hash_file(path)}-{path.stem}") for path in files
+        ]
+        for future in futures:
+            future.result()
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--root", default="sample_audit_data")
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=max(os.cpu_count() or 1, 2))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        (tmp_path / "files").mkdir()
+        files = _scaled_copy(args.root, args.scale, tmp_path / "files")
+        print(f"{len(files)} files ({args.scale}x sample set)\n")
+
+        most = max(args.workers, 1)
+        runs = [
+            (f"{_processes(n)}, cold cache", tmp_path / f"cache-{n}", n) for n in _sweep(most)
+        ]
+        runs.append((f"{_processes(most)}, warm cache", tmp_path / f"cache-{most}", most))
+        for label, cache_dir, workers in runs:
+            elapsed = _run(files, cache_dir, workers)
+            print(f"{label:<28}{elapsed:8.2f}s {len(files) / elapsed:10.1f} files/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: market price checks against a sorted interval index.
+
+Parses the sample market-pricing knowledge (checking a few prices against
+its CPM, server and hourly consulting ranges), then builds ``--categories`` synthetic categories of ``--tiers`` overlapping price
+tiers each and checks ``--checks`` (category, unit price) pairs with
+``MarketPriceIndex.locate`` (the vectorized lookup), next to a per-pair scan
+of the category's ranges. ``check`` is timed as well, but it is not a faster
+lookup: it runs ``locate`` and then builds one PriceCheck per pair, and
+allocating those objects costs more than the lookup itself.
+
+Usage:
+    python -m benchmarks.market_prices [--categories 2000] [--tiers 20] [--checks 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from knowledge.knowledge_store import SAMPLE_MARKET_PRICING
+from knowledge.market_prices import MarketPriceIndex, PriceRange
+
+
+def _scan(ranges: list[PriceRange], categories: list[str], prices: list[float]) -> list[str]:
+    by_category: dict[str, list[PriceRange]] = {}
+    for r in ranges:
+        by_category.setdefault(r.category, []).append(r)
+    verdicts = []
+    for category, price in zip(categories, prices):
+        tiers = by_category[category]
+        if any(r.low <= price <= r.high for r in tiers):
+            verdicts.append("within")
+        elif price < min(r.low for r in tiers):
+            verdicts.append("below")
+        elif price > max(r.high for r in tiers):
+            verdicts.append("above")
+        else:
+            verdicts.append("between_tiers")
+    return verdicts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--categories", type=int, default=2_000)
+    parser.add_argument("--tiers", type=int, default=20)
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sample = MarketPriceIndex.from_knowledge(SAMPLE_MARKET_PRICING)
+    print(f"sample knowledge: {len(sample.ranges)} ranges in {len(sample.categories())} categories")
+    examples = [("デジタル広告", "$12", "CPM"), ("エンタープライズサーバー", "$8,000", ""),
+                ("コンサルティング シニア", "$600", "時"), ("コンサルティング シニア", "¥60,000", "時")]
+    for (category, price, unit), check in zip(examples, sample.check(*zip(*examples))):
+        print(f"  {category} {price}{'/' + unit if unit else ''}: {check.verdict} deviation={check.deviation:+.0%}")
+
+    rng = np.random.default_rng(args.seed)
+    names = [f"category-{i}" for i in range(args.categories)]
+    base = np.exp(rng.uniform(np.log(1e3), np.log(1e6), args.categories))
+    ranges = [
+        PriceRange("BENCH", name, f"tier-{t}", "件", "JPY", float(low), float(low * rng.uniform(1.2, 2.0)), "")
+        for name, level in zip(names, base)
+        for t, low in enumerate(level * np.cumsum(rng.uniform(0.3, 1.0, args.tiers)))
+    ]
+    start = time.perf_counter()
+    index = MarketPriceIndex(ranges)
+    built = time.perf_counter() - start
+    picks = rng.integers(0, args.categories, args.checks)
+    categories = [names[i] for i in picks.tolist()]
+    prices = (base[picks] * rng.uniform(0.1, args.tiers * 1.2, args.checks)).round().tolist()
+    print(f"{len(ranges):,} ranges in {args.categories:,} categories (index built in {built * 1000:.0f} ms), "
+          f"{args.checks:,} checks")
+
+    start = time.perf_counter()
+    scanned = _scan(ranges, categories, prices)
+    scan_time = time.perf_counter() - start
+    units = ["件"] * args.checks
+    start = time.perf_counter()
+    located = index.locate(categories, prices, units)
+    locate_time = time.perf_counter() - start
+    start = time.perf_counter()
+    checks = index.check(categories, prices, units)
+    check_time = time.perf_counter() - start
+    agree = int((located.verdict == np.array(scanned)).sum())
+    counts = {v: int((located.verdict == v).sum()) for v in ("within", "between_tiers", "below", "above")}
+    print(f"  {'per-pair scan':<16}{scan_time * 1000:8.1f} ms")
+    print(f"  {'index locate':<16}{locate_time * 1000:8.1f} ms  verdicts={counts}  agree with scan={agree:,}/{args.checks:,}")
+    print(f"  {'index check':<16}{check_time * 1000:8.1f} ms  (locate + {len(checks):,} PriceCheck objects: "
+          f"{(check_time - locate_time) * 1000:.0f} ms building results)")
+
+
+if __name__ == "__main__":
+    main()
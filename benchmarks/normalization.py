@@ -0,0 +1,93 @@
+"""
+Benchmark: vectorized amount and date normalization.
+
+Builds ``--values`` amounts and dates in the notations found in the sample
+documents ("¥800,000", "80万円", "１２０千円", "5,500,000円（税込）",
+"令和7年7月20日", "R7.7.20", "2025/7/20" ...) and parses them with
+``parse_amounts`` / ``parse_dates``, next to the per-value parsing the tools
+used before (strip ¥/円/commas and ``float``; one regex per date). The
+per-value parser handles only part of the notations, so the times are
+compared on the values both parse; the full mix only reports coverage.
+
+Usage:
+    python -m benchmarks.normalization [--values 100000] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from entities.normalize import parse_amounts, parse_dates
+
+_AMOUNTS = (
+    "¥800,000", "80万円", "１２０千円", "5,500,000円（税込）", "△3,000", "1億2,000万円",
+    "合計：5,000,000", "約300万円（税抜）", "¥100,000", "50000",
+)
+_DATES = (
+    "2025/7/20", "2025年7月20日", "令和7年7月20日", "R7.7.20", "20250720", "2025-07-20",
+    "２０２５年７月２０日", "2025/07/20 10:00", "7月20日（日）", "令和元年5月1日",
+)
+_DATE_TEXT = re.compile(r"(\d{4})[/\-.](\d{1,2})[/\-.](\d{1,2})")
+
+
+def _legacy_amounts(values: list[str]) -> np.ndarray:
+    amounts = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            amounts[i] = float(re.sub(r"[¥￥,円\s]", "", value))
+        except ValueError:
+            pass
+    return amounts
+
+
+def _legacy_dates(values: list[str]) -> np.ndarray:
+    dates = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+    for i, value in enumerate(values):
+        match = _DATE_TEXT.fullmatch(value.strip())
+        if match:
+            year, month, day = (int(g) for g in match.groups())
+            dates[i] = np.datetime64(f"{year:04d}-{month:02d}-{day:02d}")
+    return dates
+
+
+def _best(fn, repeat: int) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--values", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    amounts = [_AMOUNTS[i % len(_AMOUNTS)] for i in range(args.values)]
+    dates = [_DATES[i % len(_DATES)] for i in range(args.values)]
+    print(f"{args.values:,} amounts and {args.values:,} dates")
+    for name, legacy, vectorized, values in (
+        ("amounts", _legacy_amounts, lambda v: parse_amounts(v).value, amounts),
+        ("dates", _legacy_dates, parse_dates, dates),
+    ):
+        missing = np.isnan if name == "amounts" else np.isnat
+        old_ok = ~missing(legacy(values))
+        new_ok = ~missing(vectorized(values))
+        print(f"  {name:<8} full mix: per value parses {int(old_ok.sum()):,}, vectorized {int(new_ok.sum()):,}")
+        # Equal work: only the values the per-value parser understands
+        common = [value for value, ok in zip(values, old_ok.tolist()) if ok]
+        legacy_time, old = _best(lambda: legacy(common), args.repeat)
+        new_time, new = _best(lambda: vectorized(common), args.repeat)
+        agree = int((old == new).sum())
+        print(f"  {'':<8} same {len(common):,} values: per value {legacy_time * 1000:7.1f} ms  "
+              f"vectorized {new_time * 1000:7.1f} ms  agree={agree:,}")
+
+
+if __name__ == "__main__":
+    main()
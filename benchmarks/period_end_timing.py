@@ -0,0 +1,73 @@
+"""
+Benchmark: period-end timing analysis over a year of orders.
+
+Generates ``--orders`` order lines spread uniformly over one year, with a
+few planted approvers who place a large share of their orders in the last
+days of the month, then runs ``analyze_period_end_timing`` by vendor and by
+approver and checks that the planted approvers are the ones flagged.
+
+Usage:
+    python -m benchmarks.period_end_timing [--orders 100000] [--vendors 2000] [--approvers 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from transactions.timing import analyze_period_end_timing, days_to_period_end
+
+
+def _orders(
+    orders: int, vendors: int, approvers: int, seed: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, set[str]]:
+    rng = np.random.default_rng(seed)
+    vendor = np.char.add("vendor-", rng.integers(0, vendors, orders).astype(np.str_))
+    approver_code = rng.integers(0, approvers, orders)
+    approver = np.char.add("approver-", approver_code.astype(np.str_))
+    day = np.datetime64("2024-01-01") + rng.integers(0, 366, orders).astype("timedelta64[D]")
+    # Planted approvers move half of their orders to the month's last two days
+    planted = np.arange(0, approvers, 50)
+    moved = np.isin(approver_code, planted) & (rng.random(orders) < 0.5)
+    month_end = (day.astype("datetime64[M]") + 1).astype("datetime64[D]") - 1
+    day[moved] = month_end[moved] - rng.integers(0, 2, int(moved.sum()))
+    return vendor, approver, day, {f"approver-{a}" for a in planted.tolist()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--vendors", type=int, default=2_000)
+    parser.add_argument("--approvers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vendor, approver, day, planted = _orders(args.orders, args.vendors, args.approvers, args.seed)
+    groupings = {"vendor": vendor, "approver": approver}
+
+    best_distance = best_analysis = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        days_to_period_end(day)
+        days_to_period_end(day, "quarter")
+        best_distance = min(best_distance, time.perf_counter() - start)
+        start = time.perf_counter()
+        result = analyze_period_end_timing(day, groupings)
+        best_analysis = min(best_analysis, time.perf_counter() - start)
+
+    flagged = {g.group for g in result.flagged["approver"]}
+    print(f"{args.orders:,} orders over one year, {args.vendors:,} vendors, {args.approvers:,} approvers")
+    print(f"distance to month/quarter end: {best_distance * 1000:.1f} ms")
+    print(
+        f"analysis by vendor and approver: {best_analysis * 1000:.1f} ms  "
+        f"overall lift={result.overall['lift']}  "
+        f"flagged vendors={len(result.flagged['vendor'])} approvers={len(flagged)}"
+    )
+    print(f"planted approvers found: {len(flagged & planted)}/{len(planted)}, false positives: {len(flagged - planted)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: split-order detection over a synthetic order ledger.
+
+Generates ``--orders`` random order lines (vendors, dates over two years,
+log-normal amounts) with a few planted split orders, then runs
+``detect_split_orders`` over the whole ledger.
+
+Usage:
+    python -m benchmarks.split_orders [--orders 2000000] [--vendors 50000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from transactions.split_orders import detect_split_orders
+
+
+def _ledger(orders: int, vendors: int, seed: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    names = np.char.add("vendor-", np.arange(vendors).astype(np.str_))
+    vendor = names[rng.integers(0, vendors, orders)]
+    day = np.datetime64("2024-01-01") + rng.integers(0, 730, orders).astype("timedelta64[D]")
+    amount = np.round(rng.lognormal(11.5, 1.0, orders), -3)
+    # Plant one split order (three ¥400,000 orders within a week) every 1,000 lines
+    planted = np.arange(0, orders - 3, 1000)
+    for k in range(3):
+        vendor[planted + k] = vendor[planted]
+        day[planted + k] = day[planted] + k * 3
+        amount[planted + k] = 400_000
+    return vendor, day, amount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--vendors", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vendor, day, amount = _ledger(args.orders, args.vendors, args.seed)
+    start = time.perf_counter()
+    result = detect_split_orders(vendor, day, amount)
+    elapsed = time.perf_counter() - start
+    summary = result.summary()
+    print(f"{args.orders:,} orders, {args.vendors:,} vendors")
+    print(
+        f"detect: {elapsed:.2f}s ({args.orders / elapsed:,.0f} orders/sec)  "
+        f"flagged_orders={summary['flagged_orders']:,} groups={summary['groups']:,}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: line-item extraction and bulk unit-price derivation.
+
+Reads the quotation/purchase-order line items of the sample evidence
+(checking that TX-104's 50本 / ¥5,000,000 comes out at ¥100,000/本; the
+sample knowledge has no market range for it), then generates ``--transactions`` synthetic
+quotations of ``--items`` rows each and derives every unit price with
+``derive_line_items`` (one parse per column, one division) next to a
+per-row parse and division (timed on the first ``--loop-rows`` rows and
+extrapolated).
+
+Usage:
+    python -m benchmarks.unit_prices [--transactions 20000] [--items 4] [--loop-rows 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from entities.normalize import parse_amounts
+from ingestion.extractors import extract_text
+from knowledge.knowledge_store import SAMPLE_MARKET_PRICING
+from knowledge.market_prices import MarketPriceIndex
+from transactions.line_items import (
+    collect_line_items,
+    derive_line_items,
+    market_checks,
+    text_line_items,
+)
+from transactions.table import load_transaction_table
+
+SAMPLE = Path("sample_audit_data")
+_UNITS = ("本", "式", "時間", "名", "ヶ月")
+
+
+def _quotation(number: int, rows: list[tuple[str, int, str, int]]) -> str:
+    lines = [
+        "見  積  書",
+        f"見積番号: EST-{number}",
+        f"取引ID: TX-{number}",
+        f"件名: ベンチマーク案件 {number}",
+        "項目 数量 単位 単価 金額",
+    ]
+    lines += [f"{item} {quantity} {unit} ¥{price:,} ¥{quantity * price:,}" for item, quantity, unit, price in rows]
+    lines.append(f"小計 ¥{sum(q * p for _, q, _, p in rows):,}")
+    return "\n".join(lines)
+
+
+def _per_row(raw: dict[str, list]) -> list[float]:
+    prices = []
+    for quantity, amount in zip(raw["quantity"], raw["amount"]):
+        q = parse_amounts([quantity]).value[0]
+        a = parse_amounts([amount]).value[0]
+        prices.append(a / q if q > 0 else float("nan"))
+    return prices
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--loop-rows", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = MarketPriceIndex.from_knowledge(SAMPLE_MARKET_PRICING)
+    if SAMPLE.exists():
+        table = load_transaction_table(SAMPLE / "受発注請求データ" / "受発注請求一覧.xlsx")
+        documents = [
+            (str(path), str(path), extract_text(path))
+            for folder in ("quotations", "purchase_orders")
+            for path in sorted((SAMPLE / folder).glob("*.pdf"))
+        ]
+        sample = collect_line_items(table, documents)
+        print(f"sample evidence: {len(sample)} line items in {len(set(sample.transaction_id.tolist()))} transactions")
+        tx104 = sample.take(sample.rows_for("TX-104"))
+        located, _ = market_checks(tx104, index, table)
+        for row in range(len(tx104)):
+            print(
+                f"  TX-104 {tx104.source[row].rsplit('/', 1)[-1]}: {tx104.quantity[row]:.0f}{tx104.unit[row]}"
+                f" ¥{tx104.amount[row]:,.0f} -> ¥{tx104.unit_price[row]:,.0f}/{tx104.unit[row]}"
+                f" {located.verdict[row] if located.key[row] >= 0 else 'no_market_data'}"
+            )
+
+    rng = np.random.default_rng(args.seed)
+    texts = [
+        _quotation(number, [
+            (f"品目{number}-{i}", int(rng.integers(1, 100)), _UNITS[int(rng.integers(len(_UNITS)))],
+             int(rng.integers(1, 500)) * 1_000)
+            for i in range(args.items)
+        ])
+        for number in range(1, args.transactions + 1)
+    ]
+    start = time.perf_counter()
+    raw = None
+    for number, text in enumerate(texts, 1):
+        raw = text_line_items(text, source=f"TX-{number}_quotation.pdf", into=raw)
+    extract_time = time.perf_counter() - start
+    print(f"{args.transactions:,} quotations, {len(raw['item']):,} line items (extracted in {extract_time * 1000:.0f} ms)")
+
+    loop_rows = min(args.loop_rows, len(raw["item"]))
+    start = time.perf_counter()
+    looped = _per_row({name: values[:loop_rows] for name, values in raw.items()})
+    loop_time = (time.perf_counter() - start) * len(raw["item"]) / max(loop_rows, 1)
+    start = time.perf_counter()
+    items = derive_line_items(raw)
+    derive_time = time.perf_counter() - start
+    agree = int(np.isclose(items.unit_price[:loop_rows], looped).sum())
+    print(f"  {'per-row parse':<16}{loop_time * 1000:8.1f} ms  (extrapolated from {loop_rows:,} rows)")
+    print(f"  {'bulk derive':<16}{derive_time * 1000:8.1f} ms  agree with per-row={agree:,}/{loop_rows:,}"
+          f"  consistent={int(items.consistent.sum()):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Entities Module
+
+This module extracts structured entities from document text:
+- A precompiled single-pass scanner for amounts, dates, parties and
+  transaction IDs, with a character-class prefilter
+- Vectorized normalization shared by extraction, analysis and the rule
+  engine: amounts (¥, 円, 万円/千円, full-width digits, 税込/税抜) to
+  whole yen and dates (和暦, 年月日, slashes) to ISO dates
+- Normalized keys per entity kind (yen amounts, ISO dates, IDs)
+- An inverted index built once at ingestion: normalized value ->
+  (file, chunk, offset, label), so lookups and extract_data are cache reads
+"""
+
+from entities.index import EntityIndex, EntityOccurrence
+from entities.normalize import (
+    ParsedAmounts,
+    iso_dates,
+    normalize_entities,
+    normalize_entity,
+    parse_amounts,
+    parse_dates,
+    parse_yen,
+)
+from entities.scanner import (
+    ENTITY_KINDS,
+    EntityMatch,
+    EntityScanner,
+    get_scanner,
+    label_before,
+    scan_entities,
+)
+
+__all__ = [
+    "ENTITY_KINDS",
+    "EntityIndex",
+    "EntityMatch",
+    "EntityOccurrence",
+    "EntityScanner",
+    "ParsedAmounts",
+    "get_scanner",
+    "iso_dates",
+    "label_before",
+    "normalize_entities",
+    "normalize_entity",
+    "parse_amounts",
+    "parse_dates",
+    "parse_yen",
+    "scan_entities",
+]
@@ -0,0 +1,220 @@
+"""Inverted index of the entities found in every ingested file."""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+
+from entities.normalize import normalize_entities, normalize_entity
+from entities.scanner import ENTITY_KINDS, get_scanner, label_before
+
+_BARE_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+# Kinds whose match does not contain its own label, so the word in front of it is kept
+_LABELLED_KINDS = ("amount", "date")
+
+
+@dataclass(frozen=True)
+class EntityOccurrence:
+    """One entity found in a file: where it is and its raw and normalized value."""
+
+    kind: str
+    value: str
+    normalized: str
+    file_id: str
+    chunk: int  # chunk the entity starts in (-1 if the file has no chunks)
+    offset: int  # character offset inside that chunk
+    label: str = ""  # word labelling a date or amount ("発注日", "見積金額"), "" if none
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "value": self.value,
+            "normalized": self.normalized,
+            "file_id": self.file_id,
+            "chunk": self.chunk,
+            "offset": self.offset,
+            "label": self.label,
+        }
+
+
+def _char_byte_offsets(text: str) -> np.ndarray:
+    """UTF-8 byte offset of every character of ``text`` (plus the end)."""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    widths = 1 + (codes >= 0x80) + (codes >= 0x800) + (codes >= 0x10000)
+    return np.r_[0, np.cumsum(widths)]
+
+
+def _query_keys(value: str, kinds: tuple[str, ...]) -> list[tuple[str, str]]:
+    value = value.strip()
+    keys = [
+        (m.kind, normalize_entity(m.kind, m.value, value[m.start : m.end]))
+        for m in get_scanner(kinds).scan(value)
+    ]
+    if not keys:
+        for kind in kinds:
+            if kind == "amount" and not _BARE_NUMBER.fullmatch(value):
+                continue
+            keys.append((kind, normalize_entity(kind, value, value)))
+    return list(dict.fromkeys(keys))
+
+
+class EntityIndex:
+    """
+    Maps normalized entity values to the files, chunks and offsets they occur at.
+
+    Files are scanned once when they are ingested (one pass of the entity
+    scanner over the file's canonical text); afterwards "which files mention
+    TX-104" is a dictionary lookup and "all amounts in file X" a list read.
+    Chunk spans are byte ranges, so match offsets are converted to bytes once
+    per file and assigned to chunks with a single ``searchsorted``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_file: dict[str, list[EntityOccurrence]] = {}
+        self._postings: dict[tuple[str, str], list[EntityOccurrence]] = {}
+        self._lengths: dict[str, int] = {}
+
+    def __contains__(self, file_id: str) -> bool:
+        return file_id in self._by_file
+
+    def __len__(self) -> int:
+        return sum(len(found) for found in self._by_file.values())
+
+    def file_ids(self) -> list[str]:
+        return sorted(self._by_file)
+
+    def text_length(self, file_id: str) -> int:
+        """Characters of the text the file was indexed from."""
+        return self._lengths.get(file_id, 0)
+
+    def add_file(self, file_id: str, text: str, spans: Any = None) -> int:
+        """
+        Scan a file's text and (re)index its entities.
+
+        Args:
+            file_id: File the text belongs to (replaces its previous entries)
+            text: The file's canonical text
+            spans: (n, 2) UTF-8 byte spans of the file's chunks, as stored in
+                the corpus; without them every entity is in chunk -1
+
+        Returns:
+            Number of entity occurrences indexed
+        """
+        matches = get_scanner(ENTITY_KINDS).scan(text)
+        starts = np.array([m.start for m in matches], dtype=np.int64)
+        chunks = np.full(len(matches), -1, dtype=np.int64)
+        offsets = starts
+        spans = None if spans is None else np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        if matches and spans is not None and len(spans):
+            # Chunk starts in characters, then the last chunk starting at or before each match
+            chunk_chars = np.searchsorted(_char_byte_offsets(text), spans[:, 0])
+            chunks = np.searchsorted(chunk_chars, starts, side="right") - 1
+            offsets = np.where(chunks >= 0, starts - chunk_chars[np.maximum(chunks, 0)], starts)
+
+        # One vectorized normalization call per kind
+        normalized: list[str] = [""] * len(matches)
+        for kind in ENTITY_KINDS:
+            positions = [i for i, m in enumerate(matches) if m.kind == kind]
+            if positions:
+                keys = normalize_entities(
+                    kind,
+                    [matches[i].value for i in positions],
+                    [text[matches[i].start : matches[i].end] for i in positions],
+                )
+                for i, key in zip(positions, keys):
+                    normalized[i] = key
+        found = [
+            EntityOccurrence(
+                m.kind,
+                m.value,
+                key,
+                file_id,
+                chunk,
+                offset,
+                label_before(text, m.start) if m.kind in _LABELLED_KINDS else "",
+            )
+            for m, key, chunk, offset in zip(matches, normalized, chunks.tolist(), offsets.tolist())
+        ]
+        with self._lock:
+            self._remove(file_id)
+            self._by_file[file_id] = found
+            self._lengths[file_id] = len(text)
+            for occurrence in found:
+                self._postings.setdefault((occurrence.kind, occurrence.normalized), []).append(occurrence)
+        return len(found)
+
+    def remove_file(self, file_id: str) -> bool:
+        with self._lock:
+            return self._remove(file_id)
+
+    def _remove(self, file_id: str) -> bool:
+        found = self._by_file.pop(file_id, None)
+        self._lengths.pop(file_id, None)
+        if found is None:
+            return False
+        for key in {(o.kind, o.normalized) for o in found}:
+            remaining = [o for o in self._postings.get(key, []) if o.file_id != file_id]
+            if remaining:
+                self._postings[key] = remaining
+            else:
+                self._postings.pop(key, None)
+        return True
+
+    def lookup(self, value: str, kind: str = "", file_id: str = "") -> list[EntityOccurrence]:
+        """
+        Occurrences of a value, matched on its normalized form.
+
+        The query is scanned like document text, so "TX-104", "tx-104" and
+        "¥5,000,000" / "5,000,000円" find the same entries; values the scanner
+        has no context for ("EST-104", "5000000") are normalized as bare values.
+        """
+        kinds = (kind,) if kind else ENTITY_KINDS
+        hits: list[EntityOccurrence] = []
+        for key in _query_keys(value, kinds):
+            hits.extend(
+                o for o in self._postings.get(key, []) if not file_id or o.file_id == file_id
+            )
+        return hits
+
+    def entities(self, file_id: str, kinds: Iterable[str] = ENTITY_KINDS) -> list[EntityOccurrence]:
+        """A file's entity occurrences of the given kinds, in text order."""
+        wanted = set(kinds)
+        return [o for o in self._by_file.get(file_id, []) if o.kind in wanted]
+
+    def extract(self, file_id: str, kinds: Iterable[str] = ENTITY_KINDS) -> dict[str, list[str]]:
+        """Distinct raw values per kind in order of first occurrence (``EntityScanner.extract``'s shape)."""
+        kinds = tuple(kinds)
+        values: dict[str, dict[str, None]] = {kind: {} for kind in kinds}
+        for occurrence in self.entities(file_id, kinds):
+            values[occurrence.kind].setdefault(occurrence.value, None)
+        return {kind: list(found) for kind, found in values.items()}
+
+    def summary(self, file_id: str, kind: str = "") -> dict[str, list[dict[str, Any]]]:
+        """Distinct normalized values per kind in a file with their counts and first chunk."""
+        grouped: dict[str, dict[str, dict[str, Any]]] = {}
+        counts = Counter((o.kind, o.normalized) for o in self._by_file.get(file_id, []))
+        for occurrence in self.entities(file_id, (kind,) if kind else ENTITY_KINDS):
+            entries = grouped.setdefault(occurrence.kind, {})
+            if occurrence.normalized not in entries:
+                entries[occurrence.normalized] = {
+                    "normalized": occurrence.normalized,
+                    "value": occurrence.value,
+                    "count": counts[(occurrence.kind, occurrence.normalized)],
+                    "first_chunk": occurrence.chunk,
+                }
+        return {k: list(entries.values()) for k, entries in grouped.items()}
+
+    def stats(self) -> dict[str, Any]:
+        by_kind = Counter(o.kind for found in self._by_file.values() for o in found)
+        return {
+            "files": len(self._by_file),
+            "occurrences": sum(by_kind.values()),
+            "distinct_values": len(self._postings),
+            "by_kind": dict(by_kind),
+        }
@@ -0,0 +1,331 @@
+"""
+Vectorized normalization of monetary amounts and dates.
+
+Amounts ("¥800,000", "80万円", "１２０千円", "5,500,000円（税込）", "△3,000")
+become numbers in the currency's units (whole yen for JPY), and dates
+("2025/7/20", "2025年7月20日", "令和7年7月20日", "R7.7.20", "20250720")
+become datetime64[D]. Both work on whole lists with ``np.strings`` ufuncs;
+only values given as Python numbers / dates are handled one by one.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+
+# Full-width digits and punctuation that appear in Japanese documents
+_FULLWIDTH = tuple(zip("０１２３４５６７８９，．－ー／：　￥＄（）", "0123456789,.--/: ¥$()"))
+_TAX_INCLUDED = ("税込", "内税")
+_TAX_EXCLUDED = ("税抜", "税別", "外税")
+_FOREIGN = (("$", "USD"), ("ドル", "USD"), ("USD", "USD"), ("€", "EUR"), ("EUR", "EUR"), ("£", "GBP"))
+# Removed before the number is read ("約" and "円" carry no value)
+_AMOUNT_WORDS = (*_TAX_INCLUDED, *_TAX_EXCLUDED, "JPY", "USD", "EUR", "ドル")
+_AMOUNT_MARKS = tuple((c, "") for c in "()¥円$€£, 約")
+_UNITS = (("億", 1e8), ("万", 1e4), ("千", 1e3))
+_NEGATIVE = ("-", "△", "▲")
+
+# Japanese eras: the year before each era's first year
+_ERAS = (("令和", 2018), ("平成", 1988), ("昭和", 1925), ("大正", 1911))
+_ERA_LETTERS = (("R", 2018), ("H", 1988), ("S", 1925))
+# Joins the values for the whole-list string passes; never appears in a cell
+_SEPARATOR = "\x1f"
+# 年/月 and separators become "-", 日 goes; spaces next to a separator are dropped
+_DATE_SEPARATORS = (("年", "-"), ("月", "-"), ("/", "-"), (".", "-"), ("日", ""))
+_MONTH_NAME = re.compile(r"([A-Za-z]{3})[A-Za-z]*\.?\s+(\d{1,2}),?\s+(\d{4})")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+
+
+def _fold(strings: list[str], *replacements: tuple[str, str]) -> np.ndarray:
+    """
+    Fold full-width characters, then apply ``replacements`` in order, over all
+    values at once: the values are joined into one string, so each rewrite is
+    a single ``str.replace`` whatever the list length (and skipped when the
+    text does not contain it).
+    """
+    if not strings:
+        return np.array([], dtype=np.str_)
+    joined = _SEPARATOR.join(strings)
+    for old, new in (*_FULLWIDTH, *replacements):
+        if old in joined:
+            joined = joined.replace(old, new)
+    return np.array(joined.split(_SEPARATOR), dtype=np.str_)
+
+
+def _split(items: list[Any], is_other: Any) -> tuple[list[str], list[Any]]:
+    """Text of the string values ("" elsewhere) and the other values (None for strings)."""
+    if all(type(v) is str for v in items):
+        return items, [None] * len(items)
+    strings: list[str] = []
+    others: list[Any] = []
+    for v in items:
+        if type(v) is str:
+            strings.append(v)
+            others.append(None)
+        elif v is not None and is_other(v):
+            strings.append("")
+            others.append(v)
+        else:
+            strings.append("" if v is None else str(v))
+            others.append(None)
+    return strings, others
+
+
+def _contains(text: np.ndarray, needles: Iterable[str]) -> np.ndarray:
+    found = np.zeros(text.shape, dtype=bool)
+    for needle in needles:
+        found |= np.strings.find(text, needle) >= 0
+    return found
+
+
+def _digits(text: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Whole numbers written in ASCII digits, read from the code points (no per-value parsing)."""
+    width = text.dtype.itemsize // 4
+    codes = np.ascontiguousarray(text).view(np.uint32).reshape(len(text), width).astype(np.int64) - 48
+    length = np.strings.str_len(text)
+    inside = np.arange(width) < length[:, None]
+    ok = (length > 0) & ((codes >= 0) & (codes <= 9) | ~inside).all(axis=1)
+    value = np.zeros(len(text), dtype=np.float64)
+    for column in range(width):
+        value = np.where(inside[:, column], value * 10 + codes[:, column], value)
+    return np.where(ok, value, 0.0), ok
+
+
+def _decimal(text: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Numbers written as digits with at most one decimal point, and where they are."""
+    if 0 < text.dtype.itemsize // 4 <= 15 and not (np.strings.find(text, ".") >= 0).any():
+        return _digits(text)
+    digits = np.strings.replace(text, ".", "", 1)
+    ok = np.strings.isdecimal(digits) & (np.strings.str_len(digits) > 0)
+    value = np.zeros(text.shape, dtype=np.float64)
+    if ok.any():
+        value[ok] = text[ok].astype(np.float64)
+    return value, ok
+
+
+@dataclass
+class ParsedAmounts:
+    """Amounts parsed from a list of values, aligned with the input."""
+
+    value: np.ndarray  # float64 in the currency's units, NaN if unparseable
+    currency: np.ndarray  # "JPY", "USD", "EUR" or "GBP"
+    tax: np.ndarray  # "税込", "税抜" or "" when the text says neither
+
+    @property
+    def yen(self) -> np.ndarray:
+        """Whole yen (float64, exact for integers), NaN for other currencies."""
+        return np.where(self.currency == "JPY", np.rint(self.value), np.nan)
+
+    @property
+    def valid(self) -> np.ndarray:
+        return ~np.isnan(self.value)
+
+
+def parse_amounts(values: Iterable[Any]) -> ParsedAmounts:
+    """
+    Parse monetary values.
+
+    Handles ¥/￥/円, full-width digits, thousands separators, 千/万/億 units
+    (also combined: "1億2,000万円"), 税込/税抜 markers, leading -/△/▲ for
+    negatives and a "label:" prefix ("合計：5,000,000"). Numbers are taken
+    as they are (as yen).
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fiu":
+        n = len(values)
+        return ParsedAmounts(values.astype(np.float64), np.full(n, "JPY"), np.full(n, ""))
+    items = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    if not items:
+        return ParsedAmounts(np.array([], dtype=np.float64), np.array([], dtype="U3"), np.array([], dtype=np.str_))
+    strings, others = _split(items, _is_number)
+    numbers = np.array([np.nan if v is None else float(v) for v in others], dtype=np.float64)
+    text = _fold(strings)
+
+    tax = np.full(len(items), "")
+    tax = np.where(_contains(text, _TAX_INCLUDED), "税込", np.where(_contains(text, _TAX_EXCLUDED), "税抜", tax))
+    currency = np.full(len(items), "JPY")
+    for mark, code in _FOREIGN:
+        currency = np.where(np.strings.find(text, mark) >= 0, code, currency)
+
+    body = _fold(strings, *((word, "") for word in _AMOUNT_WORDS), *_AMOUNT_MARKS)
+    # "合計:5000000" -> "5000000"
+    body = np.strings.rpartition(body, ":")[2]
+    negative = np.zeros(len(items), dtype=bool)
+    for sign in _NEGATIVE:
+        starts = np.strings.startswith(body, sign)
+        negative |= starts
+        body = np.where(starts, np.strings.slice(body, len(sign), None), body)
+
+    total = np.zeros(len(items), dtype=np.float64)
+    valid = body != ""
+    rest = body
+    for unit, scale in _UNITS:
+        head, sep, tail = np.strings.partition(rest, unit)
+        has_unit = sep != ""
+        if has_unit.any():
+            part, ok = _decimal(head[has_unit])
+            valid[has_unit] &= ok
+            total[has_unit] += np.where(ok, part * scale, 0.0)
+            rest = np.where(has_unit, tail, head)
+    part, ok = _decimal(rest)
+    valid &= ok | ((rest == "") & (body != ""))
+    total += np.where(ok, part, 0.0)
+
+    value = np.where(valid, np.where(negative, -total, total), np.nan)
+    value = np.where(np.isnan(numbers), value, numbers)
+    return ParsedAmounts(value, currency, tax)
+
+
+def parse_yen(values: Iterable[Any]) -> np.ndarray:
+    """Whole yen per value (float64), NaN where it is not a yen amount."""
+    return parse_amounts(values).yen
+
+
+def _dates_by_name(strings: list[str], dates: np.ndarray) -> np.ndarray:
+    """English month-name dates ("Jan 5, 2025") among the still unparsed values."""
+    for i in np.flatnonzero(np.isnat(dates)).tolist():
+        m = _MONTH_NAME.search(strings[i]) if strings[i] else None
+        if m:
+            try:
+                parsed = dt.datetime.strptime(" ".join(m.groups()).title(), "%b %d %Y")
+            except ValueError:
+                continue
+            dates[i] = np.datetime64(parsed.date(), "D")
+    return dates
+
+
+def parse_dates(values: Iterable[Any]) -> np.ndarray:
+    """
+    Parse dates to datetime64[D] (NaT where a value is not a date).
+
+    Handles Y/M/D with "/", "-", "." or 年月日, Japanese eras (令和7年7月20日,
+    R7.7.20, 元年), full-width digits, compact "20250720", month-first
+    "7/20/2025", English month names, a trailing time or weekday
+    ("2025/07/20 10:00", "2025年7月20日（日）") and date/datetime objects.
+    Dates without a year ("7月20日") are not dates here and give NaT.
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind == "M":
+        return values.astype("datetime64[D]")
+    items = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    if not items:
+        return np.array([], dtype="datetime64[D]")
+    strings, others = _split(items, lambda v: isinstance(v, (dt.date, np.datetime64)))
+    spaces = [(f"{name} ", name) for name, _ in _ERAS] + [("- ", "-"), (" -", "-")] * 2
+    text = _fold(strings, *_DATE_SEPARATORS, *spaces)
+    # Drop a trailing time ("2025-07-20 10:00") or weekday ("7-20(日)")
+    text = np.strings.partition(np.strings.partition(np.strings.strip(text), " ")[0], "(")[0]
+    text = np.strings.partition(text, "T")[0]
+
+    offset = np.zeros(len(items), dtype=np.int64)
+    for name, base in _ERAS:
+        hit = np.strings.startswith(text, name)
+        offset = np.where(hit, base, offset)
+        text = np.where(hit, np.strings.slice(text, len(name), None), text)
+    for letter, base in _ERA_LETTERS:
+        hit = np.strings.startswith(text, letter) & np.strings.isdecimal(np.strings.slice(text, 1, 2))
+        offset = np.where(hit, base, offset)
+        text = np.where(hit, np.strings.slice(text, 1, None), text)
+    text = np.where(offset > 0, np.strings.replace(text, "元", "1"), text)
+    compact = np.strings.isdecimal(text) & (np.strings.str_len(text) == 8)
+    text = np.where(
+        compact,
+        np.strings.add(
+            np.strings.add(np.strings.slice(text, 0, 4), "-"),
+            np.strings.add(np.strings.add(np.strings.slice(text, 4, 6), "-"), np.strings.slice(text, 6, 8)),
+        ),
+        text,
+    )
+
+    first, _, rest = np.strings.partition(text, "-")
+    second, _, third = np.strings.partition(rest, "-")
+    a, ok_a = _decimal(first)
+    b, ok_b = _decimal(second)
+    c, ok_c = _decimal(third)
+    ok = ok_a & ok_b & ok_c & (np.strings.find(third, "-") < 0)
+    # Month-first with the year last ("7/20/2025")
+    year_last = (np.strings.str_len(first) <= 2) & (np.strings.str_len(third) == 4) & (offset == 0)
+    year = np.where(year_last, c, a) + offset
+    month = np.where(year_last, a, b)
+    day = np.where(year_last, b, c)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (year >= 1000) & (year <= 9999)
+    ok &= (offset == 0) | (np.strings.str_len(first) <= 2)
+
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype(np.int64)
+    start = months.astype("datetime64[M]").astype("datetime64[D]")
+    dates = start + np.where(ok, day - 1, 0).astype("timedelta64[D]")
+    # 2月30日 and the like roll into the next month; those are not dates
+    ok &= dates.astype("datetime64[M]").astype(np.int64) == months
+    dates = np.where(ok, dates, np.datetime64("NaT", "D"))
+
+    for i, value in enumerate(others):
+        if value is not None:
+            if isinstance(value, dt.datetime):
+                value = value.date()
+            dates[i] = np.datetime64(value, "D")
+    return _dates_by_name(strings, dates)
+
+
+def iso_dates(values: Iterable[Any]) -> list[str | None]:
+    """Dates as "YYYY-MM-DD" strings (None where a value is not a date)."""
+    dates = parse_dates(values)
+    return [None if s == "NaT" else s for s in np.datetime_as_string(dates, unit="D").tolist()]
+
+
+def _amount_keys(values: Iterable[Any]) -> list[str]:
+    parsed = parse_amounts(values)
+    keys = []
+    for raw, value, currency in zip(list(values), parsed.value.tolist(), parsed.currency.tolist()):
+        if value != value:  # NaN
+            keys.append(str(raw).strip())
+        elif currency == "JPY":
+            keys.append(str(int(round(value))))
+        else:
+            keys.append(f"{value:g} {currency}")
+    return keys
+
+
+def normalize_party(text: str) -> str:
+    """Whitespace removed, so "株式会社 サンプル広告" and "株式会社サンプル広告" match."""
+    return "".join(text.split())
+
+
+def normalize_transaction_id(value: str, matched: str = "") -> str:
+    """
+    Upper-cased ID; a bare number keeps its keyword ("TX-104" is captured as
+    "104" after "TX-"), so the key is the same however the ID was written.
+    """
+    value = value.strip().upper()
+    if any(c.isalpha() for c in value):
+        return value
+    keyword = re.match(r"(TX|PO)", matched.strip(), re.IGNORECASE)
+    return f"{keyword.group().upper()}-{value}" if keyword else value
+
+
+def normalize_entities(kind: str, values: list[str], matched: list[str] | None = None) -> list[str]:
+    """
+    Normalized keys for a list of entity values of one kind.
+
+    Amounts become whole yen ("5000000"; other currencies "12.5 USD"),
+    dates ISO strings, parties lose their whitespace and IDs are
+    upper-cased; values that do not parse keep their stripped text.
+    """
+    if kind == "amount":
+        return _amount_keys(values)
+    if kind == "date":
+        return [iso or str(v).strip() for v, iso in zip(values, iso_dates(values))]
+    if kind == "party":
+        return [normalize_party(v) for v in values]
+    if kind == "transaction_id":
+        matched = matched or values
+        return [normalize_transaction_id(v, m) for v, m in zip(values, matched)]
+    raise ValueError(f"unknown entity kind: {kind}")
+
+
+def normalize_entity(kind: str, value: str, matched: str = "") -> str:
+    """Normalized key of a single entity value of the given kind."""
+    return normalize_entities(kind, [value], [matched or value])[0]
@@ -0,0 +1,160 @@
+"""Single-pass, precompiled scanner for amounts, dates, parties and transaction IDs."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable
+
+ENTITY_KINDS = ("amount", "date", "party", "transaction_id")
+
+_MONTHS = r"(?:[Jj](?:an|un|ul)|[Ff]eb|[Mm]a[ry]|[Aa](?:pr|ug)|[Ss]ep|[Oo]ct|[Nn]ov|[Dd]ec)"
+
+# Alternatives per kind, tried in this order at each position. Case
+# insensitivity is spelled out ([Tt][Xx]) instead of re.IGNORECASE so that
+# every alternative starts with a known character; ``_FIRST_CHARS`` must list
+# every character an alternative of the kind can start with.
+_ALTERNATIVES: dict[str, tuple[str, ...]] = {
+    "transaction_id": (
+        r"(?:取引ID|[Tt]ransaction [Ii][Dd]|[Tt][Xx]|[Pp][Oo])[#：:\-]?\s*(?P<{value}>[A-Za-z0-9\-]+)",
+        r"(?:注文番号|[Oo]rder [Nn]o\.?)[：:\-]?\s*(?P<{value}>[A-Za-z0-9\-]+)",
+        # Document numbers ("見積番号: EST-107"), resolved to 取引IDs through the transaction table
+        r"(?:見積|発注|請求書?|検収)番号[：:]\s*(?P<{value}>[A-Za-z0-9\-]+)",
+    ),
+    "date": (
+        r"\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?",
+        r"(?:令和|平成|昭和)\s*(?:\d{1,2}|元)\s*年\s*\d{1,2}\s*月\s*\d{1,2}\s*日",
+        r"[RHS]\d{1,2}\.\d{1,2}\.\d{1,2}\b",
+        r"\d{1,2}[-/]\d{1,2}[-/]\d{4}",
+        _MONTHS + r"[a-zA-Z]*\s+\d{1,2},?\s+\d{4}",
+    ),
+    "amount": (
+        r"[\$¥￥€£]\s*[\d,]+(?:\.\d{1,2})?(?:[億万千][\d,]*)*(?:\s*[（(]税[込抜別][)）])?",
+        # "80万円", "1億2,000万円"
+        r"(?:[\d,]+(?:\.\d+)?[億万千])+[\d,]*円(?:\s*[（(]税[込抜別][)）])?",
+        r"[\d,]+(?:\.\d{1,2})?\s*(?:円|ドル|USD|JPY|EUR)(?:\s*[（(]税[込抜別][)）])?",
+        r"(?:金額|合計|単価|総額)[：:]\s*[\d,]+",
+    ),
+    "party": (
+        r"(?:発注者|受注者|取引先|顧客|ベンダー)[：:]\s*(?P<{value}>[^\n]+)",
+        # Only the legal-form word is matched; the name around it is taken
+        # afterwards (see _company), which avoids a \w+ scan from every position
+        r"(?P<{prefix}>株式会社|有限会社|合同会社)(?P<{after}>\w*)|(?:Inc\.|Corp\.|Ltd\.)",
+    ),
+}
+_FIRST_CHARS = {
+    "transaction_id": "取注TtPpOo見発請検",
+    "date": "0-9０-９JjFfMmAaSsOoNnDd令平昭RH",
+    "amount": "0-9０-９,$¥￥€£金合単総",
+    "party": "発受取顧ベ株有合ICL",
+}
+_WORD_TAIL = re.compile(r"\w+\Z")
+# The word written just in front of a value: "発注日: 2025年7月1日", "納品日 2025/10/15", "【見積日】..."
+_LABEL = re.compile(r"(\w{1,12})[】\]）)]?\s*[：:]?\s*\Z")
+_LABEL_WINDOW = 20
+# Longest name taken in front of 株式会社 etc.
+_MAX_NAME = 40
+
+
+@dataclass(frozen=True)
+class EntityMatch:
+    """One entity occurrence: its kind, value and span in the scanned text."""
+
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+class EntityScanner:
+    """
+    Finds every entity kind in one pass over the text.
+
+    All alternatives of the requested kinds are compiled into one regex whose
+    first token is the character class of the characters an entity can start
+    with, so the regex engine skips the bulk of the prose with its fast
+    character-set search and only tries the alternatives (inside a
+    lookahead) where an entity can begin. Matches are then taken leftmost
+    and non-overlapping, like ``finditer`` over the plain alternation.
+    """
+
+    def __init__(self, kinds: Iterable[str] = ENTITY_KINDS):
+        self.kinds = tuple(kinds)
+        unknown = [k for k in self.kinds if k not in _ALTERNATIVES]
+        if unknown:
+            raise ValueError(f"unknown entity kinds: {unknown} (expected {ENTITY_KINDS})")
+
+        branches: list[str] = []
+        self._groups: dict[str, tuple[str, str | None]] = {}
+        for kind in self.kinds:
+            for pattern in _ALTERNATIVES[kind]:
+                i = len(branches)
+                # Group names must be unique across the combined pattern
+                named = pattern
+                for placeholder, prefix in (("{value}", "v"), ("{prefix}", "p"), ("{after}", "a")):
+                    named = named.replace(placeholder, f"{prefix}{i}")
+                branches.append(f"(?P<g{i}>{named})")
+                self._groups[f"g{i}"] = (kind, f"v{i}" if "{value}" in pattern else None)
+        # Repeated characters and ranges are harmless in a class (and deduplicating
+        # characters would break ranges such as ０-９)
+        first = "".join(_FIRST_CHARS[k] for k in self.kinds)
+        self._pattern = re.compile(f"[{first}](?<=(?=(?:{'|'.join(branches)})).)")
+        self._company_groups = {
+            f"g{i}": (f"p{i}", f"a{i}") for i, b in enumerate(branches) if f"(?P<p{i}>" in b
+        }
+
+    def scan(self, text: str) -> list[EntityMatch]:
+        """Entity occurrences in text order."""
+        matches: list[EntityMatch] = []
+        end = 0
+        for m in self._pattern.finditer(text):
+            start = m.start()
+            if start < end:
+                continue
+            # The branch group encloses its value groups, so it is always the last one closed
+            group = m.lastgroup
+            kind, value_group = self._groups[group]
+            end = m.end(group)
+            if group in self._company_groups:
+                matches.extend(self._company(text, m, group))
+            else:
+                matches.append(EntityMatch(kind, m.group(value_group or group), start, end))
+        return matches
+
+    def _company(self, text: str, m: re.Match[str], group: str) -> list[EntityMatch]:
+        """Company names around a legal-form word: "ABC株式会社" and "株式会社ABC"."""
+        prefix_group, after_group = self._company_groups[group]
+        start = m.start(group)
+        word_end = m.end(prefix_group) if m.group(prefix_group) is not None else m.end(group)
+        found = []
+        before = _WORD_TAIL.search(text, max(0, start - _MAX_NAME), start)
+        if before is not None:
+            found.append(EntityMatch("party", text[before.start():word_end], before.start(), word_end))
+        if m.group(after_group):
+            found.append(EntityMatch("party", m.group(group), start, m.end(group)))
+        return found
+
+    def extract(self, text: str, limits: dict[str, int] | None = None) -> dict[str, list[str]]:
+        """Distinct values per kind in order of first occurrence, optionally capped per kind."""
+        values: dict[str, dict[str, None]] = {kind: {} for kind in self.kinds}
+        for match in self.scan(text):
+            values[match.kind].setdefault(match.value, None)
+        limits = limits or {}
+        return {kind: list(found)[: limits.get(kind)] for kind, found in values.items()}
+
+
+def label_before(text: str, start: int) -> str:
+    """The word labelling the value at ``start`` ("" when the value follows prose or punctuation)."""
+    m = _LABEL.search(text, max(0, start - _LABEL_WINDOW), start)
+    return m.group(1) if m else ""
+
+
+@lru_cache(maxsize=None)
+def get_scanner(kinds: tuple[str, ...] = ENTITY_KINDS) -> EntityScanner:
+    """Compiled scanner for a set of kinds (compiled once per process)."""
+    return EntityScanner(kinds)
+
+
+def scan_entities(text: str, kinds: Iterable[str] = ENTITY_KINDS) -> list[EntityMatch]:
+    return get_scanner(tuple(kinds)).scan(text)
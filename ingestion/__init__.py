@@ -0,0 +1,25 @@
+"""
+Ingestion Module
+
+This module turns input files into entries of the shared retrieval index:
+- A file manifest (path, size, mtime, content hash, chunk hashes)
+- Incremental re-indexing that only re-embeds changed chunks
+- A staged pipeline: threaded read/chunk, cross-file embedding batches
+- Near-duplicate chunk clustering so shared boilerplate is embedded once
+- PDF/XLSX/PPTX text extraction in a process pool, cached by file hash
+"""
+
+from ingestion.extractors import DocumentExtractor, collect_input_files
+from ingestion.loader import IndexReport, IngestOptions, load_input_files, reindex_files
+from ingestion.manifest import FileManifest, ManifestEntry
+
+__all__ = [
+    "DocumentExtractor",
+    "FileManifest",
+    "IndexReport",
+    "IngestOptions",
+    "ManifestEntry",
+    "collect_input_files",
+    "load_input_files",
+    "reindex_files",
+]
@@ -0,0 +1,263 @@
+"""Text extraction for PDF, Excel and PowerPoint evidence files."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator
+from xml.etree import ElementTree
+
+from ingestion.spreadsheet import iter_sheet_chunks
+
+# Read as UTF-8 text as-is; everything else goes through an extractor
+TEXT_SUFFIXES = frozenset({".txt", ".md", ".csv"})
+
+# Bump when an extractor's output format changes, so cached text is redone
+EXTRACTOR_VERSION = 2
+
+# Spreadsheets are chunked by rows at extraction time; the chunk spans are
+# written next to the text as JSON lines
+SPREADSHEET_SUFFIXES = frozenset({".xlsx", ".xlsm"})
+CHUNK_INDEX_SUFFIX = ".chunks.jsonl"
+_CHUNK_SEPARATOR = "\n\n"
+
+_DRAWINGML = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+def _extract_pdf(path: Path) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError as exc:
+        raise ImportError("PDF の取り込みには pypdf が必要です: pip install pypdf") from exc
+
+    reader = PdfReader(str(path))
+    pages = []
+    for number, page in enumerate(reader.pages, 1):
+        pages.append(f"## ページ {number}\n{(page.extract_text() or '').strip()}")
+    return "\n\n".join(pages)
+
+
+def _extract_xlsx(path: Path) -> str:
+    return _CHUNK_SEPARATOR.join(text for text, _ in iter_sheet_chunks(path))
+
+
+def _write_sheet_chunks(path: Path, target: str, rows_per_chunk: int, max_chars: int) -> None:
+    # Stream row chunks to the text file and their spans to the chunk index,
+    # so neither the workbook nor its text is ever held in memory whole
+    offset = 0
+    with open(target, "w", encoding="utf-8", newline="") as text_fp, open(
+        target + CHUNK_INDEX_SUFFIX, "w", encoding="utf-8"
+    ) as index_fp:
+        for text, meta in iter_sheet_chunks(path, rows_per_chunk, max_chars):
+            if offset:
+                text_fp.write(_CHUNK_SEPARATOR)
+                offset += len(_CHUNK_SEPARATOR)
+            text_fp.write(text)
+            span = {"start": offset, "end": offset + len(text), **meta}
+            index_fp.write(json.dumps(span, ensure_ascii=False) + "\n")
+            offset += len(text)
+
+
+def _slide_number(name: str) -> int:
+    match = re.search(r"(\d+)\.xml$", name)
+    return int(match.group(1)) if match else 0
+
+
+def _extract_pptx(path: Path) -> str:
+    # A .pptx is a zip of DrawingML parts; text runs live in <a:t> inside <a:p>
+    slides = []
+    with zipfile.ZipFile(path) as archive:
+        names = [
+            n for n in archive.namelist()
+            if re.fullmatch(r"ppt/slides/slide\d+\.xml", n)
+        ]
+        for name in sorted(names, key=_slide_number):
+            root = ElementTree.fromstring(archive.read(name))
+            paragraphs = []
+            for paragraph in root.iter(f"{_DRAWINGML}p"):
+                text = "".join(run.text or "" for run in paragraph.iter(f"{_DRAWINGML}t"))
+                if text.strip():
+                    paragraphs.append(text.strip())
+            slides.append(f"## スライド {_slide_number(name)}\n" + "\n".join(paragraphs))
+    return "\n\n".join(slides)
+
+
+EXTRACTORS: dict[str, Callable[[Path], str]] = {
+    ".pdf": _extract_pdf,
+    ".xlsx": _extract_xlsx,
+    ".xlsm": _extract_xlsx,
+    ".pptx": _extract_pptx,
+}
+
+SUPPORTED_SUFFIXES = TEXT_SUFFIXES | frozenset(EXTRACTORS)
+
+
+# What collect_input_files picks up from an evidence folder by default
+EVIDENCE_SUFFIXES = frozenset({".txt", ".pdf", ".xlsx", ".pptx"})
+
+
+def collect_input_files(
+    root: str | Path, suffixes: frozenset[str] | set[str] = EVIDENCE_SUFFIXES
+) -> list[str]:
+    """List every file under ``root`` with one of ``suffixes``, in path order."""
+    return sorted(
+        str(path)
+        for path in Path(root).rglob("*")
+        if path.is_file() and path.suffix.lower() in suffixes
+    )
+
+
+def needs_extraction(path: str | Path) -> bool:
+    """True if the file has to go through an extractor rather than be read as text."""
+    return Path(path).suffix.lower() in EXTRACTORS
+
+
+def extract_text(path: str | Path) -> str:
+    """Extract the text of one document (runs in a worker process)."""
+    path = Path(path)
+    extractor = EXTRACTORS.get(path.suffix.lower())
+    if extractor is None:
+        raise ValueError(f"unsupported file type: {path.suffix}")
+    return extractor(path)
+
+
+def read_chunk_index(text_path: str | Path) -> Iterator[dict[str, Any]] | None:
+    """
+    Chunk spans written with an extracted text, or None if it has none.
+
+    Each span is ``{"start", "end", ...metadata}`` in character offsets of
+    the text file, in order.
+    """
+    index_path = Path(str(text_path) + CHUNK_INDEX_SUFFIX)
+    if not index_path.exists():
+        return None
+
+    def spans() -> Iterator[dict[str, Any]]:
+        with index_path.open(encoding="utf-8") as fp:
+            for line in fp:
+                yield json.loads(line)
+
+    return spans()
+
+
+def _extract_to(path: str, target: str, rows_per_chunk: int, max_chars: int) -> str:
+    # Worker: write the text straight to the cache so it is not pickled back.
+    # Outputs are written under a temporary name and renamed index-first, so
+    # a text file that exists always has its chunk index next to it.
+    tmp = f"{target}.{os.getpid()}.tmp"
+    if Path(path).suffix.lower() in SPREADSHEET_SUFFIXES:
+        _write_sheet_chunks(Path(path), tmp, rows_per_chunk, max_chars)
+        os.replace(tmp + CHUNK_INDEX_SUFFIX, target + CHUNK_INDEX_SUFFIX)
+    else:
+        Path(tmp).write_text(extract_text(path), encoding="utf-8", newline="")
+    os.replace(tmp, target)
+    return target
+
+
+class DocumentExtractor:
+    """
+    Extracts documents in a process pool and caches the text by content hash.
+
+    Extraction (PDF text layout, workbook parsing) is CPU-bound, so it runs
+    in worker processes rather than the ingestion threads. The text is
+    written to ``<cache_dir>/<content hash>.v<version>.txt`` and later runs reuse it for
+    any file with the same bytes, whatever its path. Callers stream the
+    cached text file into the chunker just like a plain ``.txt`` input;
+    spreadsheets come already chunked by rows (see ``read_chunk_index``).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        workers: int | None = None,
+        sheet_rows_per_chunk: int = 50,
+        sheet_max_chars: int = 2000,
+    ):
+        """
+        Initialize the extractor.
+
+        Args:
+            cache_dir: Directory for extracted text (a temporary one if omitted)
+            workers: Worker processes (defaults to the CPU count)
+            sheet_rows_per_chunk: Maximum rows per spreadsheet chunk
+            sheet_max_chars: Maximum characters per spreadsheet chunk
+        """
+        self.sheet_rows_per_chunk = sheet_rows_per_chunk
+        self.sheet_max_chars = sheet_max_chars
+        self._tmpdir = None
+        if cache_dir is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="extracted-")
+            cache_dir = self._tmpdir.name
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.hits = 0
+        self.misses = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "DocumentExtractor":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Start the worker processes now.
+
+        Called before the ingestion threads exist, so workers are not forked
+        from a process that already has other threads running.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            pool = self._pool
+        pool.submit(int).result()
+
+    def cached_path(self, content_hash: str, suffix: str = "") -> Path:
+        variant = ""
+        if suffix.lower() in SPREADSHEET_SUFFIXES:
+            variant = f".rows{self.sheet_rows_per_chunk}x{self.sheet_max_chars}"
+        return self.cache_dir / f"{content_hash}.v{EXTRACTOR_VERSION}{variant}.txt"
+
+    def submit(self, path: str | Path, content_hash: str) -> Future:
+        """
+        Start extracting a file unless its text is already cached.
+
+        Returns:
+            Future resolving to the path of the extracted UTF-8 text
+        """
+        target = self.cached_path(content_hash, Path(path).suffix)
+        with self._lock:
+            if target.exists():
+                self.hits += 1
+                future: Future = Future()
+                future.set_result(str(target))
+                return future
+            self.misses += 1
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            return self._pool.submit(
+                _extract_to,
+                str(path),
+                str(target),
+                self.sheet_rows_per_chunk,
+                self.sheet_max_chars,
+            )
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,523 @@
+"""Load input files into the shared vector index, re-indexing incrementally."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from langchain_core.embeddings import Embeddings
+
+from ingestion.extractors import DocumentExtractor, needs_extraction, read_chunk_index
+from ingestion.manifest import (
+    FileManifest,
+    HashingReader,
+    ManifestEntry,
+    hash_chunk,
+    hash_file,
+)
+from retrieval.corpus_store import CorpusStore
+from tools import (
+    get_chunk_count,
+    get_corpus,
+    get_duplicate_index,
+    get_vector_index,
+    index_file_entities,
+    init_vector_index,
+    is_registered,
+    register_vector_store,
+    start_background_embedding,
+    unregister_file,
+)
+from utils import _iter_cdc_chunks, _iter_chunks, _make_file_id
+
+
+@dataclass
+class IngestOptions:
+    """Tuning knobs for the ingestion pipeline."""
+
+    # "fixed": fixed-size windows with overlap; "content": content-defined
+    # boundaries at sentence ends, so an edit only changes nearby chunks
+    chunking: str = "fixed"
+    chunk_size: int = 900
+    chunk_overlap: int = 150
+    min_chunk_size: int = 200
+    max_chunk_size: int = 1800
+    # Spreadsheets are chunked by whole rows, repeating the header row
+    sheet_rows_per_chunk: int = 50
+    sheet_max_chars: int = 2000
+    # Threads that stat/read/hash/chunk files
+    read_workers: int = 4
+    # Processes that extract text from PDF/XLSX/PPTX (defaults to the CPU
+    # count), and where the extracted text is cached by file hash
+    extract_workers: int | None = None
+    extraction_cache_dir: str | None = None
+    # Chunks (possibly from several files) per embed_documents call
+    embed_batch_size: int = 64
+    # Maximum number of embed_documents calls in flight
+    embed_concurrency: int = 4
+    # Register files without embedding them; chunks are embedded on first
+    # search, or in the background once tool calls have been idle this long
+    lazy_embedding: bool = False
+    idle_seconds: float = 2.0
+    # Cluster near-identical chunks across files (MinHash) and embed each
+    # cluster once; every occurrence is still registered under its own chunk
+    deduplicate: bool = True
+
+    @property
+    def chunker_key(self) -> str:
+        """Identifies the chunking settings; spans are only reused if it matches."""
+        sheets = f"sheet:{self.sheet_rows_per_chunk}:{self.sheet_max_chars}"
+        if self.chunking == "content":
+            return f"content:{self.min_chunk_size}:{self.max_chunk_size}|{sheets}"
+        return f"fixed:{self.chunk_size}:{self.chunk_overlap}|{sheets}"
+
+    def iter_chunks(
+        self, source: Any, sink: Callable[[str], Any] | None = None
+    ) -> Iterator[tuple[int, int, int, str]]:
+        """Chunk a binary stream with the configured chunker."""
+        if self.chunking == "content":
+            return _iter_cdc_chunks(
+                source, self.min_chunk_size, self.max_chunk_size, sink=sink
+            )
+        if self.chunking != "fixed":
+            raise ValueError(f"unknown chunking mode: {self.chunking}")
+        return _iter_chunks(source, self.chunk_size, self.chunk_overlap, sink=sink)
+
+
+@dataclass
+class IndexReport:
+    """Summary of one (re-)indexing pass."""
+
+    loaded: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    embedded_chunks: int = 0
+    reused_chunks: int = 0
+    deferred_chunks: int = 0
+    # Chunks that took the vector of a near-identical chunk instead of being embedded
+    deduplicated_chunks: int = 0
+    # PDF/XLSX/PPTX files whose text was extracted, or taken from the cache
+    extracted_files: int = 0
+    extraction_cache_hits: int = 0
+    # Entity occurrences (amounts, dates, parties, IDs) indexed from loaded files
+    entities: int = 0
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Share of the chunks that needed a vector which were served by dedup."""
+        needed = self.embedded_chunks + self.deferred_chunks + self.deduplicated_chunks
+        return self.deduplicated_chunks / needed if needed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"loaded={len(self.loaded)} unchanged={len(self.unchanged)} "
+            f"removed={len(self.removed)} embedded_chunks={self.embedded_chunks} "
+            f"reused_chunks={self.reused_chunks} deferred_chunks={self.deferred_chunks} "
+            f"deduplicated_chunks={self.deduplicated_chunks} "
+            f"dedup_ratio={self.dedup_ratio:.1%} "
+            f"extracted_files={self.extracted_files} "
+            f"extraction_cache_hits={self.extraction_cache_hits} "
+            f"entities={self.entities}"
+        )
+
+
+@dataclass
+class _PreparedFile:
+    """A file after the read/chunk stage, waiting for its missing vectors."""
+
+    file_str: str
+    file_id: str
+    status: str  # "missing", "unchanged", "restamped", "restored", "changed"
+    stat: os.stat_result | None = None
+    content_hash: str = ""
+    chunk_hashes: list[str] = field(default_factory=list)
+    vectors: list[list[float] | None] = field(default_factory=list)
+    pending: int = 0
+    # MinHash signature and near-duplicate cluster of each chunk (if deduplicating)
+    signatures: list[Any] = field(default_factory=list)
+    clusters: list[int] = field(default_factory=list)
+
+    def chunk(self, i: int) -> str:
+        return get_corpus().read_chunk(self.file_id, i)
+
+
+def _reusable_vectors(entry: ManifestEntry) -> dict[str, list[float]]:
+    """Map chunk hash -> vector for the chunks currently indexed for a file."""
+    chunk_ids, vectors = get_vector_index().get_vectors(entry.file_id)
+    reusable: dict[str, list[float]] = {}
+    for chunk_id, vector in zip(chunk_ids, vectors):
+        if chunk_id < len(entry.chunk_hashes):
+            reusable[entry.chunk_hashes[chunk_id]] = vector.tolist()
+    return reusable
+
+
+def _prepare_file(
+    file_str: str,
+    file_id: str,
+    entry: ManifestEntry | None,
+    registered: bool,
+    options: IngestOptions,
+    extractor: DocumentExtractor,
+) -> _PreparedFile:
+    """
+    Read stage: stat, hash and chunk one file (runs in a worker thread).
+
+    The file is streamed through the chunker straight into the corpus
+    store; no Python string of the whole file is kept. A file that the
+    manifest and the persisted corpus already describe is "restored" without
+    reading the source at all. PDF/XLSX/PPTX files are first extracted (in
+    the extractor's process pool, or from its cache) and their text is
+    streamed instead; the content hash is still that of the original bytes.
+    """
+    path = Path(file_str)
+    if not path.exists():
+        return _PreparedFile(file_str, file_id, "missing")
+
+    corpus = get_corpus()
+    stat = path.stat()
+    same_chunking = entry is not None and entry.chunker == options.chunker_key
+    if registered and same_chunking and entry.matches_stat(stat):
+        return _PreparedFile(file_str, file_id, "unchanged", stat)
+
+    duplicates = get_duplicate_index()
+    record = corpus.get(file_id)
+    if (
+        not registered
+        and same_chunking
+        and entry.matches_stat(stat)
+        and record is not None
+        and record.content_hash == entry.content_hash
+    ):
+        signatures = []
+        if options.deduplicate:
+            signatures = [
+                duplicates.signature(corpus.read_chunk(file_id, i))
+                for i in range(record.span_count)
+            ]
+        return _PreparedFile(
+            file_str,
+            file_id,
+            "restored",
+            stat,
+            entry.content_hash,
+            list(entry.chunk_hashes),
+            [None] * record.span_count,
+            signatures=signatures,
+        )
+
+    content_hash = ""
+    if registered and same_chunking:
+        # Hash first: an unchanged file (e.g. only touched) is not re-chunked
+        content_hash = hash_file(path)
+        if entry.content_hash == content_hash:
+            return _PreparedFile(file_str, file_id, "restamped", stat, content_hash)
+
+    source = path
+    spans = None
+    if needs_extraction(path):
+        content_hash = content_hash or hash_file(path)
+        source = Path(extractor.submit(path, content_hash).result())
+        spans = read_chunk_index(source)
+
+    # Stream the file once through the chunker into the corpus, hashing it on the way
+    chunk_hashes: list[str] = []
+    signatures = []
+
+    def add(writer, start: int, chunk: str, meta: dict[str, Any] | None = None) -> None:
+        writer.add_span(start, chunk, meta)
+        chunk_hashes.append(hash_chunk(chunk))
+        if options.deduplicate:
+            signatures.append(duplicates.signature(chunk))
+
+    if spans is not None:
+        # Already chunked at extraction time (spreadsheet rows): copy the
+        # chunks and their sheet/row metadata as they are
+        with source.open(encoding="utf-8", newline="") as fp, corpus.writer(file_id) as writer:
+            position = 0
+            for span in spans:
+                writer.write(fp.read(span["start"] - position))
+                chunk = fp.read(span["end"] - span["start"])
+                writer.write(chunk)
+                meta = {k: v for k, v in span.items() if k not in ("start", "end")}
+                add(writer, span["start"], chunk, meta)
+                position = span["end"]
+            writer.content_hash = content_hash
+            writer.commit()
+    else:
+        with source.open("rb") as fp, corpus.writer(file_id) as writer:
+            reader = HashingReader(fp)
+            for _, start, _, chunk in options.iter_chunks(reader, sink=writer.write):
+                add(writer, start, chunk)
+            writer.content_hash = content_hash if source is not path else reader.hexdigest()
+            writer.commit()
+
+    # Only chunks whose content changed need a new embedding
+    reusable = _reusable_vectors(entry) if registered else {}
+    return _PreparedFile(
+        file_str,
+        file_id,
+        "changed",
+        stat,
+        writer.content_hash,
+        chunk_hashes,
+        [reusable.get(h) for h in chunk_hashes],
+        signatures=signatures,
+    )
+
+
+def reindex_files(
+    input_files: list[str],
+    embeddings: Embeddings,
+    manifest: FileManifest | None = None,
+    options: IngestOptions | None = None,
+) -> IndexReport:
+    """
+    Bring the shared index in line with ``input_files``.
+
+    Files whose size and mtime match the manifest (and that are still
+    registered) are skipped without being read. Files whose bytes hash to the
+    recorded content hash are only re-stamped. Changed files are re-chunked and
+    only chunks whose hash is new are sent to the embedding model; vectors of
+    unchanged chunks are taken from the index. Files that were indexed before
+    but are no longer listed (or no longer exist) are evicted.
+
+    The work runs as a staged pipeline: files are read and chunked in a thread
+    pool, missing chunks from all files are pooled into embedding batches of
+    ``embed_batch_size`` sent with at most ``embed_concurrency`` calls in
+    flight, and each file is registered as soon as its last batch completes.
+    Near-identical chunks (within or across files) are clustered first and
+    only one chunk per cluster is embedded; the other occurrences wait for
+    that vector, or take it from the index if it is already there.
+    With ``lazy_embedding`` no batches are sent at all: each file is
+    registered as soon as it is chunked and embedded on first search, where
+    chunks of the same cluster are still embedded only once.
+
+    Args:
+        input_files: The full set of file paths that make up the corpus
+        embeddings: Embeddings model for chunks
+        manifest: Manifest from the previous pass (an empty one if omitted)
+        options: Chunking and concurrency settings
+
+    Returns:
+        IndexReport describing what was done
+    """
+    manifest = manifest if manifest is not None else FileManifest()
+    options = options or IngestOptions()
+    report = IndexReport()
+    wanted = list(dict.fromkeys(input_files))
+    wanted_set = set(wanted)
+
+    # Evict files that disappeared from the corpus
+    for path_str in list(manifest.entries):
+        if path_str not in wanted_set or not Path(path_str).exists():
+            entry = manifest.remove(path_str)
+            unregister_file(entry.file_id)
+            report.removed.append(entry.file_id)
+
+    # File ids are assigned up front, in input order, so they stay deterministic
+    used_ids = manifest.file_ids()
+    jobs = []
+    for file_str in wanted:
+        entry = manifest.get(file_str)
+        file_id = entry.file_id if entry else _make_file_id(Path(file_str), used_ids)
+        registered = entry is not None and is_registered(entry.file_id)
+        jobs.append((file_str, file_id, entry, registered))
+
+    def finish(prepared: _PreparedFile) -> None:
+        # Entities are extracted once here, from the text just written to the corpus
+        report.entities += index_file_entities(prepared.file_id)
+        register_vector_store(
+            file_id=prepared.file_id,
+            vectors=prepared.vectors,
+            source_path=prepared.file_str,
+            lazy=options.lazy_embedding,
+        )
+        manifest.set(
+            ManifestEntry(
+                path=prepared.file_str,
+                file_id=prepared.file_id,
+                size=prepared.stat.st_size,
+                mtime_ns=prepared.stat.st_mtime_ns,
+                content_hash=prepared.content_hash,
+                chunk_hashes=prepared.chunk_hashes,
+                chunker=options.chunker_key,
+            )
+        )
+        report.loaded.append(prepared.file_id)
+        settled.add(prepared.file_id)
+
+    duplicates = get_duplicate_index()
+    # Vector known for each near-duplicate cluster, and chunks waiting for one
+    cluster_vectors: dict[int, Any] = {}
+    waiting: dict[int, list[tuple[_PreparedFile, int]]] = {}
+    # Files whose rows in the index match their current chunks
+    settled: set[str] = set()
+    indexed_rows: dict[str, dict[int, Any]] = {}
+
+    def indexed_vector(cluster: int) -> Any:
+        for file_id, chunk in duplicates.occurrences(cluster):
+            if file_id not in settled:
+                continue
+            if file_id not in indexed_rows:
+                chunk_ids, vectors = get_vector_index().get_vectors(file_id)
+                indexed_rows[file_id] = dict(zip(chunk_ids.tolist(), vectors))
+            vector = indexed_rows[file_id].get(chunk)
+            if vector is not None:
+                return vector.tolist()
+        return None
+
+    def deliver(prepared: _PreparedFile, i: int, vector: Any) -> None:
+        prepared.vectors[i] = vector
+        prepared.pending -= 1
+        if prepared.pending == 0:
+            finish(prepared)
+
+    def collect(future: Future) -> None:
+        for (prepared, i), vector in zip(in_flight.pop(future), future.result()):
+            if prepared.clusters:
+                cluster = prepared.clusters[i]
+                cluster_vectors[cluster] = vector
+                for other, j in waiting.pop(cluster, []):
+                    deliver(other, j, vector)
+            deliver(prepared, i, vector)
+
+    batch: list[tuple[_PreparedFile, int]] = []
+    in_flight: dict[Future, list[tuple[_PreparedFile, int]]] = {}
+
+    extractor = DocumentExtractor(
+        options.extraction_cache_dir,
+        options.extract_workers,
+        options.sheet_rows_per_chunk,
+        options.sheet_max_chars,
+    )
+    # Reader threads block on extraction results, so add one per extraction process
+    n_extract = sum(needs_extraction(job[0]) for job in jobs)
+    n_readers = options.read_workers + min(n_extract, extractor.workers)
+    if n_extract:
+        extractor.start()
+
+    with extractor, ThreadPoolExecutor(n_readers) as readers, ThreadPoolExecutor(
+        options.embed_concurrency
+    ) as embedders:
+
+        def flush() -> None:
+            nonlocal batch
+            texts = [prepared.chunk(i) for prepared, i in batch]
+            in_flight[embedders.submit(embeddings.embed_documents, texts)] = batch
+            batch = []
+
+        read_futures = [
+            readers.submit(_prepare_file, *job, options=options, extractor=extractor)
+            for job in jobs
+        ]
+        for read_future in as_completed(read_futures):
+            prepared = read_future.result()
+            if prepared.status == "missing":
+                print(f"Warning: File not found: {prepared.file_str}")
+                continue
+            if prepared.status in ("unchanged", "restamped"):
+                entry = manifest.get(prepared.file_str)
+                entry.size, entry.mtime_ns = prepared.stat.st_size, prepared.stat.st_mtime_ns
+                report.unchanged.append(prepared.file_id)
+                settled.add(prepared.file_id)
+                continue
+
+            missing = [i for i, vector in enumerate(prepared.vectors) if vector is None]
+            report.reused_chunks += len(prepared.vectors) - len(missing)
+
+            to_embed = missing
+            if prepared.signatures:
+                duplicates.remove_file(prepared.file_id)
+                prepared.clusters = [
+                    duplicates.add(prepared.file_id, i, signature)
+                    for i, signature in enumerate(prepared.signatures)
+                ]
+                for i, vector in enumerate(prepared.vectors):
+                    if vector is not None:
+                        cluster_vectors.setdefault(prepared.clusters[i], vector)
+                to_embed = []
+                for i in missing:
+                    cluster = prepared.clusters[i]
+                    vector = cluster_vectors.get(cluster)
+                    if vector is None:
+                        vector = indexed_vector(cluster)
+                    if vector is not None:
+                        cluster_vectors[cluster] = prepared.vectors[i] = vector
+                        report.deduplicated_chunks += 1
+                    elif cluster in waiting:
+                        # Another chunk of this cluster is already queued for
+                        # embedding; deferred ones share it when it is embedded
+                        if not options.lazy_embedding:
+                            waiting[cluster].append((prepared, i))
+                            prepared.pending += 1
+                        report.deduplicated_chunks += 1
+                    else:
+                        waiting[cluster] = []
+                        to_embed.append(i)
+
+            if options.lazy_embedding:
+                report.deferred_chunks += len(to_embed)
+                finish(prepared)
+                continue
+            prepared.pending += len(to_embed)
+            report.embedded_chunks += len(to_embed)
+            if not prepared.pending:
+                finish(prepared)
+            for i in to_embed:
+                batch.append((prepared, i))
+                if len(batch) >= options.embed_batch_size:
+                    flush()
+
+            # Register files whose batches already came back
+            for future in [f for f in in_flight if f.done()]:
+                collect(future)
+
+        if batch:
+            flush()
+        for future in as_completed(list(in_flight)):
+            collect(future)
+
+    extraction = extractor.stats()
+    report.extracted_files = extraction["misses"]
+    report.extraction_cache_hits = extraction["hits"]
+    report.loaded.sort()
+    report.unchanged.sort()
+    get_corpus().flush()
+    manifest.save()
+    return report
+
+
+def load_input_files(
+    input_files: list[str],
+    embeddings: Embeddings,
+    manifest: FileManifest | None = None,
+    options: IngestOptions | None = None,
+    corpus: CorpusStore | None = None,
+) -> dict[str, int]:
+    """
+    Load input files into a fresh shared vector index.
+
+    Args:
+        input_files: List of file paths to load
+        embeddings: Embeddings model for chunks and queries
+        manifest: Optional manifest to record what was indexed
+        options: Chunking and concurrency settings
+        corpus: Corpus store for the text (a temporary one if omitted); the
+            bytes of files replaced or evicted on earlier runs are compacted
+            away before indexing
+
+    Returns:
+        Dict mapping file_id to its number of chunks
+    """
+    options = options or IngestOptions()
+    if corpus is not None:
+        corpus.compact()
+    init_vector_index(embeddings, corpus)
+    report = reindex_files(input_files, embeddings, manifest, options)
+    print(f"  Index: {report.summary()}")
+    if options.lazy_embedding:
+        start_background_embedding(options.idle_seconds)
+    return {file_id: get_chunk_count(file_id) for file_id in report.loaded}
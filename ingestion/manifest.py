@@ -0,0 +1,143 @@
+"""File manifest used to decide what needs re-indexing."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO
+
+_READ_BLOCK = 1 << 20
+
+
+def hash_file(path: str | Path) -> str:
+    """Content hash of a file, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(_READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HashingReader:
+    """
+    Binary reader that hashes everything read through it.
+
+    Lets a single streaming pass both chunk a file and compute its content
+    hash (same value as ``hash_file``).
+    """
+
+    def __init__(self, fp: BinaryIO):
+        self._fp = fp
+        self._digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        block = self._fp.read(size)
+        self._digest.update(block)
+        return block
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def hash_chunk(text: str) -> str:
+    """Content hash of a single chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    """What the index last saw for one input file."""
+
+    path: str
+    file_id: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    chunk_hashes: list[str] = field(default_factory=list)
+    chunker: str = ""
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        """True if size and mtime are unchanged (the file need not be re-read)."""
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ManifestEntry":
+        return cls(
+            path=data["path"],
+            file_id=data["file_id"],
+            size=int(data["size"]),
+            mtime_ns=int(data["mtime_ns"]),
+            content_hash=data["content_hash"],
+            chunk_hashes=list(data.get("chunk_hashes", [])),
+            chunker=data.get("chunker", ""),
+        )
+
+
+class FileManifest:
+    """
+    Record of path, size, mtime, content hash and chunk hashes per file.
+
+    The manifest is keyed by the path string given to the loader. It is kept
+    in memory and, when constructed with a path, persisted as JSON so that a
+    later process can reuse it.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str | Path | None = None):
+        """
+        Initialize the manifest, loading it from disk if it exists.
+
+        Args:
+            path: Optional JSON file to persist the manifest to
+        """
+        self.path = Path(path) if path else None
+        self.entries: dict[str, ManifestEntry] = {}
+        if self.path and self.path.exists():
+            self.load()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.entries
+
+    def get(self, path: str) -> ManifestEntry | None:
+        return self.entries.get(path)
+
+    def set(self, entry: ManifestEntry) -> None:
+        self.entries[entry.path] = entry
+
+    def remove(self, path: str) -> ManifestEntry | None:
+        return self.entries.pop(path, None)
+
+    def file_ids(self) -> set[str]:
+        return {entry.file_id for entry in self.entries.values()}
+
+    def load(self) -> None:
+        """Load entries from the JSON file (a version mismatch starts empty)."""
+        if not self.path:
+            return
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("version") != self.VERSION:
+            self.entries = {}
+            return
+        self.entries = {
+            e["path"]: ManifestEntry.from_dict(e) for e in data.get("files", [])
+        }
+
+    def save(self) -> None:
+        """Write entries to the JSON file atomically."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": self.VERSION,
+            "files": [self.entries[p].to_dict() for p in sorted(self.entries)],
+        }
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
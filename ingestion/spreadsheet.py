@@ -0,0 +1,138 @@
+"""Row-aware chunking of spreadsheets, streamed with openpyxl read-only mode."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from utils import cell_text, detect_header, trim_cells
+
+
+class _SheetChunker:
+    """Groups the rows of one sheet into chunks that each repeat the header."""
+
+    def __init__(self, sheet: str, rows_per_chunk: int, max_chars: int):
+        self.sheet = sheet
+        self.rows_per_chunk = rows_per_chunk
+        self.max_chars = max_chars
+        self.preamble: list[str] = []
+        self.header = ""
+        self.first_col = 0
+        self._lines: list[str] = []
+        self._chars = 0
+        self._first_row = 0
+        self._last_row = 0
+
+    def set_header(self, cells: list[str]) -> None:
+        self.first_col = next((i for i, cell in enumerate(cells) if cell), 0)
+        self.header = " | ".join(cells[self.first_col :])
+
+    def row_text(self, cells: list[str]) -> str:
+        # Drop the empty margin columns left of the table, but never data
+        if any(cells[: self.first_col]):
+            return " | ".join(cells)
+        return " | ".join(cells[self.first_col :])
+
+    def add(self, row: int, text: str) -> Iterator[tuple[str, dict[str, Any]]]:
+        full = len(self._lines) >= self.rows_per_chunk
+        if self._lines and (full or self._chars + len(text) > self.max_chars):
+            yield self.flush()
+        if not self._lines:
+            self._first_row = row
+        self._lines.append(text)
+        self._chars += len(text) + 1
+        self._last_row = row
+
+    def flush(self) -> tuple[str, dict[str, Any]]:
+        label = f"[シート: {self.sheet} 行 {self._first_row}-{self._last_row}]"
+        parts = [label]
+        if self.preamble:
+            # Title/note rows above the table go with the first chunk only
+            parts.extend(self.preamble)
+            self.preamble = []
+        if self.header:
+            parts.append(self.header)
+        parts.extend(self._lines)
+        meta = {"sheet": self.sheet, "rows": [self._first_row, self._last_row]}
+        self._lines, self._chars = [], 0
+        return "\n".join(parts), meta
+
+    def finish(self) -> Iterator[tuple[str, dict[str, Any]]]:
+        if self._lines:
+            yield self.flush()
+
+
+def _start_table(
+    chunker: _SheetChunker, buffered: list[tuple[int, list[str]]], header_scan: int
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    header_at = detect_header(buffered, header_scan)
+    if header_at is not None:
+        chunker.set_header(buffered[header_at][1])
+        chunker.preamble = [" ".join(c for c in cells if c) for _, cells in buffered[:header_at]]
+        buffered = buffered[header_at + 1 :]
+    for row, cells in buffered:
+        yield from chunker.add(row, chunker.row_text(cells))
+
+
+def _chunk_rows(
+    sheet: str,
+    rows: Iterable[tuple[Any, ...]],
+    rows_per_chunk: int,
+    max_chars: int,
+    header_scan: int,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    chunker = _SheetChunker(sheet, rows_per_chunk, max_chars)
+    # Only the first rows are buffered, to find the header; the rest stream
+    buffered: list[tuple[int, list[str]]] = []
+    started = False
+    for number, values in enumerate(rows, 1):
+        cells = trim_cells([cell_text(v) for v in values])
+        if not cells:
+            continue
+        if started:
+            yield from chunker.add(number, chunker.row_text(cells))
+            continue
+        buffered.append((number, cells))
+        if len(buffered) >= header_scan:
+            started = True
+            yield from _start_table(chunker, buffered, header_scan)
+    if not started:
+        yield from _start_table(chunker, buffered, header_scan)
+    yield from chunker.finish()
+
+
+def iter_sheet_chunks(
+    path: str | Path,
+    rows_per_chunk: int = 50,
+    max_chars: int = 2000,
+    header_scan: int = 20,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    """
+    Stream a workbook as chunks of whole rows.
+
+    The workbook is opened in openpyxl's ``read_only`` mode, so rows are
+    parsed from the sheet XML as they are iterated and memory stays flat even
+    for 100k-row exports. In each sheet the header row is detected among the
+    first ``header_scan`` non-empty rows; rows after it are grouped into
+    chunks of at most ``rows_per_chunk`` rows / ``max_chars`` characters, and
+    every chunk starts with a ``[シート: name 行 a-b]`` label and the header,
+    so no row is split and each chunk can be read on its own.
+
+    Yields:
+        (chunk text, {"sheet": name, "rows": [first, last]}) with 1-based
+        worksheet row numbers
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _chunk_rows(
+                sheet.title,
+                sheet.iter_rows(values_only=True),
+                rows_per_chunk,
+                max_chars,
+                header_scan,
+            )
+    finally:
+        workbook.close()
@@ -5,6 +5,9 @@ This module provides domain-specific vector stores for:
 - Market pricing information
 - Vendor profiles
 - Audit rules and compliance requirements
+
+Market-pricing entries are also parsed into numeric price ranges keyed by
+category and unit, held in a sorted interval index for O(log n) checks.
 """
 
 from knowledge.knowledge_store import (
@@ -14,6 +17,14 @@ from knowledge.knowledge_store import (
     lookup_knowledge,
     get_available_categories,
 )
+from knowledge.market_prices import (
+    DEFAULT_RATES,
+    MarketPriceIndex,
+    PriceCheck,
+    PriceRange,
+    normalize_unit,
+    parse_price_ranges,
+)
 
 __all__ = [
     "DomainKnowledgeStore",
@@ -21,4 +32,10 @@ __all__ = [
     "register_knowledge",
     "lookup_knowledge",
     "get_available_categories",
+    "DEFAULT_RATES",
+    "MarketPriceIndex",
+    "PriceCheck",
+    "PriceRange",
+    "normalize_unit",
+    "parse_price_ranges",
 ]
@@ -10,6 +10,8 @@ from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import InMemoryVectorStore
 
+from retrieval.embedding_cache import with_query_cache
+
 
 class KnowledgeCategory(str, Enum):
     """Categories of domain knowledge."""
@@ -56,13 +58,14 @@ class DomainKnowledgeStore:
         Args:
             embeddings: The embedding model to use for vector stores
         """
-        self.embeddings = embeddings
+        # Queries go through the process-wide cache shared with the file search tools
+        self.embeddings = with_query_cache(embeddings)
         self._stores: dict[KnowledgeCategory, InMemoryVectorStore] = {}
         self._entries: dict[KnowledgeCategory, list[KnowledgeEntry]] = {}
 
         # Initialize stores for each category
         for category in KnowledgeCategory:
-            self._stores[category] = InMemoryVectorStore(embeddings)
+            self._stores[category] = InMemoryVectorStore(self.embeddings)
             self._entries[category] = []
 
     def add_entry(self, entry: KnowledgeEntry) -> None:
@@ -77,9 +80,24 @@ class DomainKnowledgeStore:
         self._entries[entry.category].append(entry)
 
     def add_entries(self, entries: list[KnowledgeEntry]) -> None:
-        """Add multiple knowledge entries."""
+        """
+        Add multiple knowledge entries.
+
+        Entries are embedded in one batch per category, so with a persistent
+        embedding cache only the entries that are not cached yet reach the
+        embedding API.
+        """
+        by_category: dict[KnowledgeCategory, list[KnowledgeEntry]] = {}
         for entry in entries:
-            self.add_entry(entry)
+            by_category.setdefault(entry.category, []).append(entry)
+
+        for category, category_entries in by_category.items():
+            self._stores[category].add_documents([e.to_document() for e in category_entries])
+            self._entries[category].extend(category_entries)
+
+    def get_entries(self, category: KnowledgeCategory | str) -> list[KnowledgeEntry]:
+        """Return the entries registered in a category."""
+        return list(self._entries[KnowledgeCategory(category)])
 
     def lookup(
         self, category: KnowledgeCategory | str, query: str, k: int = 3
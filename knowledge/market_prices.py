@@ -0,0 +1,471 @@
+"""Market price ranges parsed from the knowledge base, held in a sorted interval index."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable
+
+import numpy as np
+
+from entities.normalize import parse_amounts
+
+if TYPE_CHECKING:
+    from knowledge.knowledge_store import KnowledgeEntry
+
+# Yen per unit of each currency, used when a price and a market range are in different currencies
+DEFAULT_RATES = {"JPY": 1.0, "USD": 150.0, "EUR": 160.0, "GBP": 190.0}
+
+_AMOUNT = r"[$¥￥]?\s*\d[\d,]*(?:\.\d+)?\s*(?:万|千)?\s*(?:円|ドル)?"
+# "$2-$10", "¥10,000〜¥30,000", "1〜3万円", "$100-$200/時"
+_RANGE = re.compile(
+    rf"(?P<low>{_AMOUNT})\s*(?:[-‐–—〜～~－]|から)\s*(?P<high>{_AMOUNT})"
+    r"(?:\s*[/／]\s*(?P<unit>[^\s\d、。,，)）/／]{1,6}))?"
+)
+# Units written in front of a range: "1本あたり", "時間単価", "CPM"
+_UNIT_IN_LABEL = re.compile(r"1?\s*(?P<per>[^\s\d、。]{1,4}?)(?:あたり|当たり)|(?P<code>CPM|CPC|CPA|CPV)", re.IGNORECASE)
+_CURRENCY_MARK = re.compile(r"[$¥￥€£円]|ドル|USD|EUR|GBP|JPY", re.IGNORECASE)
+_TOPIC_SUFFIX = re.compile(r"の?(?:市場価格|標準価格帯|価格帯|標準価格|相場|時間単価|単価)$")
+# Trailing words between a label and its price ("ディスプレイ広告のCPMは業界平均で")
+_FILLERS = ("業界平均", "平均", "相場", "目安", "標準", "およそ", "約", "は", "が", "で", "の", ":", "：", " ", "　")
+_UNITS = {
+    "時": "時間", "時間": "時間", "h": "時間", "hr": "時間", "hour": "時間",
+    "本": "本", "記事": "本",
+    "月": "月", "ヶ月": "月", "か月": "月", "カ月": "月", "ケ月": "月", "month": "月",
+    "人月": "人月", "台": "台", "件": "件", "点": "点", "名": "名", "人": "名", "式": "式",
+    "cpm": "CPM", "1000imp": "CPM", "cpc": "CPC", "cpa": "CPA", "cpv": "CPV",
+}
+
+
+def normalize_unit(unit: str) -> str:
+    """Canonical unit ("記事" -> "本", "時" -> "時間", "cpm" -> "CPM"); unknown units as written."""
+    unit = unicodedata.normalize("NFKC", unit or "").strip()
+    return _UNITS.get(unit.lower(), unit)
+
+
+def _name(text: str) -> str:
+    return "".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i : i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def _strip_fillers(label: str) -> str:
+    changed = True
+    while changed and label:
+        changed = False
+        for filler in _FILLERS:
+            if label.endswith(filler):
+                label, changed = label[: -len(filler)], True
+    return label.strip()
+
+
+@dataclass
+class PriceRange:
+    """One market price range from a knowledge entry."""
+
+    source: str  # knowledge entry id
+    category: str  # the entry's topic ("デジタル広告", "コンサルティングサービス")
+    item: str  # what the range is for within the topic ("ディスプレイ広告", "シニア"), "" if the whole topic
+    unit: str  # canonical unit ("CPM", "時間", "本"), "" when the entry gives none
+    currency: str
+    low: float
+    high: float
+    text: str  # the sentence the range was read from
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "source": self.source,
+            "category": self.category,
+            "item": self.item,
+            "unit": self.unit,
+            "currency": self.currency,
+            "low": _plain(self.low),
+            "high": _plain(self.high),
+            "text": self.text,
+        }
+
+
+def _plain(value: float) -> int | float | None:
+    if value != value:  # NaN
+        return None
+    return int(value) if float(value).is_integer() else round(float(value), 4)
+
+
+def parse_price_ranges(entry_id: str, content: str, metadata: dict[str, Any] | None = None) -> list[PriceRange]:
+    """
+    Read the price ranges out of one market-pricing entry.
+
+    The text before the first colon is the topic ("デジタル広告の市場価格" ->
+    "デジタル広告"); every range's label is the text in front of it in its
+    sentence or clause. The unit comes from "/時"-style suffixes, "1本あたり"
+    or a CPM-style code in the label, and otherwise carries over from the
+    previous range of the entry ("プレミアム枠は$15-$30" after a CPM range).
+    """
+    head, colon, body = content.partition(":") if ":" in content[:40] else content.partition("：")
+    if not colon or len(head) > 40:
+        head, body = "", content
+    topic = _TOPIC_SUFFIX.sub("", head.strip()) or str((metadata or {}).get("type", entry_id))
+
+    found: list[tuple[str, str, str, str, str]] = []  # item, unit, low, high, sentence
+    unit = ""
+    for clause in re.split(r"[。、；;\n]", body):
+        start = 0
+        for match in _RANGE.finditer(clause):
+            label = clause[start : match.start()]
+            start = match.end()
+            named = _UNIT_IN_LABEL.search(label)
+            if match.group("unit"):
+                unit = normalize_unit(match.group("unit"))
+            elif named:
+                unit = normalize_unit(named.group("per") or named.group("code"))
+            if named:
+                label = label[: named.start()] + label[named.end() :]
+            low, high = match.group("low"), match.group("high")
+            # "1〜3万円": the multiplier and currency written once apply to both ends
+            for mark in ("万", "千"):
+                if mark in high and mark not in low:
+                    low += mark
+            if not re.search(r"[$¥￥]|円|ドル", low):
+                low += "円" if "円" in high or "¥" in high or "￥" in high else ("ドル" if "$" in high or "ドル" in high else "")
+            found.append((_strip_fillers(label.strip()), unit, low, high, clause.strip()))
+    if not found:
+        return []
+
+    lows = parse_amounts([f[2] for f in found])
+    highs = parse_amounts([f[3] for f in found])
+    ranges = []
+    for (item, unit, _, _, sentence), low, high, currency in zip(
+        found, lows.value.tolist(), highs.value.tolist(), highs.currency.tolist()
+    ):
+        if low != low or high != high:
+            continue
+        ranges.append(PriceRange(entry_id, topic, item, unit, currency, min(low, high), max(low, high), sentence))
+    return ranges
+
+
+@dataclass
+class PriceLocations:
+    """Where a batch of prices falls in the index, as arrays in input order."""
+
+    key: np.ndarray  # index key compared with, -1 when there is none
+    reason: np.ndarray  # units the category has when the unit did not match ("" otherwise)
+    value: np.ndarray  # price as given (NaN when unparseable)
+    currency: np.ndarray  # currency of the given price
+    price: np.ndarray  # price in the market range's currency
+    verdict: np.ndarray  # "within", "between_tiers", "below" or "above" (meaningful where key >= 0)
+    deviation: np.ndarray  # relative distance to the nearest bound, 0 inside the envelope
+    tier: np.ndarray  # position of the containing or nearest range
+    low: np.ndarray  # lowest bound of the key's ranges (the envelope compared with)
+    high: np.ndarray  # highest bound of the key's ranges
+    market_currency: np.ndarray  # currency of the key's ranges
+
+
+@dataclass
+class PriceCheck:
+    """A unit price compared with the market range of its category and unit."""
+
+    category: str
+    unit: str
+    price: float
+    currency: str
+    verdict: str  # "within", "between_tiers", "below", "above", "unit_mismatch" or "no_market_data"
+    matched: str = ""  # the category (and item) the price was compared with
+    deviation: float | None = None  # relative distance to the nearest bound (0 inside a range)
+    exceeds_threshold: bool = False
+    market: dict[str, Any] = field(default_factory=dict)  # envelope of the matched ranges
+    tier: PriceRange | None = None  # the range containing the price, or the nearest one
+    note: str = ""
+
+    def to_dict(self) -> dict[str, Any]:
+        result = {
+            "category": self.category,
+            "unit": self.unit,
+            "price": _plain(self.price),
+            "currency": self.currency,
+            "verdict": self.verdict,
+            "matched": self.matched,
+            "deviation": None if self.deviation is None else round(self.deviation, 4),
+            "exceeds_threshold": self.exceeds_threshold,
+            "market": self.market,
+            "tier": None if self.tier is None else self.tier.to_dict(),
+        }
+        if self.note:
+            result["note"] = self.note
+        return result
+
+
+class MarketPriceIndex:
+    """
+    Market price ranges keyed by category and unit, for O(log n) price checks.
+
+    Every key (a topic such as "コンサルティングサービス" or one of its items
+    such as "シニア", with a unit and currency) holds its ranges sorted by
+    lower bound, with the running maximum of the upper bounds. A price is
+    located with a binary search: the key's ranges starting at or below it
+    are a prefix, and it lies inside one of them exactly when the prefix's
+    running maximum reaches it; otherwise the range holding that maximum is
+    the nearest one below and the next range of the key the nearest above.
+
+    All keys share flat arrays sorted by (key, lower bound). Bounds are
+    replaced by their integer rank among all bounds, so a (key, price) pair
+    becomes one exact int64 and a whole batch of prices is located with a
+    single ``searchsorted``, whatever keys the prices belong to.
+    """
+
+    def __init__(self, ranges: Iterable[PriceRange], rates: dict[str, float] | None = None):
+        self.ranges = list(ranges)
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        keys: dict[tuple[str, str, str], int] = {}
+        member_key: list[int] = []
+        member_range: list[int] = []
+        self._topic: list[bool] = []
+        # Normalized topic/item name -> keys; each key's bigrams are built on the first fuzzy lookup
+        self._by_name: dict[str, list[int]] = {}
+        self._grams: list[set[str]] | None = None
+        for i, r in enumerate(self.ranges):
+            for name, is_topic in ((r.category, True), (f"{r.category} {r.item}", False) if r.item else (None, False)):
+                if name is None:
+                    continue
+                key = keys.get((name, r.unit, r.currency))
+                if key is None:
+                    key = keys[(name, r.unit, r.currency)] = len(keys)
+                    self._topic.append(is_topic)
+                    for alias in {_name(name), _name(name if is_topic else r.item)}:
+                        self._by_name.setdefault(alias, []).append(key)
+                member_key.append(key)
+                member_range.append(i)
+        self._keys = list(keys)
+
+        lows = np.array([r.low for r in self.ranges], dtype=np.float64)
+        highs = np.array([r.high for r in self.ranges], dtype=np.float64)
+        member_key_a = np.asarray(member_key, dtype=np.int64)
+        member_range_a = np.asarray(member_range, dtype=np.int64)
+        order = np.lexsort((lows[member_range_a] if len(member_range_a) else lows[:0], member_key_a))
+        self._key = member_key_a[order]
+        self._range = member_range_a[order]
+        self._low = lows[self._range]
+        self._high = highs[self._range]
+        self._start = np.searchsorted(self._key, np.arange(len(keys)), side="left")
+        self._end = np.searchsorted(self._key, np.arange(len(keys)), side="right")
+
+        # Lower bounds as (key, rank) composites: a price's composite is its key
+        # and the number of distinct lower bounds at or below it
+        self._low_values = np.unique(self._low)
+        self._stride = len(self._low_values) + 1
+        self._low_key = self._key * self._stride + np.searchsorted(self._low_values, self._low, side="right")
+        # Running maximum of the upper bounds within each key, restarting per key
+        high_values, high_rank = np.unique(self._high, return_inverse=True)
+        ranked = self._key * (len(high_values) + 1) + high_rank.reshape(-1)
+        running = np.maximum.accumulate(ranked) if len(ranked) else ranked
+        self._reach = high_values[running - self._key * (len(high_values) + 1)] if len(ranked) else self._high
+        positions = np.arange(len(ranked))
+        self._reach_at = np.maximum.accumulate(np.where(ranked == running, positions, 0)) if len(ranked) else positions
+
+    @classmethod
+    def from_knowledge(
+        cls, entries: Iterable["KnowledgeEntry"], rates: dict[str, float] | None = None
+    ) -> "MarketPriceIndex":
+        """Parse the price ranges of market-pricing knowledge entries."""
+        ranges: list[PriceRange] = []
+        for entry in entries:
+            ranges.extend(parse_price_ranges(entry.id, entry.content, entry.metadata))
+        return cls(ranges, rates)
+
+    def _market(self, key: int) -> dict[str, Any]:
+        name, unit, currency = self._keys[key]
+        start, end = int(self._start[key]), int(self._end[key])
+        return {
+            "low": _plain(float(self._low[start])),
+            "high": _plain(float(self._reach[end - 1])),
+            "unit": unit,
+            "currency": currency,
+            "sources": sorted({self.ranges[r].source for r in self._range[start:end].tolist()}),
+        }
+
+    def categories(self) -> list[dict[str, Any]]:
+        """Every key with its unit, currency and envelope."""
+        return [
+            {
+                "category": name,
+                "unit": unit,
+                "currency": currency,
+                "low": _plain(float(self._low[self._start[k]])),
+                "high": _plain(float(self._reach[self._end[k] - 1])),
+                "ranges": int(self._end[k] - self._start[k]),
+            }
+            for k, (name, unit, currency) in enumerate(self._keys)
+        ]
+
+    def _resolve(self, category: str) -> list[int]:
+        """
+        Keys for a category: exact (normalized) topic or item name first,
+        otherwise the names sharing the most character bigrams with it (at
+        least half of the query's), preferring a topic over its items on ties.
+        """
+        name = _name(category)
+        if name in self._by_name:
+            return self._by_name[name]
+        if self._grams is None:
+            self._grams = [_bigrams(_name(key_name)) for key_name, _, _ in self._keys]
+        query = _bigrams(name)
+        scores = np.array([len(query & grams) / len(query) for grams in self._grams])
+        if not len(scores) or scores.max() < 0.5:
+            return []
+        best = np.flatnonzero(scores == scores.max()).tolist()
+        topics = [k for k in best if self._topic[k]]
+        return topics or best
+
+    def _key_for(self, category: str, unit: str) -> tuple[int, str]:
+        """The key a (category, unit) pair is checked against, or -1 and the units the category has."""
+        keys = self._resolve(category)
+        if not keys:
+            return -1, ""
+        if not unit:
+            return keys[0], ""
+        same = [k for k in keys if self._keys[k][1] == unit] or [k for k in keys if not self._keys[k][1]]
+        if same:
+            return same[0], ""
+        return -1, "、".join(sorted({self._keys[k][1] for k in keys}))
+
+    def locate(
+        self,
+        categories: Iterable[str],
+        prices: Iterable[Any],
+        units: Iterable[str] | None = None,
+        currency: str = "JPY",
+    ) -> PriceLocations:
+        """
+        Locate a batch of unit prices in the market ranges of their categories.
+
+        Categories are resolved once per distinct (category, unit) pair; all
+        prices are then converted and located with vectorized operations.
+        Arguments as for ``check``.
+        """
+        categories = [str(c) for c in categories]
+        prices = list(prices)
+        units = list(units) if units is not None else [""] * len(categories)
+        if not (len(categories) == len(prices) == len(units)):
+            raise ValueError("categories, prices and units must have the same length")
+        # Each distinct (category, unit) pair is resolved once; a dict finds
+        # them without sorting the strings as np.unique would
+        pairs: dict[tuple[str, str], int] = {}
+        pair_codes = np.fromiter(
+            (pairs.setdefault((c, str(u)), len(pairs)) for c, u in zip(categories, units)),
+            dtype=np.int64,
+            count=len(categories),
+        )
+        resolved = [self._key_for(c, normalize_unit(u)) for c, u in pairs]
+        key = np.array([k for k, _ in resolved], dtype=np.int64)[pair_codes]
+        reason = np.array([r for _, r in resolved] or [""], dtype=np.str_)[pair_codes]
+
+        texts = [i for i, p in enumerate(prices) if isinstance(p, str)]
+        currencies = np.full(len(prices), currency, dtype="U3")
+        if texts:
+            parsed = parse_amounts(prices)
+            values = parsed.value
+            explicit = [i for i in texts if _CURRENCY_MARK.search(prices[i])]
+            currencies[explicit] = parsed.currency[explicit]
+        else:
+            values = np.asarray(prices, dtype=np.float64).reshape(-1)
+        key_currencies = [c for _, _, c in self._keys] + [currency]
+        key_currency = np.array(key_currencies, dtype=np.str_)[key]
+        # Prices in yen, then in the market range's currency
+        rates = np.full(len(prices), self.rates.get(currency, np.nan))
+        if texts:
+            rates[explicit] = [self.rates.get(str(c), np.nan) for c in currencies[explicit].tolist()]
+        key_rates = np.array([self.rates.get(c, np.nan) for c in key_currencies])[key]
+        price = values * rates / key_rates
+
+        # The last range of the key starting at or below the price, then its running maximum
+        if not len(self._low):
+            empty, missing = np.zeros(len(prices), dtype=np.int64), np.full(len(prices), np.nan)
+            return PriceLocations(key, reason, values, currencies, price,
+                                  np.full(len(prices), "below"), missing, empty, missing, missing, key_currency)
+        safe = np.maximum(key, 0)
+        start, end = self._start[safe], self._end[safe]
+        rank = np.searchsorted(self._low_values, np.nan_to_num(price, nan=-np.inf), side="right")
+        at = np.searchsorted(self._low_key, safe * self._stride + rank, side="right") - 1
+        below = at < start
+        at = np.maximum(at, 0)
+        inside = ~below & (self._reach[at] >= price)
+        above = ~below & ~inside & (at == end - 1)
+        verdict = np.where(below, "below", np.where(inside, "within", np.where(above, "above", "between_tiers")))
+        tier = np.where(below, start, self._reach_at[at])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deviation = np.where(
+                below, price / self._low[start] - 1, np.where(above, price / self._reach[end - 1] - 1, 0.0)
+            )
+        # Rounded so that $12 against $10 counts as the 20% it is
+        return PriceLocations(
+            key, reason, values, currencies, price, verdict, np.round(deviation, 9), tier,
+            self._low[start], self._reach[end - 1], key_currency,
+        )
+
+    def check(
+        self,
+        categories: Iterable[str],
+        prices: Iterable[Any],
+        units: Iterable[str] | None = None,
+        currency: str = "JPY",
+        threshold: float = 0.2,
+    ) -> list[PriceCheck]:
+        """
+        Compare unit prices with the market ranges of their categories.
+
+        Args:
+            categories: Category per price ("コンサルティング シニア", "ディスプレイ広告", "エンタープライズサーバー")
+            prices: Unit prices (numbers, or amounts as text: "¥50,000", "$300")
+            units: Unit per price ("本", "記事", "時間", "CPM"; "" checks against the
+                category's first unit)
+            currency: Currency of prices given without one
+            threshold: Relative deviation from the market range reported as
+                exceeding it (AR001: 20%)
+
+        Returns:
+            One check per price, in input order. A price in another currency
+            than the range is converted with ``rates`` (yen per unit).
+        """
+        categories = [str(c) for c in categories]
+        units = list(units) if units is not None else [""] * len(categories)
+        found = self.locate(categories, prices, units, currency)
+        canonical = {u: normalize_unit(u) for u in set(units)}
+        # Per (key, currency): what every price compared with that key shares
+        shared: dict[tuple[int, str], tuple[str, str, dict[str, Any], bool]] = {}
+        exceeds = (np.abs(found.deviation) >= threshold).tolist()
+        tiers = self._range[np.where(found.key >= 0, found.tier, 0)] if len(self._range) else found.tier
+        ranges = self.ranges
+        checks = []
+        append = checks.append
+        for category, unit, k, reason, value, given, converted, verdict, deviation, over, tier in zip(
+            categories, units, *(a.tolist() for a in (
+                found.key, found.reason, found.value, found.currency, found.price,
+                found.verdict, found.deviation,
+            )), exceeds, tiers.tolist(),
+        ):
+            unit = canonical[unit]
+            if k < 0:
+                note = f"市場価格の単位は {reason}" if reason else "該当する市場価格の知識がありません"
+                append(PriceCheck(category, unit, value, given,
+                                  "unit_mismatch" if reason else "no_market_data", note=note))
+                continue
+            if value != value:
+                append(PriceCheck(category, unit, value, given, "no_market_data",
+                                  note="単価を数値として読み取れません"))
+                continue
+            known = shared.get((k, given))
+            if known is None:
+                market = self._market(k)
+                converts = given != market["currency"]
+                if converts:
+                    rate = self.rates.get(market["currency"], np.nan) / self.rates.get(given, np.nan)
+                    market["exchange_rate"] = f"1 {market['currency']} = {_plain(rate)} {given}"
+                known = shared[(k, given)] = (self._keys[k][0], market["unit"], market, converts)
+            matched, market_unit, market, converts = known
+            if converts:
+                market = {**market, "price_in_market_currency": _plain(converted)}
+            append(PriceCheck(category, unit or market_unit, value, given, verdict,
+                              matched, deviation, over, market, ranges[tier]))
+        return checks
@@ -5,18 +5,20 @@ from pathlib import Path
 
 import dotenv
 from langchain.agents import create_agent
-from langchain_core.documents import Document
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.agents.middleware import SummarizationMiddleware
 
+from ingestion import FileManifest, IngestOptions, load_input_files
+from retrieval.corpus_store import CorpusStore
+from retrieval.embedding_cache import CachedEmbeddings, PersistentEmbeddingCache
+
 import importlib
 import tools
 import utils
 importlib.reload(tools)
 importlib.reload(utils)
-from tools import list_indexed_files, read_file, register_vector_store, search_all_files, search_file
-from utils import _chunk_text, _make_file_id, pretty_print_event
+from tools import list_indexed_files, read_file, search_all_files, search_file
+from utils import pretty_print_event
 
 
 # %%
@@ -42,31 +44,26 @@ input_files = [
 ]
 
 model = ChatOpenAI(model="gpt-5-mini")
-embeddings = OpenAIEmbeddings()
-
-used_ids: set[str] = set()
+# チャンク埋め込みはディスク上のキャッシュに保存し、再実行時は未キャッシュ分のみ API を呼ぶ
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(), document_cache=PersistentEmbeddingCache(".cache/embeddings.sqlite")
+)
 
 for file_str in input_files:
     path = Path(file_str)
     if not path.exists():
         raise FileNotFoundError(f"File not found: {path}")
 
-    text = path.read_text(encoding="utf-8")
-    file_id = _make_file_id(path, used_ids)
-
-    chunks = _chunk_text(text, chunk_size=900, chunk_overlap=150)
-    docs = [
-        Document(
-            page_content=chunk,
-            metadata={"file_id": file_id, "path": str(path), "chunk": i},
-        )
-        for i, chunk in enumerate(chunks)
-    ]
-
-    store = InMemoryVectorStore(embeddings)
-    store.add_documents(docs)
-
-    register_vector_store(file_id=file_id, vector_store=store, source_path=str(path), chunks=chunks)
+# 本文は .cache/main/corpus に書き出して mmap で参照し、前回から変更のないファイルは読み直さない
+# （入力ファイルの異なる audit_main.py とはマニフェストとコーパスを分け、互いのファイルを追い出さない）
+# 埋め込みは遅延させ、検索で最初に触れたファイルから計算する（残りはアイドル時に裏で計算）
+load_input_files(
+    input_files,
+    embeddings,
+    FileManifest(".cache/main/manifest.json"),
+    IngestOptions(lazy_embedding=True),
+    corpus=CorpusStore(".cache/main/corpus"),
+)
 
 # %%
 agent = create_agent(
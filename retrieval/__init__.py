@@ -0,0 +1,36 @@
+"""
+Retrieval Module
+
+This module provides the corpus-wide retrieval structures used by the tools:
+- A single NumPy-backed vector index shared by all registered files
+- An LRU query-embedding cache shared by every search entry point
+- A persistent content-addressed cache for document embeddings
+- An append-only, memory-mapped corpus store for chunk text
+- Deferred (on first search / idle-time) embedding of registered files
+- MinHash clustering of near-identical chunks across files
+"""
+
+from retrieval.corpus_store import CorpusRecord, CorpusStore
+from retrieval.embedding_cache import (
+    CachedEmbeddings,
+    PersistentEmbeddingCache,
+    QueryEmbeddingCache,
+    get_query_cache,
+    with_query_cache,
+)
+from retrieval.lazy_embedding import LazyEmbedder
+from retrieval.near_duplicates import NearDuplicateIndex
+from retrieval.vector_index import VectorIndex
+
+__all__ = [
+    "CachedEmbeddings",
+    "CorpusRecord",
+    "CorpusStore",
+    "LazyEmbedder",
+    "NearDuplicateIndex",
+    "PersistentEmbeddingCache",
+    "QueryEmbeddingCache",
+    "VectorIndex",
+    "get_query_cache",
+    "with_query_cache",
+]
@@ -0,0 +1,390 @@
+"""Append-only, memory-mapped store for the text of every ingested file."""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers threads of this process
+    fcntl = None
+
+_SPAN_DTYPE = np.dtype("<i8")
+_SPAN_BYTES = 2 * _SPAN_DTYPE.itemsize
+
+
+@dataclass
+class CorpusRecord:
+    """Where one file's text and chunk spans live inside the corpus."""
+
+    file_id: str
+    offset: int  # byte offset of the text in the corpus text file
+    length: int  # byte length of the text
+    span_offset: int  # index of the first span row in the spans file
+    span_count: int
+    content_hash: str = ""
+    # Optional per-chunk metadata (e.g. sheet and row range), aligned with spans
+    chunk_meta: list[dict[str, Any] | None] = field(default_factory=list)
+
+
+class _MappedFile:
+    """An append-only file that is read through a lazily (re)mapped mmap."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.touch(exist_ok=True)
+        self._size = self.path.stat().st_size
+        self._map: mmap.mmap | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def append_from(self, src: Any) -> tuple[int, int]:
+        """Append everything readable from ``src``; return its ``(start, end)`` offsets."""
+        with self._lock, self.path.open("ab") as out:
+            # The real end of the file: another process may have appended since
+            start = out.seek(0, os.SEEK_END)
+            shutil.copyfileobj(src, out)
+            self._size = out.tell()
+            return start, self._size
+
+    def append(self, data: bytes) -> tuple[int, int]:
+        with self._lock, self.path.open("ab") as out:
+            start = out.seek(0, os.SEEK_END)
+            out.write(data)
+            self._size = out.tell()
+            return start, self._size
+
+    def view(self, end: int) -> mmap.mmap:
+        """Return a read-only map covering at least ``[0, end)``."""
+        with self._lock:
+            if self._map is None or len(self._map) < end:
+                # The old map is not closed explicitly: readers may still hold
+                # slices or NumPy views of it; it is released once unreferenced.
+                with self.path.open("rb") as fp:
+                    self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def close(self) -> None:
+        with self._lock:
+            self._map = None
+            self._size = self.path.stat().st_size
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Exclusive lock on ``path`` shared by every process using the corpus."""
+    with path.open("a") as fp:
+        if fcntl is not None:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+class CorpusWriter:
+    """
+    Streams one file's text into the corpus.
+
+    Text is encoded into a spool (memory, spilling to disk for large files)
+    as it is written, and appended to the shared corpus file in one step on
+    ``commit`` so that concurrent writers never interleave. Chunk spans are
+    given in character offsets and converted to byte offsets on the fly,
+    keeping only the text that has not been passed yet.
+    """
+
+    _SPOOL_MAX = 8 << 20
+
+    def __init__(self, store: "CorpusStore", file_id: str, content_hash: str = ""):
+        self._store = store
+        self.file_id = file_id
+        self.content_hash = content_hash
+        self._spool = tempfile.SpooledTemporaryFile(max_size=self._SPOOL_MAX)
+        self._pending: deque[str] = deque()  # text from the cursor onwards
+        self._cursor_char = 0
+        self._cursor_byte = 0
+        self._spans: list[tuple[int, int]] = []
+        self._meta: list[dict[str, Any] | None] = []
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._spool.close()
+
+    def write(self, text: str) -> None:
+        """Append decoded text (usable as ``_iter_chunks``'s sink)."""
+        self._spool.write(text.encode("utf-8"))
+        self._pending.append(text)
+
+    def _byte_offset(self, char_offset: int) -> int:
+        need = char_offset - self._cursor_char
+        if need < 0:
+            raise ValueError("chunk start offsets must be increasing")
+        while need > 0:
+            block = self._pending[0]
+            if len(block) <= need:
+                self._pending.popleft()
+                taken = block
+            else:
+                taken, self._pending[0] = block[:need], block[need:]
+            self._cursor_char += len(taken)
+            self._cursor_byte += len(taken.encode("utf-8"))
+            need -= len(taken)
+        return self._cursor_byte
+
+    def add_span(
+        self, char_start: int, chunk_text: str, meta: dict[str, Any] | None = None
+    ) -> None:
+        """Record a chunk starting at ``char_start`` (starts must increase)."""
+        start = self._byte_offset(char_start)
+        self._spans.append((start, start + len(chunk_text.encode("utf-8"))))
+        self._meta.append(meta)
+
+    def commit(self) -> CorpusRecord:
+        """Append the spooled text and spans to the corpus and index them."""
+        self._spool.seek(0)
+        meta = self._meta if any(m is not None for m in self._meta) else []
+        return self._store._append(
+            self.file_id, self._spool, self._spans, self.content_hash, meta
+        )
+
+
+class CorpusStore:
+    """
+    A single append-only corpus of all ingested text with an offset index.
+
+    ``corpus.txt`` holds the UTF-8 text of every file back to back,
+    ``spans.bin`` holds each file's chunk spans as little-endian int64 byte
+    offsets (relative to the file's text), and ``index.json`` maps file_id to
+    its byte range and span rows. Reads go through ``mmap``, so several worker
+    processes opening the same directory share the OS page cache instead of
+    each holding the corpus as Python strings, and nothing is decoded until a
+    chunk is actually requested.
+
+    Appends, ``flush`` and ``compact`` hold a lock file, so processes sharing
+    a directory never interleave their bytes, and ``flush`` merges this
+    store's changes into the index on disk instead of overwriting it.
+    Replacing or removing a file only updates the index; the old bytes stay in
+    the files as garbage until ``compact`` rewrites them.
+    """
+
+    TEXT_FILE = "corpus.txt"
+    SPANS_FILE = "spans.bin"
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "corpus.lock"
+
+    def __init__(self, directory: str | Path | None = None):
+        """
+        Open (or create) a corpus directory.
+
+        Args:
+            directory: Where to keep the corpus; a temporary directory that is
+                removed with the store is used when omitted
+        """
+        self._tmpdir = None
+        if directory is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="corpus-")
+            directory = self._tmpdir.name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._text = _MappedFile(self.directory / self.TEXT_FILE)
+        self._spans = _MappedFile(self.directory / self.SPANS_FILE)
+        self._lock = threading.Lock()
+        self._lock_path = self.directory / self.LOCK_FILE
+        # Records added (or removed: None) here since the last flush
+        self._changes: dict[str, CorpusRecord | None] = {}
+        self._records = self._read_index()
+
+    def _read_index(self) -> dict[str, CorpusRecord]:
+        index_path = self.directory / self.INDEX_FILE
+        if not index_path.exists():
+            return {}
+        data = json.loads(index_path.read_text(encoding="utf-8"))
+        return {r["file_id"]: CorpusRecord(**r) for r in data.get("files", [])}
+
+    def _write_index(self, records: dict[str, CorpusRecord]) -> None:
+        payload = {"files": [asdict(records[f]) for f in sorted(records)]}
+        index_path = self.directory / self.INDEX_FILE
+        tmp = index_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, index_path)
+
+    def _merged(self) -> dict[str, CorpusRecord]:
+        """The index on disk with this store's changes applied (lock held)."""
+        records = self._read_index()
+        for file_id, record in self._changes.items():
+            if record is None:
+                records.pop(file_id, None)
+            else:
+                records[file_id] = record
+        return records
+
+    def writer(self, file_id: str, content_hash: str = "") -> CorpusWriter:
+        """Start streaming a file's text into the corpus."""
+        return CorpusWriter(self, file_id, content_hash)
+
+    def add_text(
+        self, file_id: str, text: str, spans: list[tuple[int, int]], content_hash: str = ""
+    ) -> CorpusRecord:
+        """Add an in-memory text with character-offset chunk spans."""
+        with self.writer(file_id, content_hash) as writer:
+            writer.write(text)
+            for start, end in spans:
+                writer.add_span(start, text[start:end])
+            return writer.commit()
+
+    def _append(
+        self,
+        file_id: str,
+        spool: Any,
+        spans: list[tuple[int, int]],
+        content_hash: str,
+        chunk_meta: list[dict[str, Any] | None] | None = None,
+    ) -> CorpusRecord:
+        span_bytes = np.asarray(spans, dtype=_SPAN_DTYPE).reshape(-1, 2).tobytes()
+        with self._lock, _locked(self._lock_path):
+            start, end = self._text.append_from(spool)
+            span_start, _ = self._spans.append(span_bytes)
+            record = CorpusRecord(
+                file_id=file_id,
+                offset=start,
+                length=end - start,
+                span_offset=span_start // _SPAN_BYTES,
+                span_count=len(spans),
+                content_hash=content_hash,
+                chunk_meta=list(chunk_meta or []),
+            )
+            self._records[file_id] = record
+            self._changes[file_id] = record
+        return record
+
+    def has(self, file_id: str) -> bool:
+        return file_id in self._records
+
+    def get(self, file_id: str) -> CorpusRecord | None:
+        return self._records.get(file_id)
+
+    def remove(self, file_id: str) -> bool:
+        with self._lock:
+            self._changes[file_id] = None
+            return self._records.pop(file_id, None) is not None
+
+    def chunk_count(self, file_id: str) -> int:
+        record = self._records.get(file_id)
+        return record.span_count if record else 0
+
+    def spans(self, file_id: str) -> np.ndarray:
+        """Return the (n, 2) byte spans of a file's chunks, relative to its text."""
+        record = self._records[file_id]
+        if not record.span_count:
+            return np.empty((0, 2), dtype=_SPAN_DTYPE)
+        start = record.span_offset * _SPAN_BYTES
+        view = self._spans.view(start + record.span_count * _SPAN_BYTES)
+        return np.frombuffer(
+            view, dtype=_SPAN_DTYPE, count=record.span_count * 2, offset=start
+        ).reshape(-1, 2)
+
+    def chunk_meta(self, file_id: str, chunk: int) -> dict[str, Any] | None:
+        """Metadata recorded for a chunk, if any."""
+        record = self._records.get(file_id)
+        if record is None or not 0 <= chunk < len(record.chunk_meta):
+            return None
+        return record.chunk_meta[chunk]
+
+    def _read(self, start: int, end: int) -> str:
+        if end <= start:
+            return ""
+        return self._text.view(end)[start:end].decode("utf-8")
+
+    def read_chunk(self, file_id: str, chunk: int) -> str:
+        """Decode one chunk straight from the mapped corpus."""
+        record = self._records[file_id]
+        if not 0 <= chunk < record.span_count:
+            raise IndexError(f"chunk {chunk} out of range for {file_id}")
+        start, end = self.spans(file_id)[chunk]
+        return self._read(record.offset + int(start), record.offset + int(end))
+
+    def read_text(self, file_id: str) -> str:
+        """Decode a file's whole text."""
+        record = self._records[file_id]
+        return self._read(record.offset, record.offset + record.length)
+
+    def flush(self) -> None:
+        """
+        Persist the offset index (data files are written on commit).
+
+        Only this store's additions and removals are applied to the index on
+        disk, so files another process flushed in the meantime are kept.
+        """
+        with self._lock, _locked(self._lock_path):
+            records = self._merged()
+            self._write_index(records)
+            self._changes.clear()
+
+    def compact(self, min_garbage: float = 0.5) -> int:
+        """
+        Rewrite the data files with only the indexed files' bytes.
+
+        Runs when at least ``min_garbage`` of the corpus text is garbage (0
+        compacts always). The index on disk is merged first, so files other
+        processes flushed survive; run it when no other process is writing,
+        such as before ingestion starts, since their unflushed appends are
+        not in the index.
+
+        Returns:
+            Bytes reclaimed (0 when the corpus was left as it is)
+        """
+        with self._lock, _locked(self._lock_path):
+            records = self._merged()
+            self._text.close()
+            self._spans.close()
+            size = self._text.size
+            live = sum(r.length for r in records.values())
+            if not size or (size - live) / size < min_garbage:
+                return 0
+            text_tmp = self._text.path.with_suffix(".tmp")
+            spans_tmp = self._spans.path.with_suffix(".tmp")
+            compacted: dict[str, CorpusRecord] = {}
+            with (
+                self._text.path.open("rb") as text_in,
+                self._spans.path.open("rb") as spans_in,
+                text_tmp.open("wb") as text_out,
+                spans_tmp.open("wb") as spans_out,
+            ):
+                for file_id in sorted(records, key=lambda f: records[f].offset):
+                    record = records[file_id]
+                    text_in.seek(record.offset)
+                    spans_in.seek(record.span_offset * _SPAN_BYTES)
+                    moved = {"offset": text_out.tell(), "span_offset": spans_out.tell() // _SPAN_BYTES}
+                    compacted[file_id] = CorpusRecord(**{**asdict(record), **moved})
+                    text_out.write(text_in.read(record.length))
+                    spans_out.write(spans_in.read(record.span_count * _SPAN_BYTES))
+            os.replace(text_tmp, self._text.path)
+            os.replace(spans_tmp, self._spans.path)
+            self._write_index(compacted)
+            self._text.close()
+            self._spans.close()
+            self._records = compacted
+            self._changes.clear()
+            return size - self._text.size
+
+    def close(self) -> None:
+        self._text.close()
+        self._spans.close()
@@ -0,0 +1,263 @@
+"""Embedding caches shared by the retrieval tools and the knowledge store."""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def embedding_model_key(embeddings: Embeddings) -> str:
+    """
+    Return a stable identifier for the model behind an embeddings object.
+
+    Vectors from different models (or different output dimensions of the same
+    model) are not comparable, so this key is part of every cache key.
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.model_key
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    key = str(model) if model else type(embeddings).__name__
+    dimensions = getattr(embeddings, "dimensions", None) or getattr(embeddings, "size", None)
+    if dimensions:
+        key = f"{key}@{dimensions}"
+    return key
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache of query embeddings keyed by (model, query text).
+
+    Concurrent requests for the same missing key wait for the first caller
+    instead of embedding the query again, so each distinct query is embedded
+    exactly once while it stays in the cache.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of query vectors kept in memory
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._inflight: dict[tuple[str, str], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self, model: str, text: str, compute: Callable[[str], list[float]]
+    ) -> list[float]:
+        """
+        Return the cached vector for (model, text), computing it on a miss.
+
+        Args:
+            model: Embedding model key
+            text: Query text
+            compute: Function that embeds the text on a cache miss
+
+        Returns:
+            The query embedding (a fresh list the caller may modify)
+        """
+        key = (model, text)
+        while True:
+            with self._lock:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(vector)
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._inflight[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            vector = list(compute(text))
+            with self._lock:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return list(vector)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the current cache size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self) -> None:
+        """Drop all cached vectors and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide query cache shared by every CachedEmbeddings instance
+_QUERY_CACHE = QueryEmbeddingCache()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Get the process-wide query embedding cache."""
+    return _QUERY_CACHE
+
+
+def content_key(model: str, text: str) -> str:
+    """Content address of a text embedded by a given model (and dimensions)."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class PersistentEmbeddingCache:
+    """
+    On-disk, content-addressed store of document embeddings (SQLite).
+
+    Each vector is stored as a float32 blob under
+    ``sha256(model key, text)``, where the model key already includes the
+    output dimensions. Unchanged chunks therefore map to the same key across
+    runs, and a warm restart over an unchanged corpus needs no API calls.
+    """
+
+    # Stay well below SQLite's bound-parameter limit for IN (...) lookups
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, path: str | Path):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite file path; parent directories are created as needed
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, list[float]]:
+        """Return the cached vectors for whichever of ``keys`` are present."""
+        keys = list(dict.fromkeys(keys))
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._LOOKUP_BATCH):
+                batch = keys[i : i + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, items: dict[str, list[float]]) -> None:
+        """Store vectors keyed by their content address."""
+        rows = []
+        for key, vector in items.items():
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((key, model, int(array.shape[0]), array.tobytes()))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the number of stored vectors."""
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "size": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that adds caching in front of an embedding model.
+
+    ``embed_query`` goes through the process-wide LRU query cache; wrapping the
+    same underlying model in several places (tools, knowledge store) still
+    shares one cache, because it is keyed by model. ``embed_documents``
+    optionally goes through a persistent content-addressed cache and only
+    sends cache misses to the underlying model, in a single batch.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        query_cache: QueryEmbeddingCache | None = None,
+        document_cache: PersistentEmbeddingCache | None = None,
+    ):
+        """
+        Initialize the wrapper.
+
+        Args:
+            underlying: The embedding model that actually computes vectors
+            query_cache: Cache for query vectors (defaults to the process-wide one)
+            document_cache: Optional on-disk cache for document vectors
+        """
+        self.underlying = underlying
+        self.query_cache = query_cache or _QUERY_CACHE
+        self.document_cache = document_cache
+        self.model_key = embedding_model_key(underlying)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.document_cache is None or not texts:
+            return self.underlying.embed_documents(texts)
+
+        keys = [content_key(self.model_key, text) for text in texts]
+        vectors = self.document_cache.get_many(keys)
+
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            computed = self.underlying.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            self.document_cache.put_many(self.model_key, new_vectors)
+            vectors.update(new_vectors)
+
+        return [list(vectors[key]) for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.query_cache.get_or_compute(
+            self.model_key, text, self.underlying.embed_query
+        )
+
+
+def with_query_cache(embeddings: Embeddings) -> CachedEmbeddings:
+    """Wrap embeddings in CachedEmbeddings unless they already are."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings
+    return CachedEmbeddings(embeddings)
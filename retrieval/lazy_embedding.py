@@ -0,0 +1,214 @@
+"""Deferred chunk embedding: files are searchable once they are first needed."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from retrieval.vector_index import VectorIndex
+
+
+@dataclass
+class _PendingFile:
+    """A registered file whose chunk vectors are (partly) not computed yet."""
+
+    file_id: str
+    vectors: list[Any]  # None where a chunk still needs embedding
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    done: bool = False
+
+    @property
+    def missing(self) -> list[int]:
+        return [i for i, vector in enumerate(self.vectors) if vector is None]
+
+
+class LazyEmbedder:
+    """
+    Embeds the chunks of registered files on demand.
+
+    Files are added with whatever vectors are already known (e.g. reused from
+    a previous pass) and ``None`` for the rest. They are not in the vector
+    index until ``ensure`` is called for them, which embeds the missing chunks
+    of all requested files in shared batches and adds the files to the index.
+    With ``cluster_of``, near-identical chunks are embedded once per cluster:
+    the other occurrences, in the same call or a later one, share its vector.
+    A background thread drains the remaining files once foreground activity
+    (searches, reads) has been idle for ``idle_seconds``; a foreground
+    ``ensure`` for a file the background is working on simply waits for it.
+    A file whose background embedding failed is skipped by the thread and
+    retried by the next ``ensure`` that asks for it; if that fails too, the
+    error is raised with the background failure as its cause.
+    """
+
+    def __init__(
+        self,
+        index: VectorIndex,
+        embed_documents: Callable[[list[str]], list[list[float]]],
+        read_chunk: Callable[[str, int], str],
+        batch_size: int = 64,
+        cluster_of: Callable[[str, int], int | None] | None = None,
+    ):
+        """
+        Initialize the embedder.
+
+        Args:
+            index: Index that embedded files are added to
+            embed_documents: Function that embeds a batch of chunk texts
+            read_chunk: Function returning the text of (file_id, chunk)
+            batch_size: Chunks per embed_documents call
+            cluster_of: Function returning the near-duplicate cluster of
+                (file_id, chunk), or None if it is not clustered
+        """
+        self.index = index
+        self.embed_documents = embed_documents
+        self.read_chunk = read_chunk
+        self.batch_size = max(int(batch_size), 1)
+        self.cluster_of = cluster_of
+        self._cluster_vectors: dict[int, Any] = {}
+        self.idle_seconds = 2.0
+        self._pending: dict[str, _PendingFile] = {}
+        self._failed: dict[str, Exception] = {}
+        self._lock = threading.Lock()
+        self._last_activity = time.monotonic()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, file_id: str, vectors: list[Any]) -> None:
+        """Register a file whose missing vectors (``None``) are embedded later."""
+        with self._lock:
+            self._pending[file_id] = _PendingFile(file_id, list(vectors))
+            self._failed.pop(file_id, None)
+        self._wakeup.set()
+
+    def discard(self, file_id: str) -> bool:
+        """Forget a pending file (it was replaced or unregistered)."""
+        with self._lock:
+            self._failed.pop(file_id, None)
+            return self._pending.pop(file_id, None) is not None
+
+    def touch(self) -> None:
+        """Record foreground activity; background work waits until it goes idle."""
+        self._last_activity = time.monotonic()
+
+    def ensure(self, file_ids: Iterable[str]) -> int:
+        """
+        Make sure the given files are embedded and in the index.
+
+        Args:
+            file_ids: Files about to be searched (non-pending ones are ignored)
+
+        Returns:
+            Number of chunks that were embedded by this call
+        """
+        self.touch()
+        with self._lock:
+            jobs = [self._pending[f] for f in sorted(set(file_ids)) if f in self._pending]
+        if not jobs:
+            return 0
+        try:
+            return self._embed(jobs)
+        except Exception as exc:
+            with self._lock:
+                earlier = next(
+                    (self._failed[job.file_id] for job in jobs if job.file_id in self._failed),
+                    None,
+                )
+            if earlier is None:
+                raise
+            raise exc from earlier
+
+    def _embed(self, jobs: list[_PendingFile]) -> int:
+        # Locks are always taken in file_id order, so concurrent callers cannot deadlock
+        for job in jobs:
+            job.lock.acquire()
+        try:
+            todo = [job for job in jobs if not job.done]
+            work = []
+            # Occurrences of a cluster whose vector is being computed in this call
+            followers: dict[int, list[tuple[_PendingFile, int]]] = {}
+            for job in todo:
+                for i in job.missing:
+                    cluster = self.cluster_of(job.file_id, i) if self.cluster_of else None
+                    if cluster is None:
+                        work.append((job, i, None))
+                        continue
+                    with self._lock:
+                        vector = self._cluster_vectors.get(cluster)
+                    if vector is not None:
+                        job.vectors[i] = vector
+                    elif cluster in followers:
+                        followers[cluster].append((job, i))
+                    else:
+                        followers[cluster] = []
+                        work.append((job, i, cluster))
+            for start in range(0, len(work), self.batch_size):
+                batch = work[start : start + self.batch_size]
+                texts = [self.read_chunk(job.file_id, i) for job, i, _ in batch]
+                for (job, i, cluster), vector in zip(batch, self.embed_documents(texts)):
+                    job.vectors[i] = vector
+                    if cluster is not None:
+                        with self._lock:
+                            self._cluster_vectors[cluster] = vector
+                        for other, j in followers.pop(cluster):
+                            other.vectors[j] = vector
+            for job in todo:
+                with self._lock:
+                    # A file re-registered meanwhile has a new job; drop stale vectors
+                    if self._pending.get(job.file_id) is not job:
+                        continue
+                    del self._pending[job.file_id]
+                    self._failed.pop(job.file_id, None)
+                self.index.add(job.file_id, job.vectors)
+                job.done = True
+            return len(work)
+        finally:
+            for job in jobs:
+                job.lock.release()
+
+    def start_background(self, idle_seconds: float = 2.0) -> None:
+        """Start the idle-time background embedding thread (once)."""
+        self.idle_seconds = idle_seconds
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="lazy-embedding", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread (files still pending stay pending)."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _next_background_job(self) -> _PendingFile | None:
+        with self._lock:
+            for file_id in sorted(self._pending):
+                if file_id not in self._failed:
+                    return self._pending[file_id]
+        return None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            idle = time.monotonic() - self._last_activity
+            if idle < self.idle_seconds:
+                self._stop.wait(self.idle_seconds - idle)
+                continue
+            job = self._next_background_job()
+            if job is None:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            try:
+                self._embed([job])
+            except Exception as exc:
+                # Keep the file pending: the next foreground ensure retries it
+                with self._lock:
+                    if self._pending.get(job.file_id) is job:
+                        self._failed[job.file_id] = exc
@@ -0,0 +1,174 @@
+"""MinHash-based detection of near-identical chunks across files."""
+
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from utils import _rolling_hashes
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+class NearDuplicateIndex:
+    """
+    Clusters near-identical chunks (boilerplate terms, clauses, footers).
+
+    Each chunk is reduced to a MinHash signature over its character
+    shingles; ``num_perm`` multiply-shift hash functions are applied to all
+    shingle hashes at once as one NumPy matrix operation. Signatures are split
+    into ``bands`` bands for locality-sensitive hashing, so only chunks that
+    share a whole band are compared, and a chunk joins a cluster when its
+    estimated Jaccard similarity to the cluster's representative reaches
+    ``threshold``. Every occurrence is kept, so a cluster can be embedded
+    once while citations still resolve per file_id and chunk.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle: int = 5,
+        threshold: float = 0.85,
+        seed: int = 1,
+    ):
+        """
+        Initialize an empty index.
+
+        Args:
+            num_perm: Length of the MinHash signature
+            bands: LSH bands (must divide num_perm)
+            shingle: Characters per shingle
+            threshold: Minimum estimated Jaccard similarity to join a cluster
+            seed: Seed for the hash functions (signatures are only comparable
+                between indexes with the same seed)
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle = shingle
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        # Odd multipliers make (a * x + b) >> 32 a universal family on 64-bit x
+        self._a = (rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._rows = num_perm // bands
+
+        self._cluster_of: dict[tuple[str, int], int] = {}
+        self._members: dict[int, list[tuple[str, int]]] = {}
+        # Row c holds the representative signature of cluster c
+        self._representatives = np.empty((0, num_perm), dtype=np.uint32)
+        self._alive = np.empty(0, dtype=bool)
+        self._buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+        self._next_cluster = 0
+        self._lock = threading.Lock()
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32, length num_perm) of a chunk's text."""
+        normalized = " ".join(text.split())
+        shingles = _rolling_hashes(normalized, min(self.shingle, max(len(normalized), 1)))
+        if not shingles.shape[0]:
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        shingles = np.unique(shingles)
+        hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return (hashed & _MASK32).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        r = self._rows
+        return [(band, signature[band * r : (band + 1) * r].tobytes()) for band in range(self.bands)]
+
+    def add(self, file_id: str, chunk: int, signature: np.ndarray) -> int:
+        """
+        Record an occurrence and return the id of the cluster it belongs to.
+
+        A chunk with no near-identical match starts a new cluster of its own.
+        """
+        keys = self._band_keys(signature)
+        with self._lock:
+            self._discard(file_id, chunk)
+            best = None
+            candidates = np.fromiter(
+                itertools.chain.from_iterable(self._buckets.get(key, ()) for key in keys),
+                dtype=np.int64,
+            )
+            if candidates.size:
+                # Rows that repeat boilerplate collide in many bands, so all
+                # candidates are scored in one vectorized comparison
+                candidates = np.unique(candidates)
+                candidates = candidates[self._alive[candidates]]
+                scores = (self._representatives[candidates] == signature).mean(axis=1)
+                if scores.size and scores.max() >= self.threshold:
+                    best = int(candidates[int(np.argmax(scores))])
+            if best is None:
+                best = self._new_cluster(signature)
+                for key in keys:
+                    self._buckets[key].append(best)
+            self._members[best].append((file_id, chunk))
+            self._cluster_of[(file_id, chunk)] = best
+            return best
+
+    def _new_cluster(self, signature: np.ndarray) -> int:
+        cluster = self._next_cluster
+        self._next_cluster += 1
+        if cluster >= self._representatives.shape[0]:
+            capacity = max(2 * self._representatives.shape[0], 1024)
+            representatives = np.empty((capacity, self.num_perm), dtype=np.uint32)
+            alive = np.zeros(capacity, dtype=bool)
+            representatives[:cluster] = self._representatives[:cluster]
+            alive[:cluster] = self._alive[:cluster]
+            self._representatives, self._alive = representatives, alive
+        self._representatives[cluster] = signature
+        self._alive[cluster] = True
+        self._members[cluster] = []
+        return cluster
+
+    def _discard(self, file_id: str, chunk: int) -> None:
+        cluster = self._cluster_of.pop((file_id, chunk), None)
+        if cluster is None:
+            return
+        members = self._members[cluster]
+        members.remove((file_id, chunk))
+        if not members:
+            # Bucket entries of dropped clusters are skipped on lookup
+            del self._members[cluster]
+            self._alive[cluster] = False
+
+    def remove_file(self, file_id: str) -> int:
+        """Forget every occurrence in a file; returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._cluster_of if key[0] == file_id]
+            for _, chunk in keys:
+                self._discard(file_id, chunk)
+            return len(keys)
+
+    def cluster_of(self, file_id: str, chunk: int) -> int | None:
+        return self._cluster_of.get((file_id, chunk))
+
+    def occurrences(self, cluster: int) -> list[tuple[str, int]]:
+        """Every (file_id, chunk) in a cluster, in insertion order."""
+        with self._lock:
+            return list(self._members.get(cluster, ()))
+
+    def duplicates_of(self, file_id: str, chunk: int) -> list[tuple[str, int]]:
+        """The other occurrences of a chunk's cluster (empty if it is unique)."""
+        cluster = self._cluster_of.get((file_id, chunk))
+        if cluster is None:
+            return []
+        return [o for o in self.occurrences(cluster) if o != (file_id, chunk)]
+
+    def stats(self) -> dict[str, int]:
+        """Return occurrence/cluster counts and how many occurrences are redundant."""
+        with self._lock:
+            chunks = len(self._cluster_of)
+            clusters = len(self._members)
+            shared = sum(1 for members in self._members.values() if len(members) > 1)
+            return {
+                "chunks": chunks,
+                "clusters": clusters,
+                "duplicate_clusters": shared,
+                "redundant_chunks": chunks - clusters,
+            }
@@ -0,0 +1,246 @@
+"""Corpus-wide dense vector index backed by a single NumPy matrix."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Iterable
+
+import numpy as np
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place (zero rows are left as-is)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class VectorIndex:
+    """
+    A single index holding the chunk embeddings of every registered file.
+
+    All vectors live in one contiguous float32 matrix whose rows are
+    L2-normalized at insert time, so cosine similarity for a query is one
+    matrix-vector product. Two parallel int32 arrays record, for each row,
+    the owning file (as a compact integer code) and the chunk id. Top-k
+    selection uses ``argpartition`` instead of a full sort, and per-file
+    searches are masked views over the same matrix.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        """
+        Initialize an empty index.
+
+        Args:
+            initial_capacity: Number of rows to preallocate on first insert
+        """
+        self._initial_capacity = max(int(initial_capacity), 1)
+        self._dim: int | None = None
+        self._size = 0
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._file_codes = np.empty(0, dtype=np.int32)
+        self._chunk_ids = np.empty(0, dtype=np.int32)
+        self._file_to_code: dict[str, int] = {}
+        self._code_to_file: list[str | None] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> int | None:
+        """Embedding dimension, fixed by the first non-empty insert."""
+        return self._dim
+
+    def file_ids(self) -> list[str]:
+        """Return the ids of all files that have been added."""
+        with self._lock:
+            return sorted(self._file_to_code)
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(capacity * 2, needed, self._initial_capacity)
+        matrix = np.empty((new_capacity, self._dim), dtype=np.float32)
+        codes = np.empty(new_capacity, dtype=np.int32)
+        chunk_ids = np.empty(new_capacity, dtype=np.int32)
+        matrix[: self._size] = self._matrix[: self._size]
+        codes[: self._size] = self._file_codes[: self._size]
+        chunk_ids[: self._size] = self._chunk_ids[: self._size]
+        self._matrix, self._file_codes, self._chunk_ids = matrix, codes, chunk_ids
+
+    def add(
+        self,
+        file_id: str,
+        vectors: Any,
+        chunk_ids: Iterable[int] | None = None,
+    ) -> None:
+        """
+        Add (or replace) all chunk vectors of a file.
+
+        Args:
+            file_id: The file the vectors belong to
+            vectors: Array-like of shape (n_chunks, dim)
+            chunk_ids: Chunk id of each row (defaults to 0..n_chunks-1)
+        """
+        block = np.array(vectors, dtype=np.float32, ndmin=2)
+        if block.size == 0:
+            block = block.reshape(0, self._dim or 0)
+        n = block.shape[0]
+        ids = (
+            np.arange(n, dtype=np.int32)
+            if chunk_ids is None
+            else np.fromiter(chunk_ids, dtype=np.int32, count=n)
+        )
+
+        with self._lock:
+            if file_id in self._file_to_code:
+                self.remove(file_id)
+
+            if n:
+                if self._dim is None:
+                    self._dim = block.shape[1]
+                    self._matrix = np.empty((0, self._dim), dtype=np.float32)
+                elif block.shape[1] != self._dim:
+                    raise ValueError(
+                        f"embedding dimension mismatch: expected {self._dim}, got {block.shape[1]}"
+                    )
+
+            code = len(self._code_to_file)
+            self._code_to_file.append(file_id)
+            self._file_to_code[file_id] = code
+            if not n:
+                return
+
+            self._reserve(n)
+            start, end = self._size, self._size + n
+            self._matrix[start:end] = block
+            _normalize_rows(self._matrix[start:end])
+            self._file_codes[start:end] = code
+            self._chunk_ids[start:end] = ids
+            self._size = end
+
+    def remove(self, file_id: str) -> int:
+        """
+        Remove every row of a file from the index.
+
+        Returns:
+            Number of rows removed
+        """
+        with self._lock:
+            code = self._file_to_code.pop(file_id, None)
+            if code is None:
+                return 0
+            self._code_to_file[code] = None
+
+            keep = self._file_codes[: self._size] != code
+            removed = self._size - int(keep.sum())
+            if removed:
+                # Compact into fresh arrays so snapshots held by readers stay valid.
+                self._matrix = self._matrix[: self._size][keep]
+                self._file_codes = self._file_codes[: self._size][keep]
+                self._chunk_ids = self._chunk_ids[: self._size][keep]
+                self._size -= removed
+            return removed
+
+    def get_vectors(self, file_id: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the chunk ids and (normalized) vectors stored for a file.
+
+        Returns:
+            Tuple of (chunk_ids, vectors); both empty if the file is unknown
+        """
+        matrix, _, chunk_ids = self._snapshot([file_id])
+        return chunk_ids.copy(), matrix.copy()
+
+    def _snapshot(
+        self, file_ids: Iterable[str] | None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            matrix = self._matrix[: self._size]
+            codes = self._file_codes[: self._size]
+            chunk_ids = self._chunk_ids[: self._size]
+            if file_ids is None:
+                return matrix, codes, chunk_ids
+            wanted = [self._file_to_code[f] for f in file_ids if f in self._file_to_code]
+        rows = np.flatnonzero(np.isin(codes, wanted))
+        return matrix[rows], codes[rows], chunk_ids[rows]
+
+    def _scores(self, matrix: np.ndarray, query_vector: Any) -> np.ndarray:
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        if self._dim is not None and query.shape[0] != self._dim:
+            raise ValueError(
+                f"query dimension mismatch: expected {self._dim}, got {query.shape[0]}"
+            )
+        norm = float(np.linalg.norm(query))
+        if norm > 0:
+            query = query / norm
+        return matrix @ query
+
+    def search(
+        self,
+        query_vector: Any,
+        k: int = 4,
+        file_ids: Iterable[str] | None = None,
+    ) -> list[tuple[str, int, float]]:
+        """
+        Return the global top-k chunks by cosine similarity.
+
+        Args:
+            query_vector: The query embedding
+            k: Number of results to return
+            file_ids: Restrict the search to these files (masked view)
+
+        Returns:
+            List of (file_id, chunk_id, score), best first
+        """
+        matrix, codes, chunk_ids = self._snapshot(file_ids)
+        if k <= 0 or not len(codes):
+            return []
+        scores = self._scores(matrix, query_vector)
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        names = self._code_to_file
+        return [(names[codes[i]], int(chunk_ids[i]), float(scores[i])) for i in top]
+
+    def search_per_file(
+        self,
+        query_vector: Any,
+        k_per_file: int = 4,
+        file_ids: Iterable[str] | None = None,
+    ) -> dict[str, list[tuple[int, float]]]:
+        """
+        Score every row once and return the top-k chunks of each file.
+
+        Args:
+            query_vector: The query embedding
+            k_per_file: Number of results to keep per file
+            file_ids: Restrict the search to these files
+
+        Returns:
+            Dict mapping file_id to a list of (chunk_id, score), best first
+        """
+        matrix, codes, chunk_ids = self._snapshot(file_ids)
+        if k_per_file <= 0 or not len(codes):
+            return {}
+        scores = self._scores(matrix, query_vector)
+
+        # Group rows by file, best score first inside each group, then keep
+        # the first k_per_file positions of every group.
+        order = np.lexsort((-scores, codes))
+        sorted_codes = codes[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+        group_sizes = np.diff(np.r_[group_start, sorted_codes.shape[0]])
+        rank = np.arange(sorted_codes.shape[0]) - np.repeat(group_start, group_sizes)
+        selected = order[rank < k_per_file]
+
+        names = self._code_to_file
+        results: dict[str, list[tuple[int, float]]] = {}
+        for i in selected:
+            results.setdefault(names[codes[i]], []).append(
+                (int(chunk_ids[i]), float(scores[i]))
+            )
+        return results
@@ -5,26 +5,183 @@ import re
 from pathlib import Path
 from typing import Any, Literal
 
+import numpy as np
 from langchain.tools import tool
-
-# main.py 側で作った「ファイルごとのVectorStore」を、tool call から参照するための簡易レジストリ
-_VECTOR_STORES: dict[str, Any] = {}
+from langchain_core.embeddings import Embeddings
+
+from entities.index import EntityIndex
+from entities.normalize import iso_dates, normalize_transaction_id, parse_amounts, parse_dates, parse_yen
+from entities.scanner import ENTITY_KINDS, get_scanner
+from knowledge.market_prices import MarketPriceIndex
+from retrieval.corpus_store import CorpusStore
+from retrieval.embedding_cache import get_query_cache, with_query_cache
+from retrieval.lazy_embedding import LazyEmbedder
+from retrieval.near_duplicates import NearDuplicateIndex
+from retrieval.vector_index import VectorIndex
+from transactions.anomalies import detect_anomalies, detect_anomalies_in_table
+from transactions.line_items import LineItems, collect_line_items, unit_price_table
+from transactions.matching import MatchFinding, reconcile, summarize_findings
+from transactions.rules import RuleEngine, RuleEvaluation
+from transactions.split_orders import detect_split_orders, detect_split_orders_in_table
+from transactions.table import TransactionTable
+from transactions.timeline import (
+    TIMELINE_STAGES,
+    build_timelines,
+    document_events,
+    document_numbers,
+    text_events,
+)
+from transactions.timing import analyze_period_end_timing, analyze_period_end_timing_in_table
+
+# main.py 側で作ったチャンク埋め込みを、tool call から参照するための簡易レジストリ
+# 全ファイルのベクトルは 1 つの VectorIndex（連続した float32 行列）にまとめて保持する
+_INDEX = VectorIndex()
+_EMBEDDINGS: Embeddings | None = None
 _SOURCES: dict[str, str] = {}
-_FILE_CHUNKS: dict[str, list[str]] = {}
+# 本文は追記専用のコーパスファイル 1 つにまとめ、mmap 経由で必要なチャンクだけ読む
+# （チャンクは正本テキスト上の区間で表すので、オーバーラップ部分も複製しない）
+_CORPUS = CorpusStore()
+# 遅延登録されたファイルは、最初に検索されたとき（またはアイドル時にバックグラウンドで）埋め込む
+_LAZY: LazyEmbedder | None = None
+# ファイルをまたいだ定型文などのほぼ同一チャンクのクラスタ（埋め込みは 1 回、出現箇所は全件保持）
+_DUPLICATES = NearDuplicateIndex()
+# 取込時に 1 回だけ抽出した金額・日付・当事者・取引IDの転置インデックス（正規化値 → ファイル・チャンク・位置）
+_ENTITIES = EntityIndex()
+# 受発注請求ワークブックの構造化シート（列ごとの NumPy 配列、取引IDで引ける）
+_TRANSACTIONS: TransactionTable | None = None
+# 見積・発注・請求・検収の突合結果（テーブル登録後、最初に参照されたときに一括計算）
+_MATCH_FINDINGS: list[MatchFinding] | None = None
+# 監査ルール・コンプライアンス基準の実行可能な述語（知識ベースの文章と同じ ID で登録）
+_RULE_ENGINE: RuleEngine | None = None
+_RULE_EVALUATION: RuleEvaluation | None = None
+# 市場価格の知識から読み取った価格帯（カテゴリ・単位ごとに下限でソートした区間インデックス）
+_MARKET_PRICES: MarketPriceIndex | None = None
+# 見積・発注シートと取込済み書類の明細（品目・数量・単位・単価・金額）。登録内容が変わったら作り直す
+_LINE_ITEMS: tuple[tuple[Any, ...], LineItems] | None = None
 
 # Extraction type definitions
 ExtractionType = Literal["transaction_details", "amounts", "dates", "parties", "all"]
-AnalysisType = Literal["compare_values", "validate_sequence", "detect_anomalies", "calculate_variance"]
+# extract_data の抽出タイプごとのエンティティ種別と、結果のキー・最大件数
+_EXTRACTION_KINDS = {
+    "transaction_details": ("transaction_id",),
+    "amounts": ("amount",),
+    "dates": ("date",),
+    "parties": ("party",),
+    "all": ("amount", "date", "party", "transaction_id"),
+}
+_EXTRACTION_RESULTS = {
+    "amount": ("amounts", 20),
+    "date": ("dates", 20),
+    "party": ("parties", 20),
+    "transaction_id": ("transaction_ids", 10),
+}
+AnalysisType = Literal[
+    "compare_values",
+    "validate_sequence",
+    "detect_anomalies",
+    "calculate_variance",
+    "detect_split_orders",
+    "period_end_timing",
+]
+
+
+def init_vector_index(
+    embeddings: Embeddings, corpus: CorpusStore | None = None
+) -> VectorIndex:
+    """
+    クエリ埋め込み用の embeddings を設定し、空の共通インデックスを作り直す。
+    corpus を省略した場合は一時ディレクトリのコーパスを使う。
+    """
+    global _INDEX, _EMBEDDINGS, _CORPUS, _LAZY, _DUPLICATES, _ENTITIES
+    if _LAZY is not None:
+        _LAZY.stop()
+    # クエリ埋め込みはプロセス共通の LRU キャッシュ経由（知識ベース検索とも共有）
+    _EMBEDDINGS = with_query_cache(embeddings)
+    _INDEX = VectorIndex()
+    _CORPUS = corpus if corpus is not None else CorpusStore()
+    _DUPLICATES = NearDuplicateIndex()
+    # 遅延埋め込みでも、ほぼ同一チャンクはクラスタごとに 1 回だけ埋め込む
+    _LAZY = LazyEmbedder(
+        _INDEX, _EMBEDDINGS.embed_documents, _CORPUS.read_chunk, cluster_of=_DUPLICATES.cluster_of
+    )
+    _ENTITIES = EntityIndex()
+    _SOURCES.clear()
+    return _INDEX
+
+
+def get_duplicate_index() -> NearDuplicateIndex:
+    """ほぼ同一チャンクのクラスタを返す（init_vector_index で作り直されるため都度参照する）。"""
+    return _DUPLICATES
+
+
+def get_entity_index() -> EntityIndex:
+    """エンティティの転置インデックスを返す（init_vector_index で作り直されるため都度参照する）。"""
+    return _ENTITIES
+
+
+def index_file_entities(file_id: str) -> int:
+    """
+    コーパスに書き込み済みのファイル本文からエンティティを抽出し、転置インデックスに登録する。
+    取込時に 1 回だけ呼ぶ（以後の extract_data / find_entities は抽出済みの結果を読むだけ）。
+    """
+    return _ENTITIES.add_file(file_id, _CORPUS.read_text(file_id), _CORPUS.spans(file_id))
+
+
+def get_corpus() -> CorpusStore:
+    """現在のコーパスを返す（init_vector_index で差し替えられるため都度参照する）。"""
+    return _CORPUS
 
 
 def register_vector_store(
-    file_id: str, vector_store: Any, source_path: str, chunks: list[str] | None = None
+    file_id: str, vectors: Any, source_path: str, *, lazy: bool = False
 ) -> None:
-    """main.py 側で作った VectorStore を tool から参照できるように登録する。"""
-    _VECTOR_STORES[file_id] = vector_store
+    """
+    埋め込み済みチャンクを共通インデックスに登録し、tool から参照できるようにする。
+    本文とチャンク区間は事前に get_corpus() へ書き込んでおくこと。
+
+    lazy=True の場合、vectors は未計算のチャンクを None にしたリスト（None 自体も可）でよい。
+    ファイルは即座に list_indexed_files / read_file から見えるが、埋め込みは
+    search_file / search_all_files で最初に必要になったとき、またはアイドル時に
+    バックグラウンドで計算される。
+    """
+    if _LAZY is None:
+        raise RuntimeError("Vector index not initialized. Call init_vector_index first.")
+    n_chunks = _CORPUS.chunk_count(file_id)
+    if not _CORPUS.has(file_id):
+        raise ValueError(f"コーパスに本文が未登録です: file_id={file_id}")
+    if vectors is None:
+        vectors = [None] * n_chunks
+    if len(vectors) != n_chunks:
+        raise ValueError(
+            f"vectors とチャンクの件数が一致しません: {len(vectors)} != {n_chunks}"
+        )
+    if any(vector is None for vector in vectors):
+        if not lazy:
+            raise ValueError(f"未計算のベクトルがあります（lazy=True で登録してください）: {file_id}")
+        _INDEX.remove(file_id)
+        _LAZY.add(file_id, vectors)
+    else:
+        _LAZY.discard(file_id)
+        _INDEX.add(file_id, vectors)
     _SOURCES[file_id] = source_path
-    if chunks is not None:
-        _FILE_CHUNKS[file_id] = list(chunks)
+
+
+def start_background_embedding(idle_seconds: float = 2.0) -> None:
+    """遅延登録ファイルの埋め込みを、検索・読み込みが idle_seconds 途絶えたら裏で進める。"""
+    if _LAZY is not None:
+        _LAZY.start_background(idle_seconds)
+
+
+def _ensure_embedded(file_ids: list[str]) -> None:
+    # 未埋め込みのファイルだけを（ファイルをまたいだバッチで）埋め込んでからインデックスに載せる
+    if _LAZY is not None:
+        _LAZY.ensure(file_ids)
+
+
+def _touch() -> None:
+    # 前面の tool 呼び出し中はバックグラウンド埋め込みを控える
+    if _LAZY is not None:
+        _LAZY.touch()
 
 
 def _to_head(text: str, head_chars: int) -> str:
@@ -37,39 +194,96 @@ def _to_head(text: str, head_chars: int) -> str:
     return normalized[: max(head_chars - 3, 0)] + "..."
 
 
-def _search_file_impl(file_id: str, query: str, k: int = 4, *, head_chars: int = 80) -> str:
-    """Tool本体ロジック（@toolでラップされたStructuredToolを内部呼び出ししないための実装関数）。"""
-    if file_id not in _VECTOR_STORES:
-        available = ", ".join(sorted(_VECTOR_STORES.keys())) or "(none)"
-        return f"未知のfile_idです: {file_id}. 利用可能: {available}"
+def get_vector_index() -> VectorIndex:
+    """現在の共通インデックスを返す（init_vector_index で作り直されるため都度参照する）。"""
+    return _INDEX
 
-    store = _VECTOR_STORES[file_id]
 
-    # InMemoryVectorStore は similarity_search / similarity_search_with_score を持つ
-    try:
-        results = store.similarity_search_with_score(query, k=k)
-        scored = True
-    except Exception:
-        docs = store.similarity_search(query, k=k)
-        results = [(d, None) for d in docs]
-        scored = False
-
-    if not results:
+def is_registered(file_id: str) -> bool:
+    """file_id が登録済みかどうかを返す。"""
+    return file_id in _SOURCES
+
+
+def unregister_file(file_id: str) -> bool:
+    """削除されたファイルをインデックスとレジストリから取り除く。"""
+    if _LAZY is not None:
+        _LAZY.discard(file_id)
+    _INDEX.remove(file_id)
+    _CORPUS.remove(file_id)
+    _DUPLICATES.remove_file(file_id)
+    _ENTITIES.remove_file(file_id)
+    return _SOURCES.pop(file_id, None) is not None
+
+
+def get_chunk_count(file_id: str) -> int:
+    """登録済みファイルのチャンク数を返す。"""
+    return _CORPUS.chunk_count(file_id)
+
+
+def get_chunk(file_id: str, chunk: int) -> str:
+    """チャンク本文をコーパスの mmap から切り出す。"""
+    return _CORPUS.read_chunk(file_id, chunk)
+
+
+def get_chunk_meta(file_id: str, chunk: int) -> dict[str, Any] | None:
+    """チャンクのメタ情報（表計算ならシート名と行範囲）を返す。"""
+    return _CORPUS.chunk_meta(file_id, chunk)
+
+
+def get_file_text(file_id: str) -> str:
+    """ファイルの正本テキスト（オーバーラップの重複なし）を返す。"""
+    return _CORPUS.read_text(file_id) if _CORPUS.has(file_id) else ""
+
+
+def get_query_embedding_stats() -> dict[str, int]:
+    """クエリ埋め込みキャッシュのヒット/ミス件数を返す。"""
+    return get_query_cache().stats()
+
+
+def _embed_query(query: str) -> Any:
+    if _EMBEDDINGS is None:
+        raise RuntimeError("Vector index not initialized. Call init_vector_index first.")
+    return _EMBEDDINGS.embed_query(query)
+
+
+def _format_hits(
+    file_id: str, query: str, k: int, hits: list[tuple[int, float]], *, head_chars: int = 80
+) -> str:
+    if not hits:
         return "該当なし"
 
+    n_chunks = get_chunk_count(file_id)
     lines = [f"検索結果 file_id={file_id} query={query} (top {k})"]
-    for doc, score in results:
-        meta = dict(getattr(doc, "metadata", {}) or {})
-        chunk = meta.get("chunk", "?")
-        text = (getattr(doc, "page_content", "") or "").strip()
+    for chunk, score in hits:
+        text = get_chunk(file_id, chunk) if chunk < n_chunks else ""
         head = _to_head(text, head_chars=head_chars)
-        score_part = f" score={score:.4f}" if scored and score is not None else ""
         # 返却は「file_id(orファイル名) + chunk_id + 冒頭数文字」に限定してコンテキスト節約
-        lines.append(f"- file_id={file_id} chunk={chunk}{score_part} head={head}")
+        # 他ファイルにほぼ同一のチャンクがあれば、その出現箇所を dups= に併記する
+        dups = _DUPLICATES.duplicates_of(file_id, chunk)
+        dup_note = ""
+        if dups:
+            listed = ",".join(f"{f}:{c}" for f, c in dups[:3])
+            more = f"+{len(dups) - 3}" if len(dups) > 3 else ""
+            dup_note = f" dups={listed}{more}"
+        lines.append(f"- file_id={file_id} chunk={chunk} score={score:.4f}{dup_note} head={head}")
 
     return "\n\n".join(lines)
 
 
+def _search_file_impl(file_id: str, query: str, k: int = 4, *, head_chars: int = 80) -> str:
+    """Tool本体ロジック（@toolでラップされたStructuredToolを内部呼び出ししないための実装関数）。"""
+    if file_id not in _SOURCES:
+        available = ", ".join(sorted(_SOURCES.keys())) or "(none)"
+        return f"未知のfile_idです: {file_id}. 利用可能: {available}"
+
+    # 共通インデックスを file_id でマスクした上で top-k を取る
+    _ensure_embedded([file_id])
+    hits = _INDEX.search(_embed_query(query), k=k, file_ids=[file_id])
+    return _format_hits(
+        file_id, query, k, [(chunk, score) for _, chunk, score in hits], head_chars=head_chars
+    )
+
+
 @tool
 def list_indexed_files() -> str:
     """
@@ -77,6 +291,7 @@ def list_indexed_files() -> str:
     Returns:
         str: 登録済みファイル一覧
     """
+    _touch()
     if not _SOURCES:
         return "登録済みファイルはありません。"
 
@@ -110,12 +325,36 @@ def search_all_files(query: str, k_per_file: int = 4) -> str:
     Returns:
         str: ファイルごとの検索結果をまとめた文字列
     """
-    if not _VECTOR_STORES:
+    if not _SOURCES:
         return "登録済みファイルはありません。"
 
+    # クエリ埋め込みと類似度計算は全ファイル分まとめて 1 回で行う
+    # 定型文の重複で枠が埋まらないよう、多めに取ってから同一クラスタの 2 件目以降を除く
+    _ensure_embedded(sorted(_SOURCES))
+    hits_by_file = _INDEX.search_per_file(_embed_query(query), k_per_file=k_per_file * 3)
+
+    # 重複クラスタ → 最初に表示したファイルとチャンク
+    shown: dict[int, tuple[str, int]] = {}
     blocks: list[str] = [f"横断検索 query={query} (k_per_file={k_per_file})"]
-    for file_id in sorted(_VECTOR_STORES.keys()):
-        blocks.append(_search_file_impl(file_id=file_id, query=query, k=k_per_file))
+    for file_id in sorted(_SOURCES.keys()):
+        hits: list[tuple[int, float]] = []
+        skipped: list[tuple[int, tuple[str, int]]] = []
+        for chunk, score in hits_by_file.get(file_id, []):
+            cluster = _DUPLICATES.cluster_of(file_id, chunk)
+            if cluster is not None and _DUPLICATES.duplicates_of(file_id, chunk):
+                if cluster in shown:
+                    skipped.append((chunk, shown[cluster]))
+                    continue
+                shown[cluster] = (file_id, chunk)
+            hits.append((chunk, score))
+            if len(hits) >= k_per_file:
+                break
+        if not hits and skipped:
+            # 該当はあるが、すべて他ファイルで表示済みのチャンクと同一内容
+            listed = ", ".join(f"chunk={chunk} = {f}:{c}" for chunk, (f, c) in skipped[:k_per_file])
+            blocks.append(f"検索結果 file_id={file_id} query={query}: 上位の該当チャンクは表示済みの重複です（{listed}）")
+        else:
+            blocks.append(_format_hits(file_id, query, k_per_file, hits))
     return "\n\n---\n\n".join(blocks)
 
 
@@ -128,25 +367,297 @@ def read_file(file_id: str, chunk: int) -> str:
         file_id: ファイルID
         chunk: chunk id（0始まり）
     Returns:
-        str: 該当チャンク全文（メタ情報付き）
+        str: 該当チャンク全文（メタ情報付き。表計算ファイルはシート名と行範囲 sheet=… rows=…）
     """
+    _touch()
     if file_id not in _SOURCES:
         available = ", ".join(sorted(_SOURCES.keys())) or "(none)"
         return f"未知のfile_idです: {file_id}. 利用可能: {available}"
 
-    if file_id not in _FILE_CHUNKS:
-        return (
-            f"チャンク本文が未登録です: file_id={file_id}\n"
-            "（main.py 側で register_vector_store(..., chunks=...) を渡して登録してください）"
-        )
-
-    chunks = _FILE_CHUNKS[file_id]
-    if chunk < 0 or chunk >= len(chunks):
-        return f"chunk id が範囲外です: chunk={chunk}. 利用可能: 0..{len(chunks)-1}"
+    n_chunks = get_chunk_count(file_id)
+    if chunk < 0 or chunk >= n_chunks:
+        return f"chunk id が範囲外です: chunk={chunk}. 利用可能: 0..{n_chunks-1}"
 
     path = _SOURCES.get(file_id, "")
     name = Path(path).name if path else file_id
-    return f"[{name} file_id={file_id} chunk={chunk}]\n\n{chunks[chunk]}"
+    location = ""
+    meta = get_chunk_meta(file_id, chunk)
+    if meta and "sheet" in meta:
+        # 表計算のチャンクは行単位で切っているので、シート名と行範囲を示す
+        first, last = meta.get("rows", ["?", "?"])
+        location = f" sheet={meta['sheet']} rows={first}-{last}"
+    return f"[{name} file_id={file_id} chunk={chunk}{location}]\n\n{get_chunk(file_id, chunk)}"
+
+
+def register_transaction_table(table: TransactionTable) -> None:
+    """query_transactions から参照する取引テーブルを登録する。"""
+    global _TRANSACTIONS, _MATCH_FINDINGS, _RULE_EVALUATION
+    _TRANSACTIONS = table
+    _MATCH_FINDINGS = None
+    _RULE_EVALUATION = None
+
+
+def register_rule_engine(engine: RuleEngine) -> None:
+    """evaluate_audit_rules で使うルールエンジンを登録する。"""
+    global _RULE_ENGINE, _RULE_EVALUATION
+    _RULE_ENGINE = engine
+    _RULE_EVALUATION = None
+
+
+def register_market_prices(index: MarketPriceIndex) -> None:
+    """check_market_price で使う市場価格インデックスを登録する。"""
+    global _MARKET_PRICES
+    _MARKET_PRICES = index
+
+
+def get_market_prices() -> MarketPriceIndex | None:
+    """登録済みの市場価格インデックスを返す（未登録なら None）。"""
+    return _MARKET_PRICES
+
+
+def get_transaction_table() -> TransactionTable | None:
+    """登録済みの取引テーブルを返す（未登録なら None）。"""
+    return _TRANSACTIONS
+
+
+def get_line_items() -> LineItems:
+    """
+    取引テーブルの見積・発注シートと取込済み書類の明細表を返す。
+    全明細の数値をまとめて正規化し、単価（金額 / 数量）を一括で求める。
+    """
+    global _LINE_ITEMS
+    key = (id(_TRANSACTIONS), tuple(sorted(_SOURCES.items())))
+    if _LINE_ITEMS is None or _LINE_ITEMS[0] != key:
+        documents = [(file_id, path, get_file_text(file_id)) for file_id, path in sorted(_SOURCES.items())]
+        _LINE_ITEMS = (key, collect_line_items(_TRANSACTIONS, documents))
+    return _LINE_ITEMS[1]
+
+
+def get_match_findings() -> list[MatchFinding]:
+    """登録済み取引テーブルの突合結果を返す（全取引をまとめてベクトル演算で照合し、結果を保持する）。"""
+    global _MATCH_FINDINGS
+    if _TRANSACTIONS is None:
+        return []
+    if _MATCH_FINDINGS is None:
+        _MATCH_FINDINGS = reconcile(_TRANSACTIONS)
+    return _MATCH_FINDINGS
+
+
+def get_rule_evaluation() -> RuleEvaluation | None:
+    """登録済みルールを取引テーブル全体に 1 回で適用した結果を返す（結果は保持する）。"""
+    global _RULE_EVALUATION
+    if _TRANSACTIONS is None or _RULE_ENGINE is None:
+        return None
+    if _RULE_EVALUATION is None:
+        _RULE_EVALUATION = _RULE_ENGINE.evaluate(_TRANSACTIONS)
+    return _RULE_EVALUATION
+
+
+def get_review_transactions() -> list[dict[str, Any]]:
+    """
+    ルール違反または突合不整合のある取引だけを、取引一覧の行と検出内容付きで返す。
+    仮説生成エージェントには全件ではなくこの絞り込み結果を渡す。
+    """
+    if _TRANSACTIONS is None:
+        return []
+    flagged: dict[str, dict[str, list[str]]] = {}
+    for finding in get_match_findings():
+        entry = flagged.setdefault(finding.transaction_id, {"rules": [], "match": []})
+        entry["match"].append(finding.kind.value)
+    evaluation = get_rule_evaluation()
+    if evaluation is not None:
+        for hit in evaluation.hits():
+            entry = flagged.setdefault(hit.transaction_id, {"rules": [], "match": []})
+            entry["rules"].append(hit.rule_id)
+
+    summary = _TRANSACTIONS.sheet("取引一覧")
+    review = []
+    for transaction_id in _TRANSACTIONS.transaction_ids():
+        if transaction_id not in flagged:
+            continue
+        review.append({
+            "transaction": summary.records(summary.rows_for(transaction_id)[:1]),
+            "rule_violations": flagged[transaction_id]["rules"],
+            "match_findings": flagged[transaction_id]["match"],
+        })
+    return review
+
+
+@tool
+def query_transactions(
+    transaction_id: str = "",
+    vendor: str = "",
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    amount_field: str = "発注金額",
+    status: str = "",
+    limit: int = 20,
+) -> str:
+    """
+    受発注請求データ（取引一覧・見積・発注・請求・検収シート）を構造化データとして照会する。
+    金額・日付・発注先などの確認は、ベクトル検索より先にこちらを使う。
+    Args:
+        transaction_id: 取引ID（例: "TX-101"）。指定時はその取引の全シートの行を返す
+        vendor: 発注先名の部分一致で絞り込む
+        min_amount: 金額の下限（円、以上）
+        max_amount: 金額の上限（円、以下）
+        amount_field: 金額条件を適用する列（"見積金額", "発注金額", "請求金額"）
+        status: ステータスの完全一致で絞り込む（例: "完了"）
+        limit: 絞り込み時に返す最大件数
+    Returns:
+        str: 照会結果（JSON形式）
+    """
+    _touch()
+    if _TRANSACTIONS is None:
+        return json.dumps({"error": "取引テーブルが読み込まれていません"}, ensure_ascii=False)
+
+    if transaction_id:
+        found = _TRANSACTIONS.get(transaction_id.strip())
+        if not found:
+            return json.dumps({
+                "error": f"未知の取引IDです: {transaction_id}",
+                "transaction_ids": _TRANSACTIONS.transaction_ids(),
+            }, ensure_ascii=False)
+        return json.dumps(
+            {"transaction_id": transaction_id.strip(), "sheets": found},
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    try:
+        rows = _TRANSACTIONS.filter(
+            vendor=vendor,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            amount_column=amount_field,
+            status=status,
+        )
+    except (KeyError, ValueError) as exc:
+        return json.dumps({"error": str(exc.args[0] if exc.args else exc)}, ensure_ascii=False)
+
+    summary = _TRANSACTIONS.sheet("取引一覧")
+    return json.dumps({
+        "count": int(rows.size),
+        "transactions": summary.records(rows[: max(int(limit), 0)]),
+    }, ensure_ascii=False, indent=2)
+
+
+@tool
+def reconcile_transactions(transaction_id: str = "", kind: str = "") -> str:
+    """
+    見積・発注・請求・検収データを全取引について機械的に突合した結果（確定した不整合）を返す。
+    金額・数量の不一致、日付の逆転、見積有効期限切れ後の発注、検収不合格での請求、書類の欠落を検出する。
+    Args:
+        transaction_id: 取引IDで絞り込む（省略時は全取引）
+        kind: 種別で絞り込む（"amount_mismatch", "quantity_mismatch", "date_order",
+            "quote_expired", "acceptance_not_passed", "missing_document"）
+    Returns:
+        str: 検出結果（JSON形式）
+    """
+    _touch()
+    if _TRANSACTIONS is None:
+        return json.dumps({"error": "取引テーブルが読み込まれていません"}, ensure_ascii=False)
+
+    findings = get_match_findings()
+    if transaction_id:
+        findings = [f for f in findings if f.transaction_id == transaction_id.strip()]
+    if kind:
+        findings = [f for f in findings if f.kind.value == kind]
+    return json.dumps({
+        "summary": summarize_findings(findings),
+        "findings": [f.to_dict() for f in findings],
+    }, ensure_ascii=False, indent=2)
+
+
+@tool
+def evaluate_audit_rules(transaction_id: str = "", rule_id: str = "") -> str:
+    """
+    監査ルール（AR001 価格逸脱, AR002 分割発注, AR003 期末集中）とコンプライアンス基準
+    （CP001 承認権限）を全取引に機械的に適用し、違反した取引を返す。
+    Args:
+        transaction_id: 取引IDで絞り込む（省略時は全取引）
+        rule_id: ルールIDで絞り込む（例: "AR002"）
+    Returns:
+        str: 違反一覧と集計（データ不足で評価できなかったルールは skipped に理由を示す）（JSON形式）
+    """
+    _touch()
+    evaluation = get_rule_evaluation()
+    if evaluation is None:
+        return json.dumps({"error": "取引テーブルまたはルールが登録されていません"}, ensure_ascii=False)
+
+    hits = evaluation.hits(transaction_id=transaction_id.strip(), rule_id=rule_id.strip())
+    return json.dumps({
+        "summary": evaluation.summary(),
+        "violations": [hit.to_dict() for hit in hits],
+    }, ensure_ascii=False, indent=2)
+
+
+# 単価の末尾に付いた単位（"¥50,000/記事", "$300／時"）
+_PER_UNIT = re.compile(r"\s*[/／]\s*([^\s\d/／]+)\s*$")
+
+
+@tool
+def check_market_price(category: str, unit_price: str, unit: str = "", currency: str = "") -> str:
+    """
+    単価が市場価格の範囲内かを、知識ベースの市場価格（数値の価格帯に変換済み）と機械的に照合する。
+    LLM で知識の文章を解釈せずに、価格の妥当性仮説（例: コンサルティング シニア $600/時）を数値で確認できる。
+    Args:
+        category: 品目・サービスのカテゴリ（例: "コンサルティング シニア", "ディスプレイ広告", "エンタープライズサーバー"）
+        unit_price: 単価（例: "¥50,000", "50000", "$300", "¥50,000/記事"。"/単位" を付けると unit を省略できる）
+        unit: 単位（例: "本", "記事", "時間", "CPM"。表記ゆれは吸収する。省略時はカテゴリの単位）
+        currency: 通貨記号のない単価の通貨（"JPY", "USD" など。省略時は JPY）
+    Returns:
+        str: 判定（within / between_tiers / below / above / unit_mismatch / no_market_data）、
+            価格帯からの乖離率（20%以上で exceeds_threshold）、該当した価格帯と出典の知識ID（JSON形式）
+    """
+    _touch()
+    if _MARKET_PRICES is None:
+        return json.dumps({"error": "市場価格インデックスが登録されていません"}, ensure_ascii=False)
+    suffix = _PER_UNIT.search(unit_price)
+    if suffix:
+        unit_price = unit_price[: suffix.start()]
+        unit = unit or suffix.group(1)
+    check = _MARKET_PRICES.check([category], [unit_price], [unit], currency=currency.strip().upper() or "JPY")[0]
+    result = check.to_dict()
+    if check.verdict in ("unit_mismatch", "no_market_data"):
+        result["categories"] = _MARKET_PRICES.categories()
+    return json.dumps(result, ensure_ascii=False, indent=2)
+
+
+@tool
+def derive_unit_prices(transaction_id: str = "", findings_only: bool = False) -> str:
+    """
+    見積書・発注書の明細（品目・数量・単位・単価・金額）と見積・発注シートの行から、
+    取引ごとの単価表を返す。単価は 金額 / 数量 で機械的に計算済みなので、本文から割り算しなくてよい。
+    単価は市場価格の知識とも照合し、数量×単価≠金額、書類間の合計の不一致、市場価格からの逸脱を findings に示す。
+    Args:
+        transaction_id: 取引IDで絞り込む（省略時は全取引）
+        findings_only: True なら指摘のある取引だけを返す
+    Returns:
+        str: 取引ごとの明細（単価・市場価格の判定付き）、書類ごとの合計、指摘（JSON形式）
+    """
+    _touch()
+    items = get_line_items()
+    if not len(items):
+        return json.dumps({"error": "明細を含む見積・発注データが登録されていません"}, ensure_ascii=False)
+    transaction_id = transaction_id.strip().upper()
+    if transaction_id:
+        rows = items.rows_for(transaction_id)
+        if not len(rows):
+            available = ", ".join(sorted(set(items.transaction_id.tolist()) - {""}))
+            return json.dumps(
+                {"error": f"{transaction_id} の明細が見つかりません（明細のある取引: {available}）"},
+                ensure_ascii=False,
+            )
+        items = items.take(rows)
+    table = unit_price_table(items, _MARKET_PRICES, _TRANSACTIONS, paths=_SOURCES)
+    if findings_only:
+        table = [entry for entry in table if entry["findings"]]
+    return json.dumps({
+        "transactions": len(table),
+        "line_items": int(len(items)),
+        "unit_prices": table,
+    }, ensure_ascii=False, indent=2)
 
 
 # ==============================================================================
@@ -178,71 +689,355 @@ def extract_data(source: str, extraction_type: str) -> str:
             "valid_types": valid_types
         }, ensure_ascii=False)
 
-    # If source is a file_id, get the content
-    content = source
-    if source in _SOURCES:
-        chunks = _FILE_CHUNKS.get(source, [])
-        content = "\n".join(chunks) if chunks else source
-
-    result = {"extraction_type": extraction_type, "source_length": len(content)}
-
-    # Pattern-based extraction
-    if extraction_type in ["amounts", "all"]:
-        # Extract monetary amounts
-        amount_patterns = [
-            r'[\$¥€£]\s*[\d,]+(?:\.\d{2})?',
-            r'[\d,]+(?:\.\d{2})?\s*(?:円|ドル|USD|JPY|EUR)',
-            r'(?:金額|合計|単価|総額)[：:]\s*[\d,]+',
-        ]
-        amounts = []
-        for pattern in amount_patterns:
-            amounts.extend(re.findall(pattern, content))
-        result["amounts"] = list(set(amounts))[:20]  # Limit results
-
-    if extraction_type in ["dates", "all"]:
-        # Extract dates
-        date_patterns = [
-            r'\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?',
-            r'\d{1,2}[-/]\d{1,2}[-/]\d{4}',
-            r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{4}',
-        ]
-        dates = []
-        for pattern in date_patterns:
-            dates.extend(re.findall(pattern, content, re.IGNORECASE))
-        result["dates"] = list(set(dates))[:20]
-
-    if extraction_type in ["parties", "all"]:
-        # Extract party names (simplified)
-        party_patterns = [
-            r'(?:株式会社|有限会社|合同会社)[\w]+',
-            r'[\w]+(?:株式会社|有限会社|Inc\.|Corp\.|Ltd\.)',
-            r'(?:発注者|受注者|取引先|顧客|ベンダー)[：:]\s*([^\n]+)',
-        ]
-        parties = []
-        for pattern in party_patterns:
-            matches = re.findall(pattern, content)
-            if isinstance(matches, list) and matches:
-                if isinstance(matches[0], tuple):
-                    parties.extend([m[0] for m in matches if m[0]])
-                else:
-                    parties.extend(matches)
-        result["parties"] = list(set(parties))[:20]
-
-    if extraction_type in ["transaction_details", "all"]:
-        # Extract transaction IDs
-        tx_patterns = [
-            r'(?:取引ID|Transaction ID|TX|PO)[#：:\-]?\s*([A-Z0-9\-]+)',
-            r'(?:注文番号|Order No\.?)[：:\-]?\s*([A-Z0-9\-]+)',
-        ]
-        tx_ids = []
-        for pattern in tx_patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            tx_ids.extend(matches)
-        result["transaction_ids"] = list(set(tx_ids))[:10]
+    kinds = _EXTRACTION_KINDS[extraction_type]
+    if source in _SOURCES and source in _ENTITIES:
+        # 取込時に抽出済みのファイルは転置インデックスを読むだけ
+        result = {"extraction_type": extraction_type, "source_length": _ENTITIES.text_length(source)}
+        values = _ENTITIES.extract(source, kinds)
+    else:
+        # If source is a file_id, get the content (canonical text, overlap is not duplicated)
+        content = source
+        if source in _SOURCES:
+            content = get_file_text(source) or source
+        result = {"extraction_type": extraction_type, "source_length": len(content)}
+        # 全種類のパターンをまとめた 1 本の正規表現で、本文を 1 回だけ走査する
+        values = get_scanner(kinds).extract(content)
+    for kind in kinds:
+        key, limit = _EXTRACTION_RESULTS[kind]
+        result[key] = values[kind][:limit]
+    # 表記ゆれを吸収した値（金額は円の整数、日付は ISO 形式）を同じ並びで付ける
+    if "amounts" in result:
+        result["amounts_yen"] = [None if y != y else int(y) for y in parse_yen(result["amounts"]).tolist()]
+    if "dates" in result:
+        result["dates_iso"] = iso_dates(result["dates"])
 
     return json.dumps(result, ensure_ascii=False, indent=2)
 
 
+@tool
+def find_entities(value: str = "", file_id: str = "", kind: str = "", limit: int = 50) -> str:
+    """
+    取込時に抽出済みのエンティティ（金額・日付・当事者・取引ID）を転置インデックスから引きます。
+
+    - value を指定: その値に言及している文書・チャンク・位置を返す（例: "TX-104" を含む文書）
+      表記ゆれは正規化して照合する（"tx-104" と "TX-104"、"¥5,000,000" と "5,000,000円" など）
+    - file_id だけを指定: そのファイルのエンティティ一覧（正規化値ごとの件数と最初のチャンク）
+    - 両方を指定: そのファイル内での value の出現箇所
+
+    Args:
+        value: 探す値（取引ID、金額、日付、会社名など）
+        file_id: 対象ファイルID（省略時は全ファイル）
+        kind: エンティティ種別で絞り込む（"amount", "date", "party", "transaction_id"）
+        limit: value 指定時に返す出現箇所の最大件数
+
+    Returns:
+        検索結果（JSON形式）。chunk は read_file で本文を確認できるチャンク番号
+    """
+    _touch()
+    if kind and kind not in ENTITY_KINDS:
+        return json.dumps({"error": f"無効な種別: {kind}", "valid_kinds": list(ENTITY_KINDS)}, ensure_ascii=False)
+    if file_id and file_id not in _SOURCES:
+        available = ", ".join(sorted(_SOURCES.keys())) or "(none)"
+        return json.dumps({"error": f"未知のfile_idです: {file_id}. 利用可能: {available}"}, ensure_ascii=False)
+    if not value and not file_id:
+        return json.dumps({"error": "value か file_id のどちらかを指定してください"}, ensure_ascii=False)
+
+    if not value:
+        return json.dumps(
+            {"file_id": file_id, "path": _SOURCES[file_id], "entities": _ENTITIES.summary(file_id, kind)},
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    hits = _ENTITIES.lookup(value, kind, file_id)
+    files: dict[str, int] = {}
+    for hit in hits:
+        files[hit.file_id] = files.get(hit.file_id, 0) + 1
+    return json.dumps(
+        {
+            "value": value,
+            "occurrences": len(hits),
+            "files": [
+                {"file_id": f, "path": _SOURCES.get(f, ""), "count": n} for f, n in sorted(files.items())
+            ],
+            "matches": [hit.to_dict() for hit in hits[: max(limit, 0)]],
+        },
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+# analyze_data の構造化入力で受け付ける列名（英語名・取引テーブルの列名のどちらでもよい）
+_ORDER_FIELDS = {
+    "vendor": ("vendor", "発注先", "取引先"),
+    "date": ("date", "order_date", "発注日"),
+    "amount": ("amount", "金額", "金額（税抜）", "発注金額"),
+    "id": ("id", "order_id", "取引ID", "発注番号"),
+    "approver": ("approver", "発注者", "承認者"),
+}
+# data にこの文字列を渡すと、登録済み取引テーブルの発注データを対象にする
+_TABLE_REFERENCES = ("transactions", "取引テーブル", "発注データ")
+
+
+def _pick(record: dict[str, Any], field: str) -> Any:
+    return next((record[k] for k in _ORDER_FIELDS[field] if k in record), None)
+
+
+def _order_columns(data: str, required: tuple[str, ...] = ("vendor", "date", "amount")) -> dict[str, Any] | str:
+    """
+    analyze_data の data から注文の列（発注先・発注日・金額・ID・発注者）を取り出す。
+    注文の JSON 配列と列ごとの JSON オブジェクトに対応する（登録済み取引テーブルは各呼び出し側で扱う）。
+    required の列がない場合、列の長さが揃わない場合や解釈できない場合はエラーメッセージを返す。
+    """
+    try:
+        parsed = json.loads(data)
+    except json.JSONDecodeError:
+        return "data は注文の JSON 配列、列ごとの JSON オブジェクト、または \"transactions\" を指定してください"
+
+    if isinstance(parsed, dict):
+        columns = {f: next((parsed[k] for k in keys if k in parsed), None) for f, keys in _ORDER_FIELDS.items()}
+    elif isinstance(parsed, list) and all(isinstance(r, dict) for r in parsed):
+        columns = {f: [_pick(r, f) for r in parsed] for f in _ORDER_FIELDS}
+        # JSON 配列では全レコードに無いキーは列ごと無いものとみなす
+        columns = {f: None if all(v is None for v in values) else values for f, values in columns.items()}
+    else:
+        return "注文データの形式を解釈できません"
+    missing = [f for f in required if columns[f] is None]
+    if missing:
+        return f"必要な列がありません: {missing}"
+    if any(values is not None and not isinstance(values, list) for values in columns.values()):
+        return "列ごとの JSON オブジェクトでは各列を配列で指定してください"
+    lengths = {f: len(values) for f, values in columns.items() if values is not None}
+    if len(set(lengths.values())) > 1:
+        return f"列の長さが揃っていません: {lengths}"
+
+    def text(values: Any) -> Any:
+        return None if values is None else ["" if v is None else str(v) for v in values]
+
+    return {
+        "vendor": text(columns["vendor"]),
+        "date": None if columns["date"] is None else parse_dates(columns["date"]),
+        "amount": None if columns["amount"] is None else parse_yen(columns["amount"]),
+        "id": columns["id"],
+        "approver": text(columns["approver"]),
+    }
+
+
+def _split_order_findings(data: str, params: dict[str, Any]) -> dict[str, Any]:
+    try:
+        window_days = params.get("window_days", 30)
+        options = {
+            "min_orders": int(params.get("min_orders", 3)),
+            "window_days": None if window_days is None else int(window_days),
+            "limit": float(params.get("limit", 1_000_000)),
+        }
+        limit_groups = int(params.get("max_groups", 50))
+        if data.strip() in _TABLE_REFERENCES:
+            if _TRANSACTIONS is None:
+                return {"type": "split_orders", "error": "取引テーブルが読み込まれていません"}
+            result = detect_split_orders_in_table(_TRANSACTIONS, **options)
+        else:
+            columns = _order_columns(data)
+            if isinstance(columns, str):
+                return {"type": "split_orders", "error": columns}
+            result = detect_split_orders(
+                columns["vendor"], columns["date"], columns["amount"], columns["id"], **options
+            )
+    except (TypeError, ValueError) as exc:
+        return {"type": "split_orders", "error": str(exc)}
+    return {
+        "type": "split_orders",
+        **result.summary(),
+        "split_groups": [g.to_dict() for g in result.groups[:limit_groups]],
+    }
+
+
+def _period_end_findings(data: str, params: dict[str, Any]) -> dict[str, Any]:
+    try:
+        options = {
+            "window_days": int(params.get("window_days", 3)),
+            "period": params.get("period", "month"),
+            "min_orders": int(params.get("min_orders", 3)),
+            "min_lift": float(params.get("min_lift", 2.0)),
+            "min_z": float(params.get("min_z", 3.0)),
+        }
+        max_groups = int(params.get("max_groups", 20))
+        if data.strip() in _TABLE_REFERENCES:
+            if _TRANSACTIONS is None:
+                return {"type": "period_end_timing", "error": "取引テーブルが読み込まれていません"}
+            result = analyze_period_end_timing_in_table(_TRANSACTIONS, **options)
+        else:
+            columns = _order_columns(data, required=("date",))
+            if isinstance(columns, str):
+                return {"type": "period_end_timing", "error": columns}
+            groupings = {
+                name: columns[name] for name in ("vendor", "approver") if columns[name] is not None
+            }
+            result = analyze_period_end_timing(columns["date"], groupings, **options)
+    except (TypeError, ValueError) as exc:
+        return {"type": "period_end_timing", "error": str(exc)}
+    return {"type": "period_end_timing", **result.to_dict(max_groups)}
+
+
+def _scalars(parsed: Any) -> list[Any]:
+    """JSON の配列・オブジェクトから数値・文字列の値を順に取り出す（入れ子も平坦化する）"""
+    if isinstance(parsed, dict):
+        parsed = list(parsed.values())
+    if not isinstance(parsed, list):
+        return [parsed]
+    values: list[Any] = []
+    for item in parsed:
+        values.extend(_scalars(item) if isinstance(item, (list, dict)) else [item])
+    return values
+
+
+def _numeric_values(data: str, parsed: Any) -> list[float]:
+    """
+    analyze_data の data から金額・数値を取り出す。
+    JSON の値は共通の正規化（"80万円"、"¥1,200（税込）" なども円に換算）で解釈し、
+    文章からは金額表記を抽出する。金額表記が無ければ、日付や取引IDの一部ではない数字を使う。
+    """
+    if isinstance(parsed, (list, dict, int, float)) and not isinstance(parsed, bool):
+        values = [v for v in _scalars(parsed) if isinstance(v, (str, int, float)) and not isinstance(v, bool)]
+        amounts = parse_amounts(values)
+        return amounts.value[amounts.valid].tolist()
+
+    matches = get_scanner(("amount", "date", "transaction_id")).scan(data)
+    amounts = [m.value for m in matches if m.kind == "amount"]
+    if amounts:
+        parsed_amounts = parse_amounts(amounts)
+        return parsed_amounts.value[parsed_amounts.valid].tolist()
+    numbers = []
+    end = 0
+    for m in matches:
+        numbers.extend(re.findall(r"\d[\d,]*(?:\.\d+)?", data[end : m.start]))
+        end = m.end
+    numbers.extend(re.findall(r"\d[\d,]*(?:\.\d+)?", data[end:]))
+    return parse_amounts(numbers).value.tolist()
+
+
+def _anomaly_inputs(data: str, parsed: Any, params: dict[str, Any]) -> tuple[Any, Any, Any] | str:
+    """
+    detect_anomalies の入力を (値, グループ, ラベル) の配列に揃える。
+    数値・金額の JSON 配列、レコードの JSON 配列（field / group_by で列を指定）、
+    {"values", "groups", "labels"} の列ごとの JSON オブジェクト、文章に対応する。
+    """
+    group_by = params.get("group_by")
+    if isinstance(parsed, dict) and "values" in parsed:
+        values = parsed["values"]
+        if not isinstance(values, list):
+            return "values は配列で指定してください"
+        groups, labels = parsed.get("groups"), parsed.get("labels")
+        for name, column in (("groups", groups), ("labels", labels)):
+            if column is not None and (not isinstance(column, list) or len(column) != len(values)):
+                return f"{name} は values と同じ長さの配列で指定してください"
+        return values, groups, labels
+    if isinstance(parsed, list) and parsed and all(isinstance(r, dict) for r in parsed):
+        field = params.get("field")
+        if field is None:
+            field = next((k for k in _ORDER_FIELDS["amount"] if any(k in r for r in parsed)), None)
+        if field is None:
+            return "数値の列が見つかりません（parameters の field で列名を指定してください）"
+        groups = None if group_by is None else [r.get(group_by) for r in parsed]
+        return [r.get(field) for r in parsed], groups, [_pick(r, "id") for r in parsed]
+    return _numeric_values(data, parsed), None, None
+
+
+def _anomaly_findings(data: str, parsed: Any, params: dict[str, Any]) -> dict[str, Any]:
+    try:
+        options = {
+            "method": params.get("method", "mad"),
+            "cutoff": params.get("cutoff"),
+            "min_group": int(params.get("min_group", 5)),
+        }
+        limits = (int(params.get("max_items", 50)), int(params.get("max_groups", 20)))
+        if data.strip() in _TABLE_REFERENCES:
+            if _TRANSACTIONS is None:
+                return {"type": "anomaly_detection", "error": "取引テーブルが読み込まれていません"}
+            result = detect_anomalies_in_table(
+                _TRANSACTIONS,
+                sheet=params.get("sheet", "発注データ"),
+                column=params.get("column", "金額（税抜）"),
+                group_by=params.get("group_by"),
+                **options,
+            )
+        else:
+            inputs = _anomaly_inputs(data, parsed, params)
+            if isinstance(inputs, str):
+                return {"type": "anomaly_detection", "error": inputs}
+            result = detect_anomalies(*inputs, **options)
+    except (KeyError, TypeError, ValueError) as exc:
+        return {"type": "anomaly_detection", "error": str(exc).strip("'\"")}
+    return {"type": "anomaly_detection", **result.to_dict(*limits)}
+
+
+# validate_sequence の JSON 入力で受け付ける手続きの日付の列名
+_STAGE_FIELDS = {
+    "見積日": ("見積日", "quote_date", "quotation_date"),
+    "発注日": ("発注日", "order_date", "po_date"),
+    "納品日": ("納品日", "delivery_date"),
+    "検収日": ("検収日", "acceptance_date"),
+    "請求日": ("請求日", "invoice_date"),
+}
+_ONLY_IDS = re.compile(r"(?:TX-\d+[\s,、]*)+", re.IGNORECASE)
+
+
+def _sequence_findings(data: str, parsed: Any, params: dict[str, Any]) -> dict[str, Any]:
+    """
+    手続きの日付（見積日→発注日→納品日→検収日→請求日）の時系列を組み立てて検証する。
+    "transactions" や取引ID を渡すと、取引テーブルと取込済み文書の日付（転置インデックス）を突き合わせる。
+    """
+    try:
+        max_gap_days = params.get("max_gap_days", 180)
+        options = {"max_gap_days": None if max_gap_days is None else int(max_gap_days)}
+        max_findings = int(params.get("max_findings", 50))
+    except (TypeError, ValueError) as exc:
+        return {"type": "timeline_validation", "error": str(exc)}
+    requested = params.get("transaction_id")
+    text = data.strip()
+    if text in _TABLE_REFERENCES or requested or _ONLY_IDS.fullmatch(text):
+        ids = None
+        if requested or text not in _TABLE_REFERENCES:
+            # 数値だけの取引ID（104）は TX-104 として扱う
+            requested = requested if isinstance(requested, (list, tuple)) else [requested] if requested else []
+            ids = [normalize_transaction_id(str(tx), "TX-") for tx in requested]
+            ids += [tx.upper() for tx in re.findall(r"TX-\d+", text, re.IGNORECASE)]
+        events = document_events(_ENTITIES, document_numbers(_TRANSACTIONS), _SOURCES)
+        if _TRANSACTIONS is None and not events:
+            return {"type": "timeline_validation", "error": "取引テーブルも日付を含む取込済み文書もありません"}
+        timelines = build_timelines(_TRANSACTIONS, events, **options)
+        result = {"type": "timeline_validation", **timelines.to_dict(max_findings, ids)}
+        if _TRANSACTIONS is not None:
+            result["note"] = "取引データの日付どうしの逆転は reconcile_transactions の date_order を参照してください"
+        return result
+
+    records = parsed if isinstance(parsed, list) else [parsed] if isinstance(parsed, dict) else None
+    if records and all(isinstance(r, dict) for r in records):
+        events = []
+        for i, record in enumerate(records):
+            tx = str(_pick(record, "id") or f"#{i}")
+            for stage, name in enumerate(TIMELINE_STAGES):
+                value = next((record[k] for k in _STAGE_FIELDS[name] if k in record), None)
+                if value is not None:
+                    events.append((tx, stage, value, "data"))
+        # 日付の項目が 1 つもない記録は、下の文章としての検証に回す
+        days = iso_dates([day for _, _, day, _ in events]) if events else []
+        events = [(tx, stage, day, source) for (tx, stage, _, source), day in zip(events, days) if day]
+        if events:
+            timelines = build_timelines(None, events, **options)
+            ids = list(dict.fromkeys(tx for tx, *_ in events))
+            return {"type": "timeline_validation", **timelines.to_dict(max_findings, ids)}
+
+    # 文章: 「発注日：2025年10月1日」のようにラベルの付いた日付から時系列を作る
+    dates = [m.value for m in get_scanner(("date",)).scan(data)]
+    result: dict[str, Any] = {"type": "timeline_validation", "dates_found": dates, "iso_dates": iso_dates(dates)}
+    events = [("text", stage, day, "text") for stage, day in text_events(data)]
+    if not events:
+        result["note"] = "見積日・発注日・納品日・検収日・請求日のラベルが付いた日付がないため、順序を検証できません"
+        return result
+    return {**result, **build_timelines(None, events, **options).to_dict(max_findings, ["text"])}
+
+
 @tool
 def analyze_data(data: str, analysis_type: str, parameters: str = "{}") -> str:
     """
@@ -252,17 +1047,42 @@ def analyze_data(data: str, analysis_type: str, parameters: str = "{}") -> str:
         data: 分析対象のデータ（JSON形式または自然言語）
         analysis_type: 分析タイプ
             - "compare_values": 複数の値を比較して差異を検出
-            - "validate_sequence": 一連のイベントの順序や整合性を検証
-            - "detect_anomalies": 異常値や外れ値を検出
+            - "validate_sequence": 見積日→発注日→納品日→検収日→請求日の順序を検証し、逆転・抜け・長い空白・
+              文書と取引データの食い違いを返す（data は "transactions"（全取引）、取引ID（"TX-102"）、
+              日付の JSON（{"id", "見積日", "発注日", ...} または配列）、またはラベル付きの日付を含む文章）。
+              取引データの日付どうしの逆転は reconcile_transactions（date_order）が報告するので、
+              ここでは文書の日付が関わる逆転だけを返す
+            - "detect_anomalies": 異常値や外れ値を頑健な統計量（中央値/MAD・IQR・zスコア）で検出
+              （data は数値・金額の JSON 配列、レコードの JSON 配列、{"values", "groups", "labels"}、
+              登録済み取引テーブルを使う "transactions"、または文章）
             - "calculate_variance": 基準値からの乖離率を計算
-        parameters: 追加パラメータ（JSON形式）
-            - threshold: 異常検出の閾値（デフォルト: 0.2 = 20%）
-            - baseline: 比較基準値
+            - "detect_split_orders": 同一発注先への短期間の連続発注で、合計が承認限度を超えるもの（分割発注）を検出
+              （data は注文の JSON 配列 [{"vendor", "date", "amount", "id"}]、列ごとの JSON オブジェクト、
+              または登録済み取引テーブルを使う "transactions"）
+            - "period_end_timing": 月末・四半期末直前への発注の集中を、発注先別・発注者別に集計
+              （data は detect_split_orders と同じ形式で、date が必須、vendor / approver は任意）
+        parameters: 追加パラメータ（JSON形式）。分析タイプごとに次を受け付ける
+            - compare_values: threshold（差異を有意とする比率、デフォルト: 0.2 = 20%）
+            - calculate_variance: baseline（比較基準値、"80万円" などの表記も可）・
+              threshold（乖離率の閾値、デフォルト: 0.2）
+            - validate_sequence: transaction_id（対象の取引ID）・max_gap_days（手続き間の空白として
+              報告する日数、デフォルト: 180、null で検証しない）・max_findings（返す指摘の件数、デフォルト: 50）
+            - detect_anomalies: method / cutoff（判定方法 "mad" / "iqr" / "zscore" とスコアの閾値、
+              デフォルト: mad / 3.5・1.5・3.0）・group_by / min_group（グループ化する列（発注先など、
+              グループ内で判定）とグループ単独で判定する最小件数、デフォルト: 5、未満は全体と比較）・
+              field / sheet / column（調べる列: レコード配列の列名、取引テーブルのシート名・列名。
+              デフォルト: 金額の列 / 発注データ / 金額（税抜））・max_items / max_groups（デフォルト: 50 / 20）
+            - detect_split_orders: min_orders / window_days / limit（最小件数・期間（日）・承認限度額、
+              デフォルト: 3件 / 30日 / 1,000,000円。window_days=null で期間を問わない連続発注）・
+              max_groups（デフォルト: 50）
+            - period_end_timing: window_days / period / min_orders / min_lift / min_z（期末とみなす日数・
+              期間 "month" / "quarter"・期末発注の最小件数・期待比率に対する倍率・zスコア、
+              デフォルト: 3日 / month / 3件 / 2.0倍 / 3.0）・max_groups（デフォルト: 20）
 
     Returns:
         分析結果（JSON形式）
     """
-    valid_types = ["compare_values", "validate_sequence", "detect_anomalies", "calculate_variance"]
+    valid_types = list(AnalysisType.__args__)
     if analysis_type not in valid_types:
         return json.dumps({
             "error": f"無効な分析タイプ: {analysis_type}",
@@ -277,6 +1097,10 @@ def analyze_data(data: str, analysis_type: str, parameters: str = "{}") -> str:
 
     threshold = params.get("threshold", 0.2)
     baseline = params.get("baseline")
+    if isinstance(baseline, str):
+        # "80万円" などの表記も円に換算する
+        parsed_baseline = parse_yen([baseline])[0]
+        baseline = None if parsed_baseline != parsed_baseline else float(parsed_baseline)
 
     result = {
         "analysis_type": analysis_type,
@@ -284,25 +1108,34 @@ def analyze_data(data: str, analysis_type: str, parameters: str = "{}") -> str:
         "findings": [],
     }
 
+    # Structured analyses work on columns, not on numbers scraped from the text
+    if analysis_type == "detect_split_orders":
+        result["findings"].append(_split_order_findings(data, params))
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    if analysis_type == "period_end_timing":
+        result["findings"].append(_period_end_findings(data, params))
+        return json.dumps(result, ensure_ascii=False, indent=2)
+
     # Try to parse data as JSON
     try:
         parsed_data = json.loads(data)
     except json.JSONDecodeError:
         parsed_data = None
 
-    # Extract numbers from data
-    numbers = re.findall(r'[\d,]+(?:\.\d+)?', data)
-    numeric_values = []
-    for n in numbers:
-        try:
-            numeric_values.append(float(n.replace(',', '')))
-        except ValueError:
-            pass
+    if analysis_type == "detect_anomalies":
+        result["findings"].append(_anomaly_findings(data, parsed_data, params))
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    if analysis_type == "validate_sequence":
+        result["findings"].append(_sequence_findings(data, parsed_data, params))
+        return json.dumps(result, ensure_ascii=False, indent=2)
+
+    # Extract amounts / numbers from data (normalized to yen)
+    numeric_values = np.asarray(_numeric_values(data, parsed_data), dtype=np.float64)
 
     if analysis_type == "compare_values":
         if len(numeric_values) >= 2:
-            max_val = max(numeric_values)
-            min_val = min(numeric_values)
+            max_val = float(numeric_values.max())
+            min_val = float(numeric_values.min())
             if min_val > 0:
                 variance = (max_val - min_val) / min_val
                 result["findings"].append({
@@ -313,55 +1146,21 @@ def analyze_data(data: str, analysis_type: str, parameters: str = "{}") -> str:
                     "significant": variance > threshold,
                 })
 
-    elif analysis_type == "validate_sequence":
-        # Check for date sequence validity
-        date_pattern = r'\d{4}[-/]\d{1,2}[-/]\d{1,2}'
-        dates = re.findall(date_pattern, data)
-        if dates:
-            result["findings"].append({
-                "type": "date_sequence",
-                "dates_found": dates,
-                "count": len(dates),
-                "note": "日付の順序検証が必要です",
-            })
-
-    elif analysis_type == "detect_anomalies":
-        if len(numeric_values) >= 3:
-            avg = sum(numeric_values) / len(numeric_values)
-            anomalies = []
-            for i, val in enumerate(numeric_values):
-                if avg > 0:
-                    deviation = abs(val - avg) / avg
-                    if deviation > threshold:
-                        anomalies.append({
-                            "index": i,
-                            "value": val,
-                            "deviation": round(deviation, 4),
-                        })
-            result["findings"].append({
-                "type": "anomaly_detection",
-                "average": round(avg, 2),
-                "threshold": threshold,
-                "anomalies": anomalies,
-                "anomaly_count": len(anomalies),
-            })
-
     elif analysis_type == "calculate_variance":
-        if baseline is not None and numeric_values:
-            variances = []
-            for val in numeric_values:
-                if baseline > 0:
-                    variance = (val - baseline) / baseline
-                    variances.append({
-                        "value": val,
-                        "baseline": baseline,
-                        "variance": round(variance, 4),
-                        "exceeds_threshold": abs(variance) > threshold,
-                    })
+        if baseline is not None and len(numeric_values):
+            variance = (numeric_values - baseline) / baseline if baseline > 0 else np.array([])
             result["findings"].append({
                 "type": "variance_calculation",
                 "baseline": baseline,
-                "variances": variances,
+                "variances": [
+                    {
+                        "value": value,
+                        "baseline": baseline,
+                        "variance": round(ratio, 4),
+                        "exceeds_threshold": abs(ratio) > threshold,
+                    }
+                    for value, ratio in zip(numeric_values.tolist(), variance.tolist())
+                ],
             })
         else:
             result["findings"].append({
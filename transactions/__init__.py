@@ -0,0 +1,109 @@
+"""
+Transactions Module
+
+This module holds the structured transaction data of the audit evidence:
+- A columnar (NumPy) table per sheet of the order/invoice workbook
+- Lookup of every quote/order/invoice/acceptance row by 取引ID
+- Vectorized filters by vendor, amount range and status
+- A three-way match (quote / order / invoice / acceptance) over all
+  transactions at once, emitting typed findings
+- Audit/compliance rules as NumPy predicates, evaluated in one pass
+- Split-order detection with per-vendor sliding windows over the ledger
+- Period-end timing: distance to month/quarter end and its concentration
+  per vendor and per orderer
+- Per-transaction timelines (見積 → 発注 → 納品/検収 → 請求) from the
+  table and the dates labelled in ingested documents, validated for
+  inversions, missing stages, long intervals and conflicts in one pass
+- Robust anomaly scores (median/MAD, IQR, z-score) over whole columns,
+  overall or per group
+- Line items (品目, 数量, 単位, 単価, 金額) from quotation/order text and
+  sheet rows, with unit prices derived in one pass and checked against
+  market price ranges
+"""
+
+from transactions.anomalies import (
+    ANOMALY_METHODS,
+    Anomaly,
+    AnomalyResult,
+    detect_anomalies,
+    detect_anomalies_in_table,
+)
+from transactions.line_items import (
+    LINE_ITEM_COLUMNS,
+    LineItems,
+    collect_line_items,
+    market_unit_price,
+    unit_price_table,
+)
+from transactions.matching import FindingKind, MatchFinding, reconcile, summarize_findings
+from transactions.rules import Rule, RuleEngine, RuleEvaluation, RuleHit, rule_predicate
+from transactions.split_orders import (
+    SplitOrderGroup,
+    SplitOrderResult,
+    detect_split_orders,
+    detect_split_orders_in_table,
+)
+from transactions.timing import (
+    GroupConcentration,
+    TimingAnalysis,
+    analyze_period_end_timing,
+    analyze_period_end_timing_in_table,
+    days_to_period_end,
+)
+from transactions.timeline import (
+    TIMELINE_STAGES,
+    TimelineFinding,
+    Timelines,
+    build_timelines,
+    document_events,
+    validate_timelines,
+)
+from transactions.table import (
+    TRANSACTION_KEY,
+    TRANSACTION_SHEETS,
+    ColumnTable,
+    TransactionTable,
+    load_transaction_table,
+)
+
+__all__ = [
+    "ANOMALY_METHODS",
+    "LINE_ITEM_COLUMNS",
+    "TRANSACTION_KEY",
+    "TIMELINE_STAGES",
+    "TRANSACTION_SHEETS",
+    "Anomaly",
+    "AnomalyResult",
+    "ColumnTable",
+    "FindingKind",
+    "GroupConcentration",
+    "LineItems",
+    "MatchFinding",
+    "Rule",
+    "RuleEngine",
+    "RuleEvaluation",
+    "RuleHit",
+    "SplitOrderGroup",
+    "SplitOrderResult",
+    "TimelineFinding",
+    "Timelines",
+    "TimingAnalysis",
+    "TransactionTable",
+    "analyze_period_end_timing",
+    "build_timelines",
+    "collect_line_items",
+    "analyze_period_end_timing_in_table",
+    "days_to_period_end",
+    "detect_anomalies",
+    "detect_anomalies_in_table",
+    "detect_split_orders",
+    "detect_split_orders_in_table",
+    "document_events",
+    "load_transaction_table",
+    "market_unit_price",
+    "reconcile",
+    "rule_predicate",
+    "summarize_findings",
+    "unit_price_table",
+    "validate_timelines",
+]
@@ -0,0 +1,246 @@
+"""Robust anomaly scores (median/MAD, IQR, z-score), overall or per group."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from entities.normalize import parse_amounts
+from transactions.table import TransactionTable
+
+# Score cutoff per method when none is given: 3.5 robust z (Iglewicz-Hoaglin),
+# Tukey's 1.5 IQR fences, 3 standard deviations
+ANOMALY_METHODS = {"mad": 3.5, "iqr": 1.5, "zscore": 3.0}
+# Mean absolute deviation -> standard deviation, and standard deviation -> IQR, for a normal distribution
+_MEAN_AD_TO_SD = 1.2533
+_SD_TO_IQR = 1.349
+_MAD_TO_SD = 1.4826
+
+
+@dataclass
+class Anomaly:
+    """One value outside its distribution."""
+
+    index: int  # position in the input
+    label: str
+    group: str
+    value: float
+    score: float  # signed: robust z (mad), IQRs beyond the fence (iqr) or z (zscore)
+    center: float  # median (mad, iqr) or mean (zscore) it was compared with
+    basis: str  # "group" or "overall" (group too small)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "index": self.index,
+            "label": self.label,
+            "group": self.group,
+            "value": _plain(self.value),
+            "score": round(self.score, 2),
+            "center": _plain(self.center),
+            "basis": self.basis,
+        }
+
+
+@dataclass
+class AnomalyResult:
+    """
+    Scores per value (in input order, NaN where a value is missing) and the
+    anomalies sorted by absolute score.
+    """
+
+    scores: np.ndarray
+    flagged: np.ndarray
+    center: np.ndarray
+    anomalies: list[Anomaly]
+    overall: dict[str, Any]
+    groups: list[dict[str, Any]]
+    params: dict[str, Any]
+
+    def to_dict(self, max_items: int = 50, max_groups: int = 20) -> dict[str, Any]:
+        return {
+            "values": int(len(self.scores)),
+            "scored": int((~np.isnan(self.scores)).sum()),
+            "flagged": int(self.flagged.sum()),
+            "overall": self.overall,
+            "parameters": self.params,
+            "anomalies": [a.to_dict() for a in self.anomalies[:max_items]],
+            "groups": self.groups[:max_groups],
+        }
+
+
+def _plain(value: float) -> int | float | None:
+    if value != value:  # NaN
+        return None
+    return int(value) if float(value).is_integer() else round(float(value), 4)
+
+
+def _group_quantiles(codes: np.ndarray, values: np.ndarray, groups: int, qs: tuple[float, ...]) -> np.ndarray:
+    """
+    Linear-interpolated quantiles of ``values`` per group code, shape (groups, len(qs)).
+
+    One ``lexsort`` by (code, value) orders every group at once; each
+    quantile is then two gathers at the group's start + q * (count - 1).
+    """
+    order = np.lexsort((values, codes))
+    ordered = values[order]
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    result = np.full((groups, len(qs)), np.nan)
+    present = counts > 0
+    for j, q in enumerate(qs):
+        position = q * (counts[present] - 1)
+        lo = np.floor(position).astype(np.int64)
+        hi = np.ceil(position).astype(np.int64)
+        low, high = ordered[starts[present] + lo], ordered[starts[present] + hi]
+        result[present, j] = low + (high - low) * (position - lo)
+    return result
+
+
+def _statistics(codes: np.ndarray, values: np.ndarray, groups: int, method: str) -> tuple[np.ndarray, ...]:
+    """Center, spread and quartiles per group for the method (spread 0: all values equal)."""
+    counts = np.bincount(codes, minlength=groups)
+    safe = np.maximum(counts, 1)
+    mean = np.bincount(codes, values, minlength=groups) / safe
+    q1, median, q3 = _group_quantiles(codes, values, groups, (0.25, 0.5, 0.75)).T
+    if method == "zscore":
+        variance = np.bincount(codes, (values - mean[codes]) ** 2, minlength=groups) / safe
+        return mean, np.sqrt(variance), q1, q3
+    # Fallback when over half of a group's values are equal (MAD or IQR of 0)
+    mean_ad = np.bincount(codes, np.abs(values - median[codes]), minlength=groups) / safe * _MEAN_AD_TO_SD
+    if method == "mad":
+        mad = _group_quantiles(codes, np.abs(values - median[codes]), groups, (0.5,))[:, 0]
+        return median, np.where(mad > 0, mad * _MAD_TO_SD, mean_ad), q1, q3
+    iqr = q3 - q1
+    return median, np.where(iqr > 0, iqr, mean_ad * _SD_TO_IQR), q1, q3
+
+
+def _scores(
+    values: np.ndarray, codes: np.ndarray, center: np.ndarray, spread: np.ndarray,
+    q1: np.ndarray, q3: np.ndarray, method: str,
+) -> np.ndarray:
+    c, s = center[codes], spread[codes]
+    if method == "iqr":
+        distance = np.where(values > q3[codes], values - q3[codes], np.where(values < q1[codes], values - q1[codes], 0.0))
+    else:
+        distance = values - c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(s > 0, distance / s, 0.0)
+
+
+def detect_anomalies(
+    values: Any,
+    groups: Any = None,
+    labels: Any = None,
+    *,
+    method: str = "mad",
+    cutoff: float | None = None,
+    min_group: int = 5,
+) -> AnomalyResult:
+    """
+    Score every value against its group's distribution with robust statistics.
+
+    ``mad`` scores the distance from the median in robust standard
+    deviations (1.4826 * MAD), ``iqr`` the distance beyond the quartiles in
+    IQRs (Tukey fences), ``zscore`` the classic (x - mean) / sd. With
+    ``groups``, every group's statistics come from one sort and a few
+    ``bincount`` calls over all values at once; groups with fewer than
+    ``min_group`` values are scored against the overall distribution.
+
+    Args:
+        values: Numbers, or amounts as text ("¥800,000", "80万円"; parsed with
+            the shared normalization), NaN / unparseable values are skipped
+        groups: Optional group key per value (vendor, industry, unit, ...)
+        labels: Optional label per value (transaction ID), reported with the anomalies
+        method: "mad", "iqr" or "zscore"
+        cutoff: Absolute score above which a value is flagged
+            (default 3.5 for mad, 1.5 for iqr, 3.0 for zscore)
+        min_group: Values a group needs to be scored on its own
+
+    Returns:
+        Scores, flags and centers per value, the anomalies, and overall and
+        per-group statistics (groups sorted by anomaly count)
+    """
+    if method not in ANOMALY_METHODS:
+        raise ValueError(f"unknown method: {method} (expected one of {list(ANOMALY_METHODS)})")
+    cutoff = ANOMALY_METHODS[method] if cutoff is None else float(cutoff)
+    values = parse_amounts(values).value
+    n = len(values)
+    keys = np.full(n, "", dtype=np.str_) if groups is None else np.asarray(groups, dtype=np.str_)
+    names = np.arange(n).astype(np.str_) if labels is None else np.asarray(labels, dtype=np.str_)
+    if not (len(keys) == len(names) == n):
+        raise ValueError("values, groups and labels must have the same length")
+    params = {"method": method, "cutoff": cutoff, "min_group": min_group, "grouped": groups is not None}
+
+    scores = np.full(n, np.nan)
+    center = np.full(n, np.nan)
+    rows = np.flatnonzero(~np.isnan(values))
+    if not rows.size:
+        return AnomalyResult(scores, np.zeros(n, dtype=bool), center, [], {"count": 0}, [], params)
+    x = values[rows]
+
+    zeros = np.zeros(len(rows), dtype=np.int64)
+    overall_stats = _statistics(zeros, x, 1, method)
+    row_scores = _scores(x, zeros, *overall_stats, method)
+    row_center = np.full(len(rows), overall_stats[0][0])
+    basis = np.full(len(rows), "overall")
+    group_names, codes, sizes, stats = np.array([""]), zeros, np.array([len(rows)]), overall_stats
+    if groups is not None:
+        group_names, codes = np.unique(keys[rows], return_inverse=True)
+        sizes = np.bincount(codes, minlength=len(group_names))
+        stats = _statistics(codes, x, len(group_names), method)
+        own = sizes[codes] >= min_group
+        row_scores = np.where(own, _scores(x, codes, *stats, method), row_scores)
+        row_center = np.where(own, stats[0][codes], row_center)
+        basis = np.where(own, "group", basis)
+
+    scores[rows] = row_scores
+    center[rows] = row_center
+    flagged = np.abs(np.nan_to_num(scores)) > cutoff
+
+    hits = rows[np.abs(row_scores) > cutoff]
+    hits = hits[np.argsort(-np.abs(scores[hits]), kind="stable")]
+    columns = (names[hits], keys[hits], values[hits], scores[hits], center[hits], basis[np.searchsorted(rows, hits)])
+    anomalies = [Anomaly(i, *fields) for i, *fields in zip(hits.tolist(), *(c.tolist() for c in columns))]
+
+    center0, spread0, q1, q3 = (float(s[0]) for s in overall_stats)
+    overall = {
+        "count": int(len(rows)),
+        "center": _plain(center0),
+        "spread": _plain(spread0),
+        "q1": _plain(q1),
+        "q3": _plain(q3),
+    }
+    group_summary: list[dict[str, Any]] = []
+    if groups is not None:
+        flagged_per_group = np.bincount(codes, np.abs(row_scores) > cutoff, minlength=len(group_names))
+        order = np.lexsort((-sizes, -flagged_per_group))
+        group_summary = [
+            {
+                "group": str(group_names[g]),
+                "count": int(sizes[g]),
+                "flagged": int(flagged_per_group[g]),
+                "center": _plain(float(stats[0][g])),
+                "basis": "group" if sizes[g] >= min_group else "overall",
+            }
+            for g in order.tolist()
+        ]
+    return AnomalyResult(scores, flagged, center, anomalies, overall, group_summary, params)
+
+
+def detect_anomalies_in_table(
+    table: TransactionTable,
+    sheet: str = "発注データ",
+    column: str = "金額（税抜）",
+    group_by: str | None = None,
+    **params: Any,
+) -> AnomalyResult:
+    """
+    Run ``detect_anomalies`` over one column of a sheet, labelled by 取引ID
+    and optionally grouped by another column of the sheet (KeyError if missing).
+    """
+    rows = table.sheet(sheet)
+    groups = None if group_by is None else rows.column(group_by)
+    labels = rows.column(rows.key) if rows.key in rows else None
+    return detect_anomalies(rows.column(column), groups, labels, **params)
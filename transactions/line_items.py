@@ -0,0 +1,428 @@
+"""Line items (品目, 数量, 単位, 単価, 金額) from documents and sheets, with unit prices derived in bulk."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping
+
+import numpy as np
+
+from entities.normalize import normalize_transaction_id, parse_amounts
+from entities.scanner import get_scanner
+from transactions.matching import AlignedTransactions
+from transactions.rules import _order_amounts
+from transactions.table import TRANSACTION_KEY, TransactionTable
+from transactions.timeline import _ID_IN_PATH
+
+if TYPE_CHECKING:
+    from knowledge.market_prices import MarketPriceIndex, PriceLocations
+
+# Names each field goes by in sheet columns and records
+LINE_ITEM_COLUMNS = {
+    "item": ("品目", "品名", "項目", "内容", "摘要", "件名", "item"),
+    "quantity": ("数量", "明細数量", "quantity"),
+    "unit": ("単位", "unit"),
+    "unit_price": ("単価", "単価（税抜）", "unit_price"),
+    "amount": ("金額", "金額（税抜）", "amount"),
+}
+# Workbook sheets holding one line per quotation / purchase order
+_SHEET_DOCUMENTS = (("見積データ", "quotation"), ("発注データ", "purchase_order"))
+# Document titles ("見  積  書") and path keywords naming the document kind
+_TITLE = re.compile(r"(?P<quotation>見\s*積\s*書)|(?P<purchase_order>発\s*注\s*書|注\s*文\s*書)|(?P<invoice>請\s*求\s*書)")
+_PATH_KINDS = (
+    ("quotation", "quotation"), ("見積", "quotation"),
+    ("purchase_order", "purchase_order"), ("発注", "purchase_order"),
+    ("invoice", "invoice"), ("請求", "invoice"),
+)
+# "項目 数量 単位 単価 金額" and the rows under it: "SEO記事作成（3000字） 50 本 ¥100,000 ¥5,000,000"
+_HEADER = re.compile(r"^\s*(?:項目|品目|品名|内容|摘要|明細)\s+数量\s+(?:単位\s+)?単価\s+金額", re.MULTILINE)
+_NUMBER = r"[¥￥$＄]?\s*-?\d[\d,，]*(?:[.．]\d+)?\s*円?"
+_ROW = re.compile(
+    rf"(?P<item>\S.*?)\s+(?P<quantity>\d[\d,，]*(?:[.．]\d+)?)\s*(?P<unit>[^\s\d¥￥$＄,，.．]{{1,4}})?"
+    rf"\s+(?P<unit_price>{_NUMBER})\s+(?P<amount>{_NUMBER})"
+)
+_END = re.compile(r"\s*(?:小計|合計|総計|消費税|税込|値引|備考|【)")
+_SUBJECT = re.compile(r"件名\s*[:：]\s*(\S.*)")
+_FIELDS = ("transaction_id", "document", "source", "subject", "item", "quantity", "unit", "unit_price", "amount")
+
+RawLineItems = dict[str, list[Any]]
+
+
+def _raw() -> RawLineItems:
+    return {name: [] for name in _FIELDS}
+
+
+@dataclass
+class LineItems:
+    """
+    Line items as columns, one row per item, from every document and sheet.
+
+    ``unit_price`` is derived: 金額 / 数量 where both are known, otherwise
+    the stated 単価. ``consistent`` is False where 数量 x 単価 differs from
+    金額 by a yen (or cent) or more. Amounts are in ``currency``.
+    """
+
+    transaction_id: np.ndarray
+    document: np.ndarray  # "quotation", "purchase_order", "invoice" or ""
+    source: np.ndarray  # file id, or the sheet name
+    subject: np.ndarray  # 件名 of the document
+    item: np.ndarray
+    unit: np.ndarray
+    quantity: np.ndarray  # float64, NaN when missing
+    stated_unit_price: np.ndarray
+    amount: np.ndarray
+    unit_price: np.ndarray
+    consistent: np.ndarray
+    currency: np.ndarray  # "JPY" unless the amount or unit price is marked otherwise ("$300")
+
+    def __len__(self) -> int:
+        return len(self.transaction_id)
+
+    def rows_for(self, transaction_id: str) -> np.ndarray:
+        return np.flatnonzero(self.transaction_id == transaction_id)
+
+    def take(self, rows: np.ndarray) -> "LineItems":
+        return LineItems(*(getattr(self, f.name)[rows] for f in fields(self)))
+
+
+def derive_line_items(raw: RawLineItems) -> LineItems:
+    """
+    Parse the numbers of raw line items and derive their unit prices.
+
+    Quantities, unit prices and amounts of all rows (any notation:
+    "¥100,000", "10万円", numbers from sheets) are parsed with one call per
+    column, and the unit price is one division over the whole column.
+    """
+    text = {name: np.array([str(v) for v in raw[name]], dtype=np.str_) for name in _FIELDS[:5] + ("unit",)}
+    quantity = parse_amounts(raw["quantity"]).value
+    stated = parse_amounts(raw["unit_price"])
+    amount = parse_amounts(raw["amount"])
+    currency = np.where(np.isnan(amount.value), stated.currency, amount.currency)
+    stated, amount = stated.value, amount.value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        derived = np.where(quantity > 0, amount / quantity, np.nan)
+        unit_price = np.where(np.isnan(derived), stated, derived)
+        consistent = ~(np.abs(quantity * stated - amount) >= 1)
+    return LineItems(
+        text["transaction_id"], text["document"], text["source"], text["subject"], text["item"], text["unit"],
+        quantity, stated, amount, unit_price, consistent, currency,
+    )
+
+
+def text_line_items(
+    text: str,
+    resolve: Mapping[str, str] | None = None,
+    path: str = "",
+    source: str = "",
+    into: RawLineItems | None = None,
+) -> RawLineItems:
+    """
+    Raw line items of the tables in a document's text.
+
+    Every "項目 数量 単位 単価 金額" header starts a table that runs to its
+    小計/合計 line. A table belongs to the transaction named last before it
+    (a 取引ID, or a document number such as "EST-104" resolved through
+    ``resolve``; otherwise a TX-ID in ``path``), its kind comes from the
+    last document title before it (見積書, 発注書, 請求書) or from the path,
+    and its subject from the last "件名:" line.
+    """
+    raw = into if into is not None else _raw()
+    resolve = resolve or {}
+    headers = list(_HEADER.finditer(text))
+    if not headers:
+        return raw
+    ids = [
+        (m.start, normalize_transaction_id(m.value, text[m.start : m.end]))
+        for m in get_scanner(("transaction_id",)).scan(text)
+    ]
+    in_path = _ID_IN_PATH.search(path or source)
+    path_kind = next((kind for word, kind in _PATH_KINDS if word in (path or source)), "")
+    for n, header in enumerate(headers):
+        before = text[: header.start()]
+        named = [resolve.get(value, value if _ID_IN_PATH.fullmatch(value) else "") for at, value in ids if at < header.start()]
+        named = [tx for tx in named if tx]
+        transaction_id = named[-1] if named else (resolve.get(in_path.group().upper(), in_path.group().upper()) if in_path else "")
+        titles = list(_TITLE.finditer(before))
+        kind = titles[-1].lastgroup if titles else path_kind
+        subjects = _SUBJECT.findall(before)
+        end = headers[n + 1].start() if n + 1 < len(headers) else len(text)
+        for line in text[header.end() : end].splitlines()[1:]:
+            if _END.match(line):
+                break
+            row = _ROW.fullmatch(line.strip())
+            if row is None:
+                continue
+            for name, value in (
+                ("transaction_id", transaction_id), ("document", kind or ""), ("source", source),
+                ("subject", subjects[-1].strip() if subjects else ""), ("item", row["item"]),
+                ("quantity", row["quantity"]), ("unit", row["unit"] or ""),
+                ("unit_price", row["unit_price"]), ("amount", row["amount"]),
+            ):
+                raw[name].append(value)
+    return raw
+
+
+def sheet_line_items(
+    columns: Mapping[str, Any],
+    document: str = "",
+    source: str = "",
+    into: RawLineItems | None = None,
+) -> RawLineItems:
+    """
+    Raw line items of spreadsheet rows: one item per row, with columns
+    found under any name in LINE_ITEM_COLUMNS (the 取引ID column names the
+    transaction; a sheet without 単価 gets unit prices from 金額 / 数量).
+    """
+    raw = into if into is not None else _raw()
+    if not columns:
+        return raw
+    size = len(next(iter(columns.values())))
+
+    def pick(field: str) -> list[Any]:
+        name = next((n for n in LINE_ITEM_COLUMNS.get(field, (field,)) if n in columns), None)
+        return [""] * size if name is None else list(columns[name].tolist() if hasattr(columns[name], "tolist") else columns[name])
+
+    ids = pick(TRANSACTION_KEY) if TRANSACTION_KEY in columns else pick("transaction_id")
+    item = pick("item")
+    raw["transaction_id"] += [str(v) for v in ids]
+    raw["document"] += [document] * size
+    raw["source"] += [source] * size
+    raw["subject"] += [str(v) for v in (pick("件名") if "件名" in columns else item)]
+    raw["item"] += [str(v) for v in item]
+    raw["unit"] += [str(v) for v in pick("unit")]
+    for field in ("quantity", "unit_price", "amount"):
+        raw[field] += pick(field)
+    return raw
+
+
+def record_line_items(records: Iterable[Mapping[str, Any]], document: str = "", source: str = "") -> RawLineItems:
+    """Raw line items of JSON records (keys as for ``sheet_line_items``)."""
+    records = list(records)
+    names = list(dict.fromkeys(name for record in records for name in record))
+    return sheet_line_items({name: [r.get(name, "") for r in records] for name in names}, document, source)
+
+
+def collect_line_items(
+    table: TransactionTable | None = None,
+    documents: Iterable[tuple[str, str, str]] = (),
+) -> LineItems:
+    """
+    Line items of the workbook's quote/order sheets and of documents.
+
+    Args:
+        table: Transaction table; its 見積データ / 発注データ rows become items
+            and its document numbers resolve the documents' transactions
+        documents: (file id, path, text) per document
+
+    Returns:
+        Every item, table rows first, with unit prices derived in one pass
+    """
+    from transactions.timeline import document_numbers
+
+    raw = _raw()
+    if table is not None:
+        for sheet, kind in _SHEET_DOCUMENTS:
+            if sheet in table.sheets:
+                sheet_line_items(table.sheets[sheet].columns, kind, sheet, into=raw)
+    resolve = document_numbers(table)
+    for file_id, path, text in documents:
+        text_line_items(text, resolve, path, file_id, into=raw)
+    return derive_line_items(raw)
+
+
+def _first_located(
+    index: MarketPriceIndex,
+    candidates: Iterable[np.ndarray],
+    prices: np.ndarray,
+    units: np.ndarray,
+    currencies: np.ndarray | None = None,
+) -> tuple[PriceLocations, np.ndarray]:
+    """
+    Locate the prices with the first candidate category that has market
+    ranges (item name, then subject, then industry), and the category used.
+    """
+    if currencies is not None:
+        # Prices in other currencies are located in yen
+        names, codes = np.unique(currencies, return_inverse=True)
+        prices = prices * np.array([index.rates.get(str(c), np.nan) for c in names])[codes.reshape(-1)]
+    chosen = used = None
+    for categories in candidates:
+        found = index.locate(categories.tolist(), prices, units.tolist())
+        if chosen is None:
+            chosen, used = found, categories
+            continue
+        # A category with ranges beats none; one with the wrong unit beats one not in the index
+        better = ((chosen.key < 0) & (found.key >= 0)) | (
+            (chosen.key < 0) & (chosen.reason == "") & (found.reason != "")
+        )
+        chosen = type(found)(*(
+            np.where(better, getattr(found, f.name), getattr(chosen, f.name)) for f in fields(found)
+        ))
+        used = np.where(better, categories, used)
+    return chosen, used
+
+
+def _industries(table: TransactionTable | None, transaction_ids: np.ndarray) -> np.ndarray:
+    industries = np.full(len(transaction_ids), "", dtype=object)
+    if table is not None and "取引一覧" in table.sheets and "発注先業種" in table.sheets["取引一覧"]:
+        summary = table.sheets["取引一覧"]
+        by_id = dict(zip(summary.column(TRANSACTION_KEY).tolist(), summary.column("発注先業種").tolist()))
+        industries = np.array([str(by_id.get(tx, "")) for tx in transaction_ids.tolist()], dtype=object)
+    return industries.astype(np.str_)
+
+
+def market_checks(
+    items: LineItems,
+    index: MarketPriceIndex,
+    table: TransactionTable | None = None,
+) -> tuple[PriceLocations, np.ndarray]:
+    """
+    Every item's derived unit price located in the market price index.
+
+    The category is the item name, else the document's subject, else the
+    vendor's industry (発注先業種) from the table, whichever the index knows.
+    """
+    candidates = [items.item, items.subject, _industries(table, items.transaction_id)]
+    return _first_located(index, candidates, items.unit_price, items.unit, items.currency)
+
+
+def market_unit_price(index: MarketPriceIndex) -> Callable[[AlignedTransactions], np.ndarray]:
+    """
+    AR001's ``market_unit_price`` from the market price index.
+
+    Per transaction, the order's unit price (発注データ 金額 / 明細数量) is
+    located with the 取引名, 件名 or 発注先業種 as category; the reference is
+    the nearest bound of the market range (the unit price itself inside it),
+    in yen, so the rule's deviation is the distance from the range. NaN
+    where the index has no range for the transaction.
+    """
+
+    def reference(aligned: AlignedTransactions) -> np.ndarray:
+        quantity = aligned.column("発注データ", "明細数量")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            unit_price = _order_amounts(aligned) / np.where(quantity > 0, quantity, np.nan)
+        candidates = [
+            aligned.column("取引一覧", "取引名", "U"),
+            aligned.column("発注データ", "件名", "U"),
+            aligned.column("取引一覧", "発注先業種", "U"),
+        ]
+        found, _ = _first_located(index, candidates, unit_price, aligned.column("発注データ", "単位", "U"))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            nearest = np.clip(found.price, found.low, found.high) * found.value / found.price
+        return np.where(found.key >= 0, nearest, np.nan)
+
+    return reference
+
+
+def _plain(value: float) -> int | float | None:
+    if value != value:  # NaN
+        return None
+    return int(value) if float(value).is_integer() else round(float(value), 2)
+
+
+def unit_price_table(
+    items: LineItems,
+    index: MarketPriceIndex | None = None,
+    table: TransactionTable | None = None,
+    *,
+    threshold: float = 0.2,
+    paths: Mapping[str, str] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Per-transaction unit-price table with the arithmetic already done.
+
+    Each transaction lists its items (quantity, unit, stated and derived
+    unit price, amount) from every document and sheet, the total per
+    source, and findings: 数量 x 単価 != 金額 (``arithmetic``), sources
+    whose totals disagree (``totals_differ``), and unit prices outside the
+    market range by ``threshold`` or more (``market_price``).
+
+    Args:
+        items: Line items from ``collect_line_items``
+        index: Market price index (optional)
+        table: Transaction table, for the vendors' industries (optional)
+        threshold: Relative deviation from the market range that is reported
+        paths: File id -> path, to show document sources by file name
+    """
+    paths = paths or {}
+    located = used = None
+    if index is not None and len(items):
+        located, used = market_checks(items, index, table)
+    order = list(dict.fromkeys(items.transaction_id.tolist()))
+    rows_of: dict[str, list[int]] = {}
+    for row, tx in enumerate(items.transaction_id.tolist()):
+        rows_of.setdefault(tx, []).append(row)
+
+    columns = {
+        name: getattr(items, name).tolist()
+        for name in ("document", "source", "subject", "item", "unit", "quantity",
+                     "stated_unit_price", "amount", "unit_price", "consistent", "currency")
+    }
+    result = []
+    for tx in order:
+        entries, findings = [], []
+        totals: dict[tuple[str, str], float] = {}
+        for row in rows_of[tx]:
+            source = columns["source"][row]
+            source = paths[source].rsplit("/", 1)[-1] if source in paths else source
+            entry = {
+                "document": columns["document"][row],
+                "source": source,
+                "item": columns["item"][row],
+                "quantity": _plain(columns["quantity"][row]),
+                "unit": columns["unit"][row],
+                "unit_price": _plain(columns["unit_price"][row]),
+                "stated_unit_price": _plain(columns["stated_unit_price"][row]),
+                "amount": _plain(columns["amount"][row]),
+                "currency": columns["currency"][row],
+            }
+            key = (columns["document"][row], source)
+            totals[key] = totals.get(key, 0.0) + np.nan_to_num(columns["amount"][row])
+            if not columns["consistent"][row]:
+                findings.append({
+                    "kind": "arithmetic",
+                    "description": f"{entry['item']}: {entry['quantity']} x {entry['stated_unit_price']} != {entry['amount']}",
+                    "source": source,
+                })
+            if located is not None and located.key[row] >= 0 and entry["unit_price"] is not None:
+                verdict, deviation = str(located.verdict[row]), float(located.deviation[row])
+                entry["market"] = {
+                    "verdict": verdict,
+                    "deviation": round(deviation, 4),
+                    "low": _plain(float(located.low[row])),
+                    "high": _plain(float(located.high[row])),
+                    "currency": str(located.market_currency[row]),
+                    "category": str(used[row]),
+                }
+                if abs(deviation) >= threshold and verdict in ("above", "below"):
+                    findings.append({
+                        "kind": "market_price",
+                        "description": (
+                            f"{entry['item']} の単価 {entry['unit_price']:,} {entry['currency']}/{entry['unit'] or '単位'} が市場価格"
+                            f" {entry['market']['low']:,}〜{entry['market']['high']:,} {entry['market']['currency']}"
+                            f" より {deviation:+.0%}"
+                        ),
+                        "source": source,
+                    })
+            entries.append(entry)
+        # The same figure in several documents is one finding, listing them all
+        merged: dict[tuple[str, str], dict[str, Any]] = {}
+        for finding in findings:
+            source = finding.pop("source")
+            merged.setdefault((finding["kind"], finding["description"]), {**finding, "sources": []})["sources"].append(source)
+        findings = list(merged.values())
+        if len({round(total) for total in totals.values()}) > 1:
+            findings.append({
+                "kind": "totals_differ",
+                "description": "書類・シートごとの明細合計が一致しない",
+                "totals": [{"document": d, "source": s, "amount": _plain(t)} for (d, s), t in totals.items()],
+            })
+        result.append({
+            "transaction_id": tx,
+            "subject": next((columns["subject"][row] for row in rows_of[tx] if columns["subject"][row]), ""),
+            "line_items": entries,
+            "totals": [{"document": d, "source": s, "amount": _plain(t)} for (d, s), t in totals.items()],
+            "findings": findings,
+        })
+    return result
@@ -0,0 +1,354 @@
+"""Deterministic quote / order / invoice / acceptance reconciliation."""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+import numpy as np
+
+from entities.normalize import parse_dates, parse_yen
+from transactions.table import ColumnTable, TransactionTable, _json_value
+
+AMOUNT_COLUMN = "金額（税抜）"
+
+# Document stages in business order: sheet, amount column (falls back to the
+# 取引一覧 column when the stage has no row), quantity column
+_AMOUNT_STAGES = (
+    ("見積", "見積データ", AMOUNT_COLUMN, "見積金額"),
+    ("発注", "発注データ", AMOUNT_COLUMN, "発注金額"),
+    ("請求", "請求データ", AMOUNT_COLUMN, "請求金額"),
+)
+_QUANTITY_STAGES = (
+    ("見積", "見積データ", "明細数量"),
+    ("発注", "発注データ", "明細数量"),
+    ("検収", "検収データ", "検収数量"),
+)
+# Dates that must not go backwards, in the order events should happen
+_DATE_STAGES = (
+    ("見積データ", "見積日"),
+    ("発注データ", "発注日"),
+    ("検収データ", "納品日"),
+    ("検収データ", "検収日"),
+    ("請求データ", "請求日"),
+)
+_DOCUMENT_SHEETS = ("見積データ", "発注データ", "請求データ", "検収データ")
+_ACCEPTED = "合格"
+
+
+class FindingKind(str, Enum):
+    """Kinds of discrepancy the match engine reports."""
+
+    AMOUNT_MISMATCH = "amount_mismatch"
+    QUANTITY_MISMATCH = "quantity_mismatch"
+    DATE_ORDER = "date_order"
+    QUOTE_EXPIRED = "quote_expired"
+    ACCEPTANCE_NOT_PASSED = "acceptance_not_passed"
+    MISSING_DOCUMENT = "missing_document"
+
+
+@dataclass
+class MatchFinding:
+    """One discrepancy found for one transaction."""
+
+    transaction_id: str
+    kind: FindingKind
+    severity: str  # "high", "medium", "low"
+    description: str
+    values: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "transaction_id": self.transaction_id,
+            "kind": self.kind.value,
+            "severity": self.severity,
+            "description": self.description,
+            "values": self.values,
+        }
+
+
+def _positions(table: ColumnTable, ids: np.ndarray) -> np.ndarray:
+    """Row of each id's first row in ``table`` (-1 where it has none)."""
+    if not len(table) or table.key not in table:
+        return np.full(len(ids), -1, dtype=np.int64)
+    keys = table.column(table.key)
+    sorter = np.argsort(keys, kind="stable")
+    ordered = keys[sorter]
+    at = np.minimum(np.searchsorted(ordered, ids), len(ordered) - 1)
+    return np.where(ordered[at] == ids, sorter[at], -1)
+
+
+def _missing_like(column: np.ndarray) -> Any:
+    if column.dtype.kind == "f":
+        return np.nan
+    if column.dtype.kind == "M":
+        return np.datetime64("NaT")
+    return ""
+
+
+class AlignedTransactions:
+    """Columns of every sheet gathered into one row per transaction."""
+
+    def __init__(self, table: TransactionTable):
+        self.table = table
+        self.ids = np.array(table.transaction_ids(), dtype=np.str_)
+        self._positions = {
+            name: _positions(sheet, self.ids) for name, sheet in table.sheets.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def has_column(self, sheet: str, name: str) -> bool:
+        return sheet in self.table.sheets and name in self.table.sheets[sheet]
+
+    def has_row(self, sheet: str) -> np.ndarray:
+        if sheet not in self._positions:
+            return np.zeros(len(self.ids), dtype=bool)
+        return self._positions[sheet] >= 0
+
+    def column(self, sheet: str, name: str, kind: str = "f") -> np.ndarray:
+        """Column values per transaction (missing sheet, row or column -> NaN/NaT/"")."""
+        blank = {"f": np.nan, "M": np.datetime64("NaT"), "U": ""}[kind]
+        if not self.has_column(sheet, name):
+            dtype = {"f": np.float64, "M": "datetime64[D]", "U": np.str_}[kind]
+            return np.full(len(self.ids), blank, dtype=dtype)
+        column = self.table.sheets[sheet].column(name)
+        if column.dtype.kind == "U" and kind != "U":
+            # Text that the loader did not type (mixed notations) is read with the shared normalization
+            column = parse_yen(column) if kind == "f" else parse_dates(column)
+        pos = self._positions[sheet]
+        taken = column[np.maximum(pos, 0)] if len(column) else np.full(len(pos), blank)
+        return np.where(pos >= 0, taken, _missing_like(column))
+
+
+def _whole(value: float | None) -> int | float | None:
+    if value is None:
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _spread(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Row-wise (max - min) over present values and the number present."""
+    present = ~np.isnan(matrix)
+    count = present.sum(axis=1)
+    filled_hi = np.where(present, matrix, -np.inf).max(axis=1)
+    filled_lo = np.where(present, matrix, np.inf).min(axis=1)
+    return np.where(count >= 2, filled_hi - filled_lo, 0.0), count
+
+
+def _amount_findings(aligned: AlignedTransactions, tolerance: float) -> list[MatchFinding]:
+    stages = []
+    for _, sheet, column, fallback in _AMOUNT_STAGES:
+        detail = aligned.column(sheet, column)
+        stages.append(np.where(np.isnan(detail), aligned.column("取引一覧", fallback), detail))
+    amounts = np.column_stack(stages)
+    spread, count = _spread(amounts)
+    scale = np.where(np.isnan(amounts), 0.0, np.abs(amounts)).max(axis=1)
+    flagged = np.flatnonzero((count >= 2) & (spread > tolerance * scale))
+    labels = [f"{label}金額" for label, *_ in _AMOUNT_STAGES]
+    rows = np.where(np.isnan(amounts[flagged]), None, amounts[flagged].astype(object)).tolist()
+    findings = []
+    for n, row in enumerate(flagged):
+        values = {label: _whole(v) for label, v in zip(labels, rows[n])}
+        values["差額"] = _whole(spread[row])
+        parts = " / ".join(f"{k} ¥{v:,}" for k, v in values.items() if k != "差額" and v is not None)
+        findings.append(MatchFinding(
+            transaction_id=str(aligned.ids[row]),
+            kind=FindingKind.AMOUNT_MISMATCH,
+            severity="high",
+            description=f"見積・発注・請求の金額が一致しない（{parts}、最大差額 ¥{values['差額']:,}）",
+            values=values,
+        ))
+    return findings
+
+
+def _quantity_findings(aligned: AlignedTransactions, tolerance: float) -> list[MatchFinding]:
+    quantities = np.column_stack(
+        [aligned.column(sheet, column) for _, sheet, column in _QUANTITY_STAGES]
+    )
+    spread, count = _spread(quantities)
+    flagged = np.flatnonzero((count >= 2) & (spread > tolerance))
+    labels = [f"{label}数量" for label, *_ in _QUANTITY_STAGES]
+    rows = np.where(np.isnan(quantities[flagged]), None, quantities[flagged].astype(object)).tolist()
+    findings = []
+    for n, row in enumerate(flagged):
+        values = {label: _whole(v) for label, v in zip(labels, rows[n])}
+        parts = " / ".join(f"{k} {v}" for k, v in values.items() if v is not None)
+        findings.append(MatchFinding(
+            transaction_id=str(aligned.ids[row]),
+            kind=FindingKind.QUANTITY_MISMATCH,
+            severity="high",
+            description=f"見積・発注・検収の数量が一致しない（{parts}）",
+            values=values,
+        ))
+    return findings
+
+
+def _date_inversions(
+    dates: np.ndarray, reported: np.ndarray | None = None
+) -> dict[int, tuple[list[str | None], list[dict[str, Any]]]]:
+    """
+    Stage pairs whose dates go backwards, for every row at once.
+
+    ``dates`` has one column per _DATE_STAGES stage. Every ordered pair of
+    stages is compared in one broadcast and only flagged rows are formatted.
+    A pair whose two dates are both marked in ``reported`` is skipped.
+
+    Returns:
+        Flagged row -> (its dates as ISO strings, None where missing; its inversions)
+    """
+    labels = [column for _, column in _DATE_STAGES]
+    pairs = [(i, j) for i in range(len(labels)) for j in range(i + 1, len(labels))]
+    earlier = dates[:, [i for i, _ in pairs]]
+    later = dates[:, [j for _, j in pairs]]
+    # NaT compares false, so missing dates never count as an inversion
+    inverted = later < earlier
+    if reported is not None:
+        inverted &= ~(reported[:, [i for i, _ in pairs]] & reported[:, [j for _, j in pairs]])
+    flagged = np.flatnonzero(inverted.any(axis=1))
+    # Format only the flagged rows, as whole arrays rather than per value
+    text = np.datetime_as_string(dates[flagged]).tolist()
+    gaps = (earlier[flagged] - later[flagged]).astype(np.int64).tolist()
+    found = {}
+    for n, row in enumerate(flagged.tolist()):
+        shown = [None if d == "NaT" else d for d in text[n]]
+        found[row] = (shown, [
+            {
+                "before": labels[pairs[p][0]],
+                "after": labels[pairs[p][1]],
+                "before_date": shown[pairs[p][0]],
+                "after_date": shown[pairs[p][1]],
+                "days": gaps[n][p],
+            }
+            for p in np.flatnonzero(inverted[row]).tolist()
+        ])
+    return found
+
+
+def _date_findings(aligned: AlignedTransactions) -> list[MatchFinding]:
+    dates = np.column_stack(
+        [aligned.column(sheet, column, "M") for sheet, column in _DATE_STAGES]
+    )
+    labels = [column for _, column in _DATE_STAGES]
+    findings = []
+    for row, (shown, inversions) in _date_inversions(dates).items():
+        summary = "、".join(
+            f"{inv['after']}({inv['after_date']})が{inv['before']}({inv['before_date']})より前"
+            for inv in inversions
+        )
+        findings.append(MatchFinding(
+            transaction_id=str(aligned.ids[row]),
+            kind=FindingKind.DATE_ORDER,
+            severity="high",
+            description=f"日付の前後関係が逆転している: {summary}",
+            values={"dates": dict(zip(labels, shown)), "inversions": inversions},
+        ))
+    return findings
+
+
+def _expiry_findings(aligned: AlignedTransactions) -> list[MatchFinding]:
+    valid_until = aligned.column("見積データ", "有効期限", "M")
+    ordered_on = aligned.column("発注データ", "発注日", "M")
+    findings = []
+    for row in np.flatnonzero(ordered_on > valid_until):
+        values = {
+            "有効期限": _json_value(valid_until[row]),
+            "発注日": _json_value(ordered_on[row]),
+        }
+        findings.append(MatchFinding(
+            transaction_id=str(aligned.ids[row]),
+            kind=FindingKind.QUOTE_EXPIRED,
+            severity="medium",
+            description=f"見積の有効期限（{values['有効期限']}）後に発注されている（発注日 {values['発注日']}）",
+            values=values,
+        ))
+    return findings
+
+
+def _acceptance_findings(aligned: AlignedTransactions) -> list[MatchFinding]:
+    result = aligned.column("検収データ", "検収結果", "U")
+    invoiced = aligned.has_row("請求データ")
+    findings = []
+    for row in np.flatnonzero((result != "") & (result != _ACCEPTED) & invoiced):
+        findings.append(MatchFinding(
+            transaction_id=str(aligned.ids[row]),
+            kind=FindingKind.ACCEPTANCE_NOT_PASSED,
+            severity="high",
+            description=f"検収結果が「{result[row]}」のまま請求されている",
+            values={"検収結果": str(result[row])},
+        ))
+    return findings
+
+
+def _missing_findings(aligned: AlignedTransactions) -> list[MatchFinding]:
+    sheets = [sheet for sheet in _DOCUMENT_SHEETS if sheet in aligned.table.sheets]
+    if not sheets:
+        return []
+    present = np.column_stack([aligned.has_row(sheet) for sheet in sheets])
+    findings = []
+    for row in np.flatnonzero(~present.all(axis=1)):
+        missing = [sheet for sheet, ok in zip(sheets, present[row]) if not ok]
+        findings.append(MatchFinding(
+            transaction_id=str(aligned.ids[row]),
+            kind=FindingKind.MISSING_DOCUMENT,
+            severity="medium",
+            description=f"対応する行がない: {'、'.join(missing)}",
+            values={"missing": missing},
+        ))
+    return findings
+
+
+def reconcile(
+    table: TransactionTable,
+    amount_tolerance: float = 0.0,
+    quantity_tolerance: float = 0.0,
+) -> list[MatchFinding]:
+    """
+    Match quote, order, invoice and acceptance rows of every transaction.
+
+    All sheets are first aligned to one row per 取引ID (a sort plus
+    ``searchsorted`` per sheet), then each check is a comparison over whole
+    columns, so the cost is a few array passes regardless of how many
+    transactions there are; only flagged rows are turned into findings.
+
+    Checks:
+        - amounts (税抜) of quote / order / invoice differ
+        - quantities of quote / order / acceptance differ
+        - dates go backwards (見積日 → 発注日 → 納品日 → 検収日 → 請求日)
+        - the order was placed after the quote expired
+        - an invoice exists although acceptance did not pass
+        - a quote, order, invoice or acceptance row is missing
+
+    Args:
+        table: Transaction table to screen
+        amount_tolerance: Allowed amount spread as a ratio of the largest amount
+        quantity_tolerance: Allowed absolute quantity difference
+
+    Returns:
+        Findings ordered by transaction, then by check
+    """
+    aligned = AlignedTransactions(table)
+    findings = (
+        _amount_findings(aligned, amount_tolerance)
+        + _quantity_findings(aligned, quantity_tolerance)
+        + _date_findings(aligned)
+        + _expiry_findings(aligned)
+        + _acceptance_findings(aligned)
+        + _missing_findings(aligned)
+    )
+    order = {tx: i for i, tx in enumerate(aligned.ids.tolist())}
+    findings.sort(key=lambda f: order[f.transaction_id])
+    return findings
+
+
+def summarize_findings(findings: list[MatchFinding]) -> dict[str, Any]:
+    """Counts per kind and the flagged transactions."""
+    return {
+        "findings": len(findings),
+        "by_kind": dict(Counter(f.kind.value for f in findings)),
+        "transactions": sorted({f.transaction_id for f in findings}),
+    }
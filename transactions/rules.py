@@ -0,0 +1,308 @@
+"""Audit and compliance rules as vectorized predicates over the transaction table."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+import numpy as np
+
+from transactions.matching import AlignedTransactions
+from transactions.split_orders import detect_split_orders
+from transactions.table import TransactionTable
+from transactions.timing import days_to_period_end
+
+if TYPE_CHECKING:
+    from knowledge.knowledge_store import KnowledgeEntry
+
+# A predicate gets the aligned table and the rule's parameters and returns the
+# mask of violating transactions plus per-transaction detail columns
+RuleOutcome = tuple[np.ndarray, dict[str, np.ndarray]]
+RulePredicate = Callable[[AlignedTransactions, dict[str, Any]], RuleOutcome]
+
+
+class RuleNotApplicable(Exception):
+    """Raised by a predicate when the table lacks the data the rule needs."""
+
+
+@dataclass
+class Rule:
+    """An executable rule: the prose from the knowledge base plus its predicate."""
+
+    id: str
+    text: str
+    severity: str  # "high", "medium", "low"
+    predicate: RulePredicate
+    params: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RuleHit:
+    """One transaction violating one rule."""
+
+    transaction_id: str
+    rule_id: str
+    severity: str
+    rule: str
+    values: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "transaction_id": self.transaction_id,
+            "rule_id": self.rule_id,
+            "severity": self.severity,
+            "rule": self.rule,
+            "values": self.values,
+        }
+
+
+_PREDICATES: dict[str, tuple[RulePredicate, dict[str, Any]]] = {}
+
+
+def rule_predicate(knowledge_id: str, **defaults: Any) -> Callable[[RulePredicate], RulePredicate]:
+    """Register a predicate (and its default parameters) for a knowledge entry id."""
+
+    def register(predicate: RulePredicate) -> RulePredicate:
+        _PREDICATES[knowledge_id] = (predicate, defaults)
+        return predicate
+
+    return register
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else str(value.astype("datetime64[D]"))
+    if isinstance(value, (np.floating, float)):
+        value = float(value)
+        if np.isnan(value):
+            return None
+        return int(value) if value.is_integer() else round(value, 4)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.str_):
+        return str(value)
+    return value
+
+
+def _order_amounts(aligned: AlignedTransactions) -> np.ndarray:
+    amount = aligned.column("発注データ", "金額（税抜）")
+    return np.where(np.isnan(amount), aligned.column("取引一覧", "発注金額"), amount)
+
+
+def _group_medians(groups: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Median of ``values`` and member count of each element's group (NaN values ignored)."""
+    present = ~np.isnan(values)
+    codes = np.unique(groups, return_inverse=True)[1]
+    medians = np.full(len(values), np.nan)
+    sizes = np.zeros(len(values), dtype=np.int64)
+    if not present.any():
+        return medians, sizes
+    code, value = codes[present], values[present]
+    order = np.lexsort((value, code))
+    code, value = code[order], value[order]
+    starts = np.flatnonzero(np.r_[True, code[1:] != code[:-1]])
+    counts = np.diff(np.r_[starts, len(code)])
+    middle = (value[starts + (counts - 1) // 2] + value[starts + counts // 2]) / 2
+    group_median = np.full(codes.max() + 1, np.nan)
+    group_size = np.zeros(codes.max() + 1, dtype=np.int64)
+    group_median[code[starts]] = middle
+    group_size[code[starts]] = counts
+    return group_median[codes], group_size[codes]
+
+
+@rule_predicate("AR001", threshold=0.2, min_peers=5, market_unit_price=None)
+def price_deviation(aligned: AlignedTransactions, params: dict[str, Any]) -> RuleOutcome:
+    """
+    Order unit price deviates from the market price by ``threshold`` or more.
+
+    The market unit price comes from ``params["market_unit_price"]`` (a
+    function of the aligned table returning one price per transaction, NaN
+    when unknown, such as ``transactions.line_items.market_unit_price``);
+    where it is unknown, the median unit price of transactions in the same
+    industry and unit is used when at least ``min_peers`` exist.
+    """
+    quantity = aligned.column("発注データ", "明細数量")
+    quantity = np.where(quantity > 0, quantity, np.nan)
+    unit_price = _order_amounts(aligned) / quantity
+    groups = np.char.add(
+        np.char.add(aligned.column("取引一覧", "発注先業種", "U"), "|"),
+        aligned.column("発注データ", "単位", "U"),
+    )
+    peer, peers = _group_medians(groups, unit_price)
+    reference = np.where(peers >= params["min_peers"], peer, np.nan)
+    basis = np.full(len(aligned), "peer_median")
+    market = params.get("market_unit_price")
+    if market is not None:
+        market_price = np.asarray(market(aligned), dtype=np.float64)
+        known = ~np.isnan(market_price)
+        reference = np.where(known, market_price, reference)
+        basis = np.where(known, "market", basis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        deviation = (unit_price - reference) / reference
+    mask = np.abs(deviation) >= params["threshold"]
+    return mask, {"単価": unit_price, "基準単価": reference, "乖離率": deviation, "基準": basis}
+
+
+@rule_predicate("AR002", min_orders=3, window_days=30, limit=1_000_000)
+def split_orders(aligned: AlignedTransactions, params: dict[str, Any]) -> RuleOutcome:
+    """
+    ``min_orders`` or more orders to one vendor within ``window_days``, each
+    under ``limit`` but together over it.
+    """
+    vendor = aligned.column("取引一覧", "発注先", "U")
+    day = aligned.column("発注データ", "発注日", "M").astype("datetime64[D]")
+    result = detect_split_orders(
+        vendor,
+        day,
+        _order_amounts(aligned),
+        min_orders=params["min_orders"],
+        window_days=params["window_days"],
+        limit=params["limit"],
+    )
+    return result.flagged, {
+        "発注先": vendor,
+        "発注日": day,
+        "期間内件数": result.window_count,
+        "期間内合計": result.window_total,
+    }
+
+
+@rule_predicate("AR003", days=3, date_column=("発注データ", "発注日"))
+def period_end_timing(aligned: AlignedTransactions, params: dict[str, Any]) -> RuleOutcome:
+    """Order dated within the last ``days`` days of a month (quarter ends included)."""
+    sheet, column = params["date_column"]
+    day = aligned.column(sheet, column, "M").astype("datetime64[D]")
+    remaining = days_to_period_end(day, "month")
+    mask = ~np.isnat(day) & (remaining < params["days"])
+    quarter_end = mask & (days_to_period_end(day, "quarter") < params["days"])
+    return mask, {column: day, "月末まで日数": remaining, "四半期末": quarter_end}
+
+
+_APPROVAL_COLUMNS = ("承認者役職", "承認区分", "承認者")
+_APPROVAL_RANKS = (("役員", 2), ("取締役", 2), ("社長", 2), ("部長", 1))
+
+
+@rule_predicate("CP001", thresholds=((100_000, "部長", 1), (1_000_000, "役員", 2)))
+def approval_threshold(aligned: AlignedTransactions, params: dict[str, Any]) -> RuleOutcome:
+    """Order approved below the level its amount requires."""
+    column = next((c for c in _APPROVAL_COLUMNS if aligned.has_column("発注データ", c)), None)
+    if column is None:
+        raise RuleNotApplicable("発注データに承認者の列がないため承認レベルを確認できない")
+    approver = aligned.column("発注データ", column, "U")
+    rank = np.zeros(len(aligned), dtype=np.int64)
+    for word, level in _APPROVAL_RANKS:
+        rank = np.maximum(rank, np.where(np.char.find(approver, word) >= 0, level, 0))
+    amount = _order_amounts(aligned)
+    required = np.zeros(len(aligned), dtype=np.int64)
+    required_label = np.full(len(aligned), "", dtype=object)
+    for floor, label, level in params["thresholds"]:
+        needs = amount >= floor
+        required = np.where(needs, level, required)
+        required_label = np.where(needs, label, required_label)
+    mask = rank < required
+    return mask, {"発注金額": amount, "必要な承認": required_label.astype(np.str_), column: approver}
+
+
+@dataclass
+class RuleEvaluation:
+    """Result of running every rule over a transaction table."""
+
+    ids: np.ndarray
+    rules: list[Rule]
+    masks: np.ndarray  # (transactions, rules) bool
+    details: list[dict[str, np.ndarray]]
+    skipped: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def flagged(self) -> np.ndarray:
+        """Mask of transactions violating at least one rule."""
+        return self.masks.any(axis=1) if self.masks.size else np.zeros(len(self.ids), dtype=bool)
+
+    def flagged_ids(self) -> list[str]:
+        return self.ids[self.flagged].tolist()
+
+    def hits(self, transaction_id: str = "", rule_id: str = "") -> list[RuleHit]:
+        """Violations in transaction order (optionally for one transaction / rule)."""
+        hits = []
+        rows = np.flatnonzero(self.flagged)
+        if transaction_id:
+            rows = rows[self.ids[rows] == transaction_id]
+        for row in rows:
+            for r in np.flatnonzero(self.masks[row]):
+                rule = self.rules[r]
+                if rule_id and rule.id != rule_id:
+                    continue
+                values = {name: _plain(column[row]) for name, column in self.details[r].items()}
+                hits.append(RuleHit(str(self.ids[row]), rule.id, rule.severity, rule.text, values))
+        return hits
+
+    def summary(self) -> dict[str, Any]:
+        flagged = int(self.flagged.sum())
+        return {
+            "transactions": len(self.ids),
+            "flagged": flagged,
+            "by_rule": {
+                rule.id: int(self.masks[:, i].sum()) for i, rule in enumerate(self.rules)
+            },
+            "skipped": dict(self.skipped),
+        }
+
+
+class RuleEngine:
+    """
+    Evaluates executable audit/compliance rules over a whole transaction table.
+
+    Every rule is a NumPy predicate over the aligned transaction columns
+    (one row per 取引ID, built once per evaluation), so one pass over the
+    table yields a transactions x rules violation matrix; only the flagged
+    transactions need to go on to LLM-based hypothesis generation.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules = list(rules)
+
+    @classmethod
+    def from_knowledge(
+        cls,
+        entries: Iterable["KnowledgeEntry"],
+        params: dict[str, dict[str, Any]] | None = None,
+    ) -> "RuleEngine":
+        """
+        Build rules for the knowledge entries that have a registered predicate.
+
+        Args:
+            entries: Knowledge entries (audit rules, compliance); the entry's
+                prose and ``severity`` metadata are kept on the rule
+            params: Per-rule parameter overrides, by entry id
+        """
+        params = params or {}
+        rules = []
+        for entry in entries:
+            if entry.id not in _PREDICATES:
+                continue
+            predicate, defaults = _PREDICATES[entry.id]
+            rules.append(Rule(
+                id=entry.id,
+                text=entry.content,
+                severity=entry.metadata.get("severity", "medium"),
+                predicate=predicate,
+                params={**defaults, **params.get(entry.id, {})},
+            ))
+        return cls(rules)
+
+    def evaluate(self, table: TransactionTable) -> RuleEvaluation:
+        aligned = AlignedTransactions(table)
+        rules, masks, details, skipped = [], [], [], {}
+        for rule in self.rules:
+            try:
+                mask, detail = rule.predicate(aligned, rule.params)
+            except RuleNotApplicable as exc:
+                skipped[rule.id] = str(exc)
+                continue
+            rules.append(rule)
+            masks.append(np.asarray(mask, dtype=bool))
+            details.append(detail)
+        matrix = np.column_stack(masks) if masks else np.zeros((len(aligned), 0), dtype=bool)
+        return RuleEvaluation(aligned.ids, rules, matrix, details, skipped)
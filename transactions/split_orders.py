@@ -0,0 +1,183 @@
+"""Split-order detection: sliding windows over each vendor's order history."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from transactions.table import TransactionTable
+
+
+@dataclass
+class SplitOrderGroup:
+    """A run of orders to one vendor that together look like one split order."""
+
+    vendor: str
+    first_date: str
+    last_date: str
+    orders: int
+    total: float
+    rows: list[int] = field(default_factory=list)  # indices into the input arrays
+    order_ids: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "vendor": self.vendor,
+            "first_date": self.first_date,
+            "last_date": self.last_date,
+            "orders": self.orders,
+            "total": int(self.total) if float(self.total).is_integer() else self.total,
+            "order_ids": self.order_ids,
+        }
+
+
+@dataclass
+class SplitOrderResult:
+    """
+    Per-order window statistics (in input order) and the flagged groups.
+
+    ``window_count``/``window_total`` describe the window ending at each
+    order: the vendor's qualifying orders in the preceding ``window_days``.
+    """
+
+    flagged: np.ndarray
+    window_count: np.ndarray
+    window_total: np.ndarray
+    groups: list[SplitOrderGroup]
+    params: dict[str, Any]
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "orders": int(len(self.flagged)),
+            "flagged_orders": int(self.flagged.sum()),
+            "groups": len(self.groups),
+            "vendors": len({g.vendor for g in self.groups}),
+            "parameters": self.params,
+        }
+
+
+def detect_split_orders(
+    vendors: Any,
+    dates: Any,
+    amounts: Any,
+    order_ids: Any = None,
+    *,
+    min_orders: int = 3,
+    window_days: int | None = 30,
+    limit: float = 1_000_000,
+    each_below_limit: bool = True,
+) -> SplitOrderResult:
+    """
+    Find runs of orders to one vendor whose sum exceeds an approval limit.
+
+    Orders are sorted once by (vendor, date), with the vendor code and day
+    packed into one int64 key, so a single ``argsort`` orders the ledger and a
+    single ``searchsorted`` finds where each order's window starts without
+    ever crossing into another vendor. Window
+    totals come from one cumulative sum, so the whole ledger is O(n log n)
+    and vectorized; millions of order lines take seconds.
+
+    Args:
+        vendors: Vendor name per order
+        dates: Order date per order (datetime64 or ISO strings)
+        amounts: Order amount per order
+        order_ids: Optional id per order, reported in the groups
+        min_orders: Orders a window needs to count as split
+        window_days: Days a window looks back (None: the vendor's whole history,
+            i.e. any ``min_orders`` consecutive orders)
+        limit: Approval limit the window total has to exceed
+        each_below_limit: Only orders under ``limit`` on their own can be parts
+            of a split order (orders over it were approved as such)
+
+    Returns:
+        Window statistics per order and the flagged groups in (vendor, date) order
+    """
+    vendors = np.asarray(vendors, dtype=np.str_)
+    days = np.asarray(dates, dtype="datetime64[D]")
+    amounts = np.asarray(amounts, dtype=np.float64)
+    n = len(vendors)
+    if not (len(days) == len(amounts) == n):
+        raise ValueError("vendors, dates and amounts must have the same length")
+    ids = None if order_ids is None else np.asarray(order_ids, dtype=np.str_)
+    params = {
+        "min_orders": min_orders,
+        "window_days": window_days,
+        "limit": limit,
+        "each_below_limit": each_below_limit,
+    }
+
+    flagged = np.zeros(n, dtype=bool)
+    window_count = np.zeros(n, dtype=np.int64)
+    window_total = np.full(n, np.nan)
+    usable = ~np.isnat(days) & ~np.isnan(amounts) & (vendors != "")
+    if each_below_limit:
+        usable &= amounts < limit
+    rows = np.flatnonzero(usable)
+    if not rows.size:
+        return SplitOrderResult(flagged, window_count, window_total, [], params)
+
+    names, codes = np.unique(vendors[rows], return_inverse=True)
+    day = days[rows].astype(np.int64)
+    # Vendor code and day packed into one int64 key: one argsort orders by
+    # (vendor, date), and the span keeps windows from reaching another vendor
+    origin = day.min()
+    span = int(day.max() - origin) + (window_days or 0) + 1
+    key = codes.astype(np.int64) * span + (day - origin)
+    order = np.argsort(key, kind="stable")
+    rows, codes, key = rows[order], codes[order], key[order]
+    position = np.arange(len(rows))
+    if window_days is None:
+        start = np.searchsorted(codes, codes, side="left")
+    else:
+        start = np.searchsorted(key, key - window_days, side="left")
+
+    totals = np.r_[0.0, np.cumsum(amounts[rows])]
+    count = position - start + 1
+    total = totals[position + 1] - totals[start]
+    hit = (count >= min_orders) & (total > limit)
+
+    window_count[rows] = count
+    window_total[rows] = total
+    if not hit.any():
+        return SplitOrderResult(flagged, window_count, window_total, [], params)
+
+    # Overlapping violating windows merge into one group; every order inside
+    # a group is flagged, not only the window's last one
+    hit_start, hit_end = start[hit], position[hit]
+    new_group = np.r_[True, hit_start[1:] > hit_end[:-1]]
+    first = hit_start[new_group]
+    last = hit_end[np.r_[np.flatnonzero(new_group)[1:], len(hit_end)] - 1]
+    cover = np.zeros(len(rows) + 1, dtype=np.int64)
+    cover[first] += 1
+    cover[last + 1] -= 1
+    inside = np.cumsum(cover[:-1]) > 0
+    flagged[rows[inside]] = True
+
+    groups = []
+    group_totals = (totals[last + 1] - totals[first]).tolist()
+    for lo, hi, group_total in zip(first.tolist(), last.tolist(), group_totals):
+        span_rows = rows[lo : hi + 1]
+        groups.append(SplitOrderGroup(
+            vendor=str(names[codes[lo]]),
+            first_date=str(days[span_rows[0]]),
+            last_date=str(days[span_rows[-1]]),
+            orders=hi - lo + 1,
+            total=group_total,
+            rows=span_rows.tolist(),
+            order_ids=[] if ids is None else ids[span_rows].tolist(),
+        ))
+    return SplitOrderResult(flagged, window_count, window_total, groups, params)
+
+
+def detect_split_orders_in_table(table: TransactionTable, **params: Any) -> SplitOrderResult:
+    """Run ``detect_split_orders`` over the 発注データ of a transaction table."""
+    orders = table.sheet("発注データ")
+    return detect_split_orders(
+        orders.column("発注先"),
+        orders.column("発注日"),
+        orders.column("金額（税抜）"),
+        orders.column("取引ID"),
+        **params,
+    )
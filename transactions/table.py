@@ -0,0 +1,271 @@
+"""Columnar in-memory table of the structured transaction sheets."""
+
+from __future__ import annotations
+
+import math
+import re
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from entities.normalize import parse_dates, parse_yen
+from utils import cell_text, detect_header, trim_cells
+
+TRANSACTION_KEY = "取引ID"
+
+# Sheets of the order/invoice export that hold one record per transaction
+# (or per document of a transaction), keyed by 取引ID
+TRANSACTION_SHEETS = ("取引一覧", "見積データ", "発注データ", "請求データ", "検収データ")
+SUMMARY_SHEET = "取引一覧"
+
+# A text column is read as amounts when it writes at least one of these
+_AMOUNT_MARKS = re.compile(r"[¥￥円万千]|税[込抜別]")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _to_column(values: list[Any]) -> np.ndarray:
+    """
+    Typed array for one column's cell values.
+
+    Numbers become float64 (NaN when empty), dates datetime64[D] (NaT when
+    empty) and everything else fixed-width unicode ("" when empty). Text
+    cells go through the shared normalization, so a column of "2025/7/1" or
+    "令和7年7月1日" is a date column and one of "¥800,000" or "80万円" an
+    amount column in whole yen.
+    """
+    filled = np.array([v is not None and v != "" for v in values], dtype=bool)
+    present = [v for v in values if v is not None and v != ""]
+    if present and all(_is_number(v) for v in present):
+        return np.array([float(v) if _is_number(v) else np.nan for v in values], dtype=np.float64)
+    if present:
+        dates = parse_dates(present)
+        if not np.isnat(dates).any():
+            column = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+            column[filled] = dates
+            return column
+        if any(isinstance(v, str) and _AMOUNT_MARKS.search(v) for v in present):
+            amounts = parse_yen(present)
+            if not np.isnan(amounts).any():
+                column = np.full(len(values), np.nan)
+                column[filled] = amounts
+                return column
+    return np.array([cell_text(v) for v in values], dtype=np.str_)
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else str(value.astype("datetime64[D]"))
+    if isinstance(value, np.floating):
+        if math.isnan(value):
+            return None
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, np.str_):
+        return str(value) or None
+    return value
+
+
+class ColumnTable:
+    """
+    One sheet stored column by column.
+
+    Each column is a single typed NumPy array, so filters are vectorized
+    comparisons over whole columns; rows are found by key through a dict of
+    row indices (a key may have several rows).
+    """
+
+    def __init__(self, name: str, columns: dict[str, np.ndarray], key: str = TRANSACTION_KEY):
+        """
+        Initialize the table.
+
+        Args:
+            name: Sheet name
+            columns: Column name to array, all of the same length
+            key: Column rows are looked up by
+        """
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"columns of sheet {name} differ in length: {sorted(lengths)}")
+        self.name = name
+        self.columns = columns
+        self.key = key
+        self._rows: dict[str, list[int]] = {}
+        if key in columns:
+            for row, value in enumerate(columns[key].tolist()):
+                self._rows.setdefault(str(value), []).append(row)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    @property
+    def column_names(self) -> list[str]:
+        return list(self.columns)
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self.columns:
+            raise KeyError(f"sheet {self.name} has no column {name!r} (columns: {self.column_names})")
+        return self.columns[name]
+
+    def keys(self) -> list[str]:
+        return list(self._rows)
+
+    def rows_for(self, key: str) -> list[int]:
+        return self._rows.get(key, [])
+
+    def record(self, row: int) -> dict[str, Any]:
+        """One row as a JSON-friendly dict (empty cells become None)."""
+        return {name: _json_value(column[row]) for name, column in self.columns.items()}
+
+    def records(self, rows: Iterable[int]) -> list[dict[str, Any]]:
+        return [self.record(int(row)) for row in rows]
+
+
+def _read_sheet(name: str, rows: Iterable[tuple[Any, ...]], header_scan: int) -> ColumnTable | None:
+    values = [list(row) for row in rows]
+    texts = [(i, trim_cells([cell_text(v) for v in row])) for i, row in enumerate(values)]
+    texts = [(i, cells) for i, cells in texts if cells]
+    header_at = detect_header(texts, header_scan)
+    if header_at is None:
+        return None
+    header_row, header = texts[header_at]
+    positions = [(i, name) for i, name in enumerate(header) if name]
+    if not any(column == TRANSACTION_KEY for _, column in positions):
+        return None
+    key_pos = next(i for i, column in positions if column == TRANSACTION_KEY)
+
+    body = [row for row in values[header_row + 1 :] if key_pos < len(row) and row[key_pos] not in (None, "")]
+    columns = {
+        column: _to_column([row[i] if i < len(row) else None for row in body])
+        for i, column in positions
+    }
+    return ColumnTable(name, columns)
+
+
+class TransactionTable:
+    """
+    The 取引一覧/見積データ/発注データ/請求データ/検収データ sheets as columnar tables.
+
+    Loaded once from the order/invoice workbook; afterwards a transaction is
+    a dict lookup and a vendor/amount/status filter is a handful of NumPy
+    comparisons on the 取引一覧 columns, with no embedding or LLM parsing.
+    """
+
+    def __init__(self, sheets: dict[str, ColumnTable], source: str = ""):
+        """
+        Initialize the table.
+
+        Args:
+            sheets: Sheet name to its columnar table
+            source: Workbook the sheets were loaded from
+        """
+        self.sheets = sheets
+        self.source = source
+
+    @classmethod
+    def from_workbook(
+        cls,
+        path: str | Path,
+        sheets: Iterable[str] = TRANSACTION_SHEETS,
+        header_scan: int = 20,
+    ) -> "TransactionTable":
+        """
+        Load the transaction sheets of a workbook.
+
+        Each sheet's header row is detected as in row-aware chunking (title
+        rows above it are skipped); rows without a 取引ID are dropped.
+        Sheets that are missing or have no 取引ID column are left out.
+        """
+        from openpyxl import load_workbook
+
+        wanted = list(sheets)
+        workbook = load_workbook(str(path), read_only=True, data_only=True)
+        try:
+            loaded = {}
+            for name in wanted:
+                if name not in workbook.sheetnames:
+                    continue
+                table = _read_sheet(name, workbook[name].iter_rows(values_only=True), header_scan)
+                if table is not None:
+                    loaded[name] = table
+        finally:
+            workbook.close()
+        return cls(loaded, source=str(path))
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return any(table.rows_for(transaction_id) for table in self.sheets.values())
+
+    def sheet(self, name: str) -> ColumnTable:
+        if name not in self.sheets:
+            raise KeyError(f"sheet {name!r} is not loaded (sheets: {list(self.sheets)})")
+        return self.sheets[name]
+
+    def transaction_ids(self) -> list[str]:
+        """Every 取引ID, in 取引一覧 order first, then any only found in other sheets."""
+        seen: dict[str, None] = {}
+        for table in self.sheets.values():
+            seen.update(dict.fromkeys(table.keys()))
+        return list(seen)
+
+    def get(self, transaction_id: str) -> dict[str, list[dict[str, Any]]]:
+        """All rows of a transaction, per sheet (sheets without rows are omitted)."""
+        found = {}
+        for name, table in self.sheets.items():
+            rows = table.rows_for(transaction_id)
+            if rows:
+                found[name] = table.records(rows)
+        return found
+
+    def filter(
+        self,
+        vendor: str = "",
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        amount_column: str = "発注金額",
+        status: str = "",
+        sheet: str = SUMMARY_SHEET,
+    ) -> np.ndarray:
+        """
+        Row indices of ``sheet`` matching every given condition.
+
+        Args:
+            vendor: Substring of 発注先
+            min_amount: Inclusive lower bound on ``amount_column``
+            max_amount: Inclusive upper bound on ``amount_column``
+            amount_column: Numeric column the amount bounds apply to
+            status: Exact ステータス value
+            sheet: Sheet to filter
+
+        Returns:
+            Matching row indices in sheet order
+        """
+        table = self.sheet(sheet)
+        mask = np.ones(len(table), dtype=bool)
+        if vendor:
+            mask &= np.char.find(table.column("発注先"), vendor) >= 0
+        if min_amount is not None or max_amount is not None:
+            amounts = table.column(amount_column)
+            if amounts.dtype.kind != "f":
+                raise ValueError(f"column {amount_column!r} of sheet {sheet} is not numeric")
+            # NaN compares false, so rows without an amount never match a bound
+            if min_amount is not None:
+                mask &= amounts >= min_amount
+            if max_amount is not None:
+                mask &= amounts <= max_amount
+        if status:
+            mask &= table.column("ステータス") == status
+        return np.flatnonzero(mask)
+
+    def stats(self) -> dict[str, int]:
+        """Rows per loaded sheet."""
+        return {name: len(table) for name, table in self.sheets.items()}
+
+
+def load_transaction_table(path: str | Path) -> TransactionTable:
+    """Load the transaction sheets of an order/invoice workbook."""
+    return TransactionTable.from_workbook(path)
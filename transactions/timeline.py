@@ -0,0 +1,381 @@
+"""Per-transaction event timelines (見積 → 発注 → 納品/検収 → 請求) and their validation."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterable, Mapping
+
+import numpy as np
+
+from entities.normalize import normalize_transaction_id, parse_dates
+from entities.scanner import get_scanner, label_before
+from transactions.matching import _DATE_STAGES, AlignedTransactions, _date_inversions
+from transactions.table import TRANSACTION_KEY, TransactionTable
+
+if TYPE_CHECKING:
+    from entities.index import EntityIndex
+
+# Events in the order they must happen; 納品日 and 検収日 are the delivery/acceptance step
+TIMELINE_STAGES = tuple(column for _, column in _DATE_STAGES)
+# Labels documents write in front of each stage's date (matched as a suffix: "本件の発注日")
+_STAGE_LABELS = {
+    "見積日": 0, "見積作成日": 0, "見積書発行日": 0,
+    "発注日": 1, "注文日": 1, "発注書発行日": 1,
+    "納品日": 2, "納入日": 2, "納品完了日": 2,
+    "検収日": 3, "検収完了日": 3,
+    "請求日": 4, "請求書発行日": 4,
+}
+# Document-number columns: "見積番号: EST-107" in a quotation resolves to its 取引ID
+_DOCUMENT_NUMBERS = (
+    ("見積データ", "見積番号"),
+    ("発注データ", "発注番号"),
+    ("請求データ", "請求番号"),
+    ("検収データ", "検収番号"),
+)
+_ID_IN_PATH = re.compile(r"TX-\d+", re.IGNORECASE)
+_SEVERITY = {"inversion": "high", "conflict": "medium", "missing_stage": "medium", "long_interval": "low"}
+
+
+def stage_of(label: str) -> int:
+    """Timeline stage a date label names (-1 if none)."""
+    for size in range(min(len(label), 6), 1, -1):
+        stage = _STAGE_LABELS.get(label[-size:])
+        if stage is not None:
+            return stage
+    return -1
+
+
+@dataclass
+class TimelineFinding:
+    """One problem in a transaction's timeline."""
+
+    transaction_id: str
+    kind: str  # "inversion", "missing_stage", "long_interval" or "conflict"
+    severity: str
+    description: str
+    values: dict[str, Any]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "transaction_id": self.transaction_id,
+            "kind": self.kind,
+            "severity": self.severity,
+            "description": self.description,
+            "values": self.values,
+        }
+
+
+@dataclass
+class Timelines:
+    """
+    One row of stage dates per transaction (NaT where a stage has no date),
+    where each date came from ("table" or a file id), and the findings.
+    """
+
+    ids: np.ndarray
+    dates: np.ndarray  # (transactions, len(TIMELINE_STAGES)) datetime64[D]
+    sources: np.ndarray  # same shape, "" where there is no date
+    findings: list[TimelineFinding]
+    params: dict[str, Any]
+
+    def timeline(self, transaction_id: str) -> list[dict[str, Any]]:
+        """The transaction's dated events in stage order."""
+        rows = np.flatnonzero(self.ids == transaction_id)
+        if not rows.size:
+            return []
+        row = rows[0]
+        text = np.datetime_as_string(self.dates[row]).tolist()
+        return [
+            {"stage": stage, "date": date, "source": str(source)}
+            for stage, date, source in zip(TIMELINE_STAGES, text, self.sources[row].tolist())
+            if date != "NaT"
+        ]
+
+    def summary(self, transaction_ids: Iterable[str] | None = None) -> dict[str, Any]:
+        """Counts over all transactions, or over the given ones."""
+        findings = self.findings
+        transactions = int(len(self.ids))
+        if transaction_ids is not None:
+            wanted = set(transaction_ids)
+            findings = [f for f in findings if f.transaction_id in wanted]
+            transactions = len(wanted)
+        by_kind: dict[str, int] = {}
+        for finding in findings:
+            by_kind[finding.kind] = by_kind.get(finding.kind, 0) + 1
+        return {
+            "transactions": transactions,
+            "with_findings": len({f.transaction_id for f in findings}),
+            "by_kind": by_kind,
+            "parameters": self.params,
+        }
+
+    def to_dict(self, max_findings: int = 50, transaction_ids: Iterable[str] | None = None) -> dict[str, Any]:
+        """Summary and findings; with ``transaction_ids``, only theirs plus their timelines."""
+        if transaction_ids is None:
+            result = self.summary()
+            findings = self.findings
+        else:
+            wanted = list(dict.fromkeys(transaction_ids))
+            result = self.summary(wanted)
+            findings = [f for f in self.findings if f.transaction_id in set(wanted)]
+            result["timelines"] = {tx: self.timeline(tx) for tx in wanted}
+        result["findings"] = [f.to_dict() for f in findings[:max_findings]]
+        return result
+
+
+def _text(shown: list[str]) -> list[Any]:
+    return [None if d == "NaT" else d for d in shown]
+
+
+def validate_timelines(
+    ids: Any,
+    dates: Any,
+    sources: Any = None,
+    *,
+    max_gap_days: int | None = 180,
+    reported: Any = None,
+) -> Timelines:
+    """
+    Check every transaction's stage dates at once.
+
+    ``dates`` is a (transactions, stages) matrix in TIMELINE_STAGES order.
+    Inversions come from the three-way match's pairwise check (one
+    broadcast over all stage pairs, NaT never counts), interior stages
+    without a date are found with a forward and a backward running maximum
+    of "has a date", and the interval from each event to the previous dated
+    event comes from a running maximum of column positions. Only flagged
+    rows are formatted.
+
+    Args:
+        ids: 取引ID per row
+        dates: Stage dates per row (datetime64 or ISO strings), NaT when unknown
+        sources: Where each date came from, same shape (optional)
+        max_gap_days: Longest interval between consecutive dated events
+            before it is reported (None: intervals are not checked)
+        reported: Mask of dates whose inversions among themselves are
+            reported elsewhere, same shape (the table's dates, which
+            ``reconcile`` already checks as ``date_order``)
+
+    Returns:
+        The timelines and their findings, grouped by transaction in row order
+    """
+    ids = np.asarray(ids, dtype=np.str_)
+    dates = np.asarray(dates, dtype="datetime64[D]").reshape(len(ids), len(TIMELINE_STAGES))
+    sources = (
+        np.where(np.isnat(dates), "", "table") if sources is None else np.asarray(sources, dtype=np.str_)
+    )
+    stages = len(TIMELINE_STAGES)
+    present = ~np.isnat(dates)
+    inverted_rows = _date_inversions(dates, None if reported is None else np.asarray(reported, dtype=bool))
+
+    seen_before = np.maximum.accumulate(present, axis=1)
+    seen_after = np.maximum.accumulate(present[:, ::-1], axis=1)[:, ::-1]
+    missing = seen_before & seen_after & ~present
+
+    columns = np.where(present, np.arange(stages), -1)
+    previous = np.c_[np.full(len(ids), -1), np.maximum.accumulate(columns, axis=1)[:, :-1]]
+    previous_date = np.take_along_axis(dates, np.maximum(previous, 0), axis=1)
+    interval = np.where(present & (previous >= 0), (dates - previous_date).astype(np.int64), 0)
+    long_gap = (interval > max_gap_days) if max_gap_days is not None else np.zeros_like(present)
+
+    found: dict[int, list[TimelineFinding]] = {}
+    for row, (text, inversions) in inverted_rows.items():
+        summary = "、".join(
+            f"{inv['after']}({inv['after_date']})が{inv['before']}({inv['before_date']})より{inv['days']}日前"
+            for inv in inversions
+        )
+        found.setdefault(row, []).append(_finding(ids[row], "inversion", f"日付の順序が逆転している: {summary}", {
+            "dates": dict(zip(TIMELINE_STAGES, text)),
+            "inversions": inversions,
+        }))
+    # Rows with a missing stage have their dates formatted with one call
+    flagged = np.flatnonzero(missing.any(axis=1))
+    shown = dict(zip(flagged.tolist(), map(_text, np.datetime_as_string(dates[flagged]).tolist())))
+    for row in flagged.tolist():
+        absent = [TIMELINE_STAGES[i] for i in np.flatnonzero(missing[row]).tolist()]
+        found.setdefault(row, []).append(_finding(
+            ids[row], "missing_stage", f"前後の日付はあるが {'・'.join(absent)} がない",
+            {"missing": absent, "dates": dict(zip(TIMELINE_STAGES, shown[row]))},
+        ))
+    for row in np.flatnonzero(long_gap.any(axis=1)).tolist():
+        steps = [
+            {"from": TIMELINE_STAGES[previous[row, j]], "to": TIMELINE_STAGES[j], "days": int(interval[row, j])}
+            for j in np.flatnonzero(long_gap[row]).tolist()
+        ]
+        text = "、".join(f"{s['from']}→{s['to']} {s['days']}日" for s in steps)
+        found.setdefault(row, []).append(_finding(
+            ids[row], "long_interval", f"前の手続きから{max_gap_days}日を超えて間が空いている: {text}", {"intervals": steps},
+        ))
+
+    findings = [f for row in sorted(found) for f in found[row]]
+    return Timelines(ids, dates, sources, findings, {"max_gap_days": max_gap_days})
+
+
+def _finding(transaction_id: Any, kind: str, description: str, values: dict[str, Any]) -> TimelineFinding:
+    return TimelineFinding(str(transaction_id), kind, _SEVERITY[kind], description, values)
+
+
+def table_timelines(table: TransactionTable) -> tuple[np.ndarray, np.ndarray]:
+    """取引ID per transaction and its stage dates from the quote/order/acceptance/invoice sheets."""
+    aligned = AlignedTransactions(table)
+    dates = np.column_stack([aligned.column(sheet, column, "M") for sheet, column in _DATE_STAGES])
+    return aligned.ids, dates.astype("datetime64[D]")
+
+
+def document_numbers(table: TransactionTable | None) -> dict[str, str]:
+    """Normalized document number (and 取引ID) -> 取引ID."""
+    resolve: dict[str, str] = {}
+    if table is None:
+        return resolve
+    for sheet, column in _DOCUMENT_NUMBERS:
+        if sheet in table.sheets and column in table.sheets[sheet]:
+            rows = table.sheets[sheet]
+            for number, tx in zip(rows.column(column).tolist(), rows.column(TRANSACTION_KEY).tolist()):
+                if number:
+                    resolve[normalize_transaction_id(str(number))] = str(tx)
+    for tx in table.transaction_ids():
+        resolve[normalize_transaction_id(tx)] = tx
+    return resolve
+
+
+def document_events(
+    index: EntityIndex,
+    resolve: Mapping[str, str] | None = None,
+    paths: Mapping[str, str] | None = None,
+) -> list[tuple[str, int, str, str]]:
+    """
+    Stage dates written in the indexed documents, as (取引ID, stage, ISO date, file id).
+
+    A labelled date ("発注日: 2025年7月1日") belongs to the transaction
+    named last before it in the file (a 取引ID, or a document number such as
+    "PO-107" resolved through ``resolve``); dates before the first ID take
+    the file's first ID, and files naming none take a TX-ID in their path.
+    """
+    resolve = resolve or {}
+    paths = paths or {}
+    events = []
+    for file_id in index.file_ids():
+        pending: list[tuple[int, str]] = []
+        current = ""
+        for occurrence in index.entities(file_id, ("transaction_id", "date")):
+            if occurrence.kind == "transaction_id":
+                tx = resolve.get(occurrence.normalized)
+                if tx is None and _ID_IN_PATH.fullmatch(occurrence.normalized):
+                    tx = occurrence.normalized
+                if tx:
+                    current = tx
+                    events.extend((tx, stage, day, file_id) for stage, day in pending)
+                    pending = []
+                continue
+            stage = stage_of(occurrence.label)
+            if stage < 0:
+                continue
+            if current:
+                events.append((current, stage, occurrence.normalized, file_id))
+            else:
+                pending.append((stage, occurrence.normalized))
+        if pending:
+            in_path = _ID_IN_PATH.search(paths.get(file_id, file_id))
+            if in_path:
+                tx = in_path.group().upper()
+                events.extend((resolve.get(tx, tx), stage, day, file_id) for stage, day in pending)
+    return events
+
+
+def text_events(text: str) -> list[tuple[int, str]]:
+    """Labelled stage dates in a piece of text, as (stage, ISO date) in text order."""
+    matches = get_scanner(("date",)).scan(text)
+    stages = [stage_of(label_before(text, m.start)) for m in matches]
+    days = np.datetime_as_string(parse_dates([m.value for m in matches])).tolist() if matches else []
+    return [(stage, day) for stage, day in zip(stages, days) if stage >= 0 and day != "NaT"]
+
+
+def build_timelines(
+    table: TransactionTable | None = None,
+    events: Iterable[tuple[str, int, str, str]] = (),
+    **params: Any,
+) -> Timelines:
+    """
+    Merge the table's stage dates with dates found in documents and validate them.
+
+    The table's date wins where both have one; a document date that differs
+    from it (or documents that disagree among themselves) is reported as a
+    ``conflict``. Documents fill stages the table lacks and add transactions
+    it does not have. An inversion between two of the table's own dates is
+    left to ``reconcile``, which reports it as ``date_order``; only
+    inversions involving a document date are reported here.
+
+    Args:
+        table: Transaction table (optional)
+        events: (取引ID, stage, ISO date, source) from ``document_events`` / ``text_events``
+        **params: Passed to ``validate_timelines``
+    """
+    if table is not None:
+        ids, dates = table_timelines(table)
+        ids = ids.tolist()
+    else:
+        ids, dates = [], np.empty((0, len(TIMELINE_STAGES)), dtype="datetime64[D]")
+    events = [e for e in events if e[1] >= 0]
+    positions = {tx: i for i, tx in enumerate(ids)}
+    for tx, *_ in events:
+        positions.setdefault(tx, len(positions))
+    ids = list(positions)
+    stages = len(TIMELINE_STAGES)
+    table_dates = np.full((len(ids), stages), np.datetime64("NaT"), dtype="datetime64[D]")
+    table_dates[: len(dates)] = dates
+    sources = np.where(np.isnat(table_dates), "", "table").astype(object)
+
+    rows = np.array([positions[tx] for tx, *_ in events], dtype=np.int64)
+    columns = np.array([stage for _, stage, *_ in events], dtype=np.int64)
+    days = parse_dates([day for _, _, day, _ in events]).astype(np.int64)
+    files = np.array([source for *_, source in events], dtype=object)
+    keep = days != np.datetime64("NaT").astype(np.int64)
+    rows, columns, days, files = rows[keep], columns[keep], days[keep], files[keep]
+
+    # Earliest and latest document date per (transaction, stage)
+    lowest = np.full((len(ids), stages), np.iinfo(np.int64).max)
+    highest = np.full((len(ids), stages), np.iinfo(np.int64).min)
+    np.minimum.at(lowest, (rows, columns), days)
+    np.maximum.at(highest, (rows, columns), days)
+    in_documents = highest >= lowest
+    # Latest write wins, so write in descending date order to keep the earliest date's file
+    order = np.argsort(-days, kind="stable")
+    document_files = np.full((len(ids), stages), "", dtype=object)
+    document_files[rows[order], columns[order]] = files[order]
+
+    in_table = ~np.isnat(table_dates)
+    document_dates = np.where(in_documents, lowest, 0).astype("datetime64[D]")
+    merged = np.where(in_table, table_dates, np.where(in_documents, document_dates, np.datetime64("NaT")))
+    sources = np.where(in_table, sources, np.where(in_documents, document_files, ""))
+    table_value = table_dates.astype(np.int64)
+    conflict = in_documents & ((in_table & ((lowest != table_value) | (highest != table_value))) | (lowest != highest))
+
+    result = validate_timelines(
+        np.array(ids, dtype=np.str_), merged, sources.astype(np.str_), reported=in_table, **params
+    )
+    if conflict.any():
+        # Events grouped by cell once, so each conflicting cell is a slice
+        cells = rows * stages + columns
+        by_cell = np.argsort(cells, kind="stable")
+        cells = cells[by_cell]
+        cell_files = files[by_cell].tolist()
+        cell_days = np.datetime_as_string(days[by_cell].astype("datetime64[D]")).tolist()
+        extra = []
+        for row in np.flatnonzero(conflict.any(axis=1)).tolist():
+            details = []
+            for j in np.flatnonzero(conflict[row]).tolist():
+                lo, hi = np.searchsorted(cells, [row * stages + j, row * stages + j + 1]).tolist()
+                details.append({
+                    "stage": TIMELINE_STAGES[j],
+                    "table": None if not in_table[row, j] else str(table_dates[row, j]),
+                    "documents": {str(f): d for f, d in zip(cell_files[lo:hi], cell_days[lo:hi])},
+                })
+            text = "、".join(
+                f"{d['stage']}（表 {d['table'] or 'なし'} / 文書 {'・'.join(sorted(set(d['documents'].values())))}）"
+                for d in details
+            )
+            extra.append(_finding(ids[row], "conflict", f"文書と取引データで日付が食い違う: {text}", {"conflicts": details}))
+        order_of = {tx: i for i, tx in enumerate(ids)}
+        result.findings = sorted(result.findings + extra, key=lambda f: order_of[f.transaction_id])
+    return result
@@ -0,0 +1,204 @@
+"""Period-end timing analysis of order dates with datetime64 arithmetic."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+import numpy as np
+
+from transactions.table import TransactionTable
+
+_PERIOD_MONTHS = {"month": 1, "quarter": 3}
+
+
+def _period_bounds(day: np.ndarray, period: str) -> tuple[np.ndarray, np.ndarray]:
+    """First day of each date's month/quarter and first day of the next one."""
+    if period not in _PERIOD_MONTHS:
+        raise ValueError(f"unknown period: {period} (expected one of {sorted(_PERIOD_MONTHS)})")
+    step = _PERIOD_MONTHS[period]
+    # Months since 1970-01, rounded down to the period's first month
+    first = day.astype("datetime64[M]").astype(np.int64) // step * step
+    start = first.astype("datetime64[M]").astype("datetime64[D]")
+    end = (first + step).astype("datetime64[M]").astype("datetime64[D]")
+    return start, end
+
+
+def days_to_period_end(dates: Any, period: str = "month") -> np.ndarray:
+    """
+    Days from each date to the last day of its month or calendar quarter.
+
+    0 means the date is the last day itself; NaT dates give -1.
+    """
+    day = np.asarray(dates, dtype="datetime64[D]")
+    end = _period_bounds(day, period)[1]
+    remaining = (end - day).astype(np.int64) - 1
+    return np.where(np.isnat(day), -1, remaining)
+
+
+@dataclass
+class GroupConcentration:
+    """Period-end share of one vendor's (or approver's) orders."""
+
+    group: str
+    orders: int
+    period_end_orders: int
+    share: float
+    expected_share: float
+    lift: float
+    z_score: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "group": self.group,
+            "orders": self.orders,
+            "period_end_orders": self.period_end_orders,
+            "share": round(self.share, 4),
+            "expected_share": round(self.expected_share, 4),
+            "lift": round(self.lift, 2),
+            "z_score": round(self.z_score, 2),
+        }
+
+
+@dataclass
+class TimingAnalysis:
+    """Period-end flags per order and concentration statistics per grouping."""
+
+    remaining_days: np.ndarray
+    in_window: np.ndarray
+    overall: dict[str, Any]
+    groups: dict[str, list[GroupConcentration]] = field(default_factory=dict)
+    flagged: dict[str, list[GroupConcentration]] = field(default_factory=dict)
+    params: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self, max_groups: int = 20) -> dict[str, Any]:
+        return {
+            "overall": self.overall,
+            "parameters": self.params,
+            "flagged": {
+                name: [g.to_dict() for g in groups[:max_groups]]
+                for name, groups in self.flagged.items()
+            },
+            "top": {
+                name: [g.to_dict() for g in groups[:max_groups]]
+                for name, groups in self.groups.items()
+            },
+        }
+
+
+def _concentration(
+    keys: np.ndarray,
+    valid: np.ndarray,
+    in_window: np.ndarray,
+    expected: np.ndarray,
+) -> list[GroupConcentration]:
+    keys = np.asarray(keys, dtype=np.str_)
+    usable = valid & (keys != "")
+    if not usable.any():
+        return []
+    names, codes = np.unique(keys[usable], return_inverse=True)
+    size = len(names)
+    orders = np.bincount(codes, minlength=size)
+    hits = np.bincount(codes, weights=in_window[usable].astype(np.float64), minlength=size)
+    p = expected[usable]
+    mean = np.bincount(codes, weights=p, minlength=size)
+    variance = np.bincount(codes, weights=p * (1 - p), minlength=size)
+    share = hits / orders
+    expected_share = mean / orders
+    lift = np.divide(share, expected_share, out=np.zeros(size), where=expected_share > 0)
+    # Binomial z-score of the period-end count against the calendar expectation
+    z = np.divide(hits - mean, np.sqrt(variance), out=np.zeros(size), where=variance > 0)
+    order = np.lexsort((-orders, -z))
+    return [
+        GroupConcentration(
+            group=str(names[i]),
+            orders=int(orders[i]),
+            period_end_orders=int(hits[i]),
+            share=float(share[i]),
+            expected_share=float(expected_share[i]),
+            lift=float(lift[i]),
+            z_score=float(z[i]),
+        )
+        for i in order.tolist()
+    ]
+
+
+def analyze_period_end_timing(
+    dates: Any,
+    groupings: Mapping[str, Any] | None = None,
+    *,
+    window_days: int = 3,
+    period: str = "month",
+    min_orders: int = 3,
+    min_lift: float = 2.0,
+    min_z: float = 3.0,
+) -> TimingAnalysis:
+    """
+    Measure how strongly orders bunch up just before period ends.
+
+    Every date's distance to its month/quarter end is one datetime64 array
+    operation. An order is "period-end" when it falls in the last
+    ``window_days`` days; its calendar probability of doing so is
+    ``window_days / days in the period``, so each group's period-end count is
+    compared with the sum of those probabilities (share, lift and a binomial
+    z-score), with all groups aggregated at once by ``np.bincount``.
+
+    Args:
+        dates: Order dates (datetime64 or ISO strings)
+        groupings: Named key arrays to aggregate by, e.g. {"vendor": ..., "approver": ...}
+        window_days: Days before the period end that count as period-end
+        period: "month" or "quarter"
+        min_orders: Period-end orders a group needs to be flagged
+        min_lift: Share / expected share a group needs to be flagged
+        min_z: z-score a group needs to be flagged, so that large groups are
+            not flagged for ordinary fluctuation
+
+    Returns:
+        Per-order flags, overall and per-group statistics; groups are sorted
+        by z-score and ``flagged`` keeps those meeting all thresholds
+    """
+    day = np.asarray(dates, dtype="datetime64[D]")
+    valid = ~np.isnat(day)
+    start, end = _period_bounds(day, period)
+    remaining = np.where(valid, (end - day).astype(np.int64) - 1, -1)
+    in_window = valid & (remaining >= 0) & (remaining < window_days)
+    length = np.where(valid, (end - start).astype(np.int64), 1)
+    expected = np.where(valid, np.minimum(window_days / length, 1.0), 0.0)
+
+    n = int(valid.sum())
+    hits = int(in_window.sum())
+    expected_share = float(expected[valid].mean()) if n else 0.0
+    overall = {
+        "orders": n,
+        "period_end_orders": hits,
+        "share": round(hits / n, 4) if n else 0.0,
+        "expected_share": round(expected_share, 4),
+        "lift": round(hits / n / expected_share, 2) if n and expected_share else 0.0,
+    }
+
+    groups: dict[str, list[GroupConcentration]] = {}
+    flagged: dict[str, list[GroupConcentration]] = {}
+    for name, keys in (groupings or {}).items():
+        stats = _concentration(keys, valid, in_window, expected)
+        groups[name] = stats
+        flagged[name] = [
+            g for g in stats
+            if g.period_end_orders >= min_orders and g.lift >= min_lift and g.z_score >= min_z
+        ]
+    params = {
+        "window_days": window_days,
+        "period": period,
+        "min_orders": min_orders,
+        "min_lift": min_lift,
+        "min_z": min_z,
+    }
+    return TimingAnalysis(remaining, in_window, overall, groups, flagged, params)
+
+
+def analyze_period_end_timing_in_table(table: TransactionTable, **params: Any) -> TimingAnalysis:
+    """Run ``analyze_period_end_timing`` over the 発注データ, by vendor and by orderer."""
+    orders = table.sheet("発注データ")
+    groupings = {"vendor": orders.column("発注先")}
+    if "発注者" in orders:
+        groupings["approver"] = orders.column("発注者")
+    return analyze_period_end_timing(orders.column("発注日"), groupings, **params)
@@ -1,27 +1,259 @@
 from pathlib import Path
 
+import codecs
+import datetime as dt
 import json
-from typing import Any
+import math
+from typing import Any, Callable, Iterator
 
+import numpy as np
 
-def _chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> list[str]:
+
+class _TextReader:
+    """
+    read(n) を持つ source から必要な分だけ逐次読み込むテキストバッファ（_iter_chunks / _iter_cdc_chunks 共通）。
+
+    bytes を返す source は encoding で逐次デコードし、読んだテキストは sink にもそのまま渡す。
+    保持するのは元テキストの [start, end) だけで、不要になった前方は discard_before で捨てる。
+    """
+
+    def __init__(
+        self, source: Any, encoding: str, read_size: int, sink: Callable[[str], Any] | None
+    ) -> None:
+        self._source = source
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._read_size = read_size
+        self._sink = sink
+        self._buf = ""
+        self.start = 0
+        self.eof = False
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self._buf)
+
+    def fill(self, upto: int) -> None:
+        """元テキストの upto 文字目まで（EOF ならそこまで）読み込む。"""
+        parts = [self._buf]
+        have = self.end
+        while not self.eof and have < upto:
+            block = self._source.read(self._read_size)
+            if isinstance(block, (bytes, bytearray, memoryview)):
+                text = self._decoder.decode(bytes(block), final=not block)
+            else:
+                text = block
+            if not block:
+                self.eof = True
+            if self._sink is not None and text:
+                self._sink(text)
+            parts.append(text)
+            have += len(text)
+        self._buf = "".join(parts)
+
+    def text(self, start: int, end: int) -> str:
+        """元テキストの [start, end)（バッファに残っている範囲）。"""
+        return self._buf[start - self.start : end - self.start]
+
+    def discard_before(self, position: int) -> None:
+        self._buf = self._buf[position - self.start :]
+        self.start = position
+
+
+def _iter_chunks(
+    source: Any,
+    chunk_size: int,
+    chunk_overlap: int,
+    *,
+    encoding: str = "utf-8",
+    read_size: int = 1 << 16,
+    sink: Callable[[str], Any] | None = None,
+) -> Iterator[tuple[int, int, int, str]]:
+    """
+    chunk_size 文字ごと（前のチャンクと chunk_overlap 文字重ねる）に、ファイルオブジェクト / mmap から逐次チャンクを切り出す。
+
+    source は read(n) を持つもの（テキストモードのファイル、バイナリファイル、mmap）。
+    bytes を返す場合は encoding で逐次デコードする。保持するのは現在のウィンドウ分だけなので、
+    巨大なファイルでも全文をメモリに載せない。
+    sink を渡すと、デコード済みテキストを読み込んだ順にそのまま渡す（正本テキストの保存用）。
+
+    Yields:
+        (chunk_index, start_offset, end_offset, text)
+        offset は元テキスト上の文字位置で、text == 全文[start_offset:end_offset]（strip 済み）
+    """
     if chunk_size <= 0:
         raise ValueError("chunk_size must be > 0")
     if chunk_overlap < 0 or chunk_overlap >= chunk_size:
         raise ValueError("chunk_overlap must be >= 0 and < chunk_size")
 
-    chunks: list[str] = []
+    reader = _TextReader(source, encoding, read_size, sink)
+
+    index = 0
     start = 0
-    n = len(text)
-    while start < n:
-        end = min(start + chunk_size, n)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        if end == n:
+    while True:
+        # 1 文字先まで読んでおくと、end が末尾かどうか（EOF）を確定できる
+        reader.fill(start + chunk_size + 1)
+        n_known = reader.end
+        if start >= n_known:
+            break
+        end = min(start + chunk_size, n_known)
+        window = reader.text(start, end)
+        text = window.strip()
+        if text:
+            lead = len(window) - len(window.lstrip())
+            yield index, start + lead, start + lead + len(text), text
+            index += 1
+        if reader.eof and end == n_known:
             break
         start = end - chunk_overlap
-    return chunks
+        # 次のウィンドウより前は不要なので捨てる
+        reader.discard_before(start)
+
+
+# 内容定義チャンキング（CDC）で区切りの候補にする文末文字
+_SENTENCE_ENDS = ("。", "\n")
+_HASH_BASE = np.uint64(0x100000001B3)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _rolling_hashes(text: str, window: int) -> np.ndarray:
+    """
+    text の各位置で終わる window 文字の多項式ハッシュ（mod 2^64）を NumPy でまとめて計算する。
+
+    返り値の i 番目は text[i : i + window] のハッシュ（長さ len(text) - window + 1）。
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype="<u4").astype(np.uint64)
+    n = codes.shape[0]
+    if n < window:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.zeros(n - window + 1, dtype=np.uint64)
+    for k in range(window):
+        hashes = hashes * _HASH_BASE + codes[k : n - window + 1 + k]
+    hashes *= _HASH_MIX
+    return hashes
+
+
+def _cdc_boundaries(text: str, window: int, boundary_bits: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    text 内の文末位置と、そのうち区切りに採用する位置（その文字の直後で切る）を返す。
+
+    各位置の直前 window 文字のローリングハッシュ（mod 2^64 の多項式ハッシュ）を
+    NumPy でまとめて計算し、上位 boundary_bits ビットが 0 の文末を区切りとする。
+    判定はその位置の周辺の文字だけで決まるので、編集箇所より後ろの区切りは動かない。
+    """
+    hashes = _rolling_hashes(text, window)
+    if not hashes.shape[0]:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    tail = text[window - 1 :]
+    ends = np.zeros(len(tail), dtype=bool)
+    codes = np.frombuffer(tail.encode("utf-32-le"), dtype="<u4")
+    for char in _SENTENCE_ENDS:
+        ends |= codes == ord(char)
+
+    if boundary_bits > 0:
+        hit = ends & ((hashes >> np.uint64(64 - boundary_bits)) == 0)
+    else:
+        hit = ends
+
+    return np.flatnonzero(ends) + window - 1, np.flatnonzero(hit) + window - 1
+
+
+def _iter_cdc_chunks(
+    source: Any,
+    min_size: int = 200,
+    max_size: int = 1800,
+    *,
+    boundary_bits: int = 5,
+    window: int = 16,
+    encoding: str = "utf-8",
+    read_size: int = 1 << 16,
+    sink: Callable[[str], Any] | None = None,
+) -> Iterator[tuple[int, int, int, str]]:
+    """
+    内容定義チャンキング: 区切りを文字位置ではなく本文の内容から決めて逐次チャンクを切り出す。
+
+    固定幅の _iter_chunks では先頭に 1 行足すだけで以降の区切りがすべてずれ、
+    ファイル全体の埋め込みキャッシュが無効になる。ここでは「。」/改行のうち、
+    直前 window 文字のローリングハッシュが条件を満たす位置だけを区切りにするので、
+    小さな編集で変わるのは編集箇所を含む 1〜2 チャンクだけになる。
+
+    - 前の区切りから min_size 文字未満の候補は使わない
+    - max_size 文字以内に候補がなければ、最後の文末（それもなければ max_size）で切る
+    - boundary_bits が大きいほど候補が減り、チャンクは長くなる（平均は文長 × 2^bits 程度）
+    - チャンク同士のオーバーラップはない（区切りが文末に揃うため）
+
+    source / encoding / read_size / sink の扱いと Yields の形式は _iter_chunks と同じ。
+    """
+    if min_size < window or max_size < min_size:
+        raise ValueError("sizes must satisfy window <= min_size <= max_size")
+
+    reader = _TextReader(source, encoding, read_size, sink)
+
+    index = 0
+    start = 0
+    while True:
+        reader.fill(start + max_size + 1)
+        n_known = reader.end
+        if start >= n_known:
+            break
+        limit = min(start + max_size, n_known)
+        span = reader.text(start, limit)
+        ends, cuts = _cdc_boundaries(span, window, boundary_bits)
+        cuts = cuts[cuts >= min_size - 1]
+        if cuts.size:
+            end = start + int(cuts[0]) + 1
+        elif reader.eof and limit == n_known:
+            end = limit
+        else:
+            ends = ends[ends >= min_size - 1]
+            end = start + (int(ends[-1]) + 1 if ends.size else len(span))
+
+        window_text = reader.text(start, end)
+        text = window_text.strip()
+        if text:
+            lead = len(window_text) - len(window_text.lstrip())
+            yield index, start + lead, start + lead + len(text), text
+            index += 1
+        if reader.eof and end == n_known:
+            break
+        start = end
+        reader.discard_before(start)
+
+
+def cell_text(value: Any) -> str:
+    """表計算のセル値を 1 行のテキストにする（取込のチャンク化と取引テーブルの読み込みで共通）。"""
+    if value is None:
+        return ""
+    if isinstance(value, dt.datetime):
+        if value.time() == dt.time(0):
+            return value.date().isoformat()
+        return value.isoformat(sep=" ")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return " ".join(str(value).split())
+
+
+def trim_cells(cells: list[str]) -> list[str]:
+    """行末の空セルを取り除く（cells をその場で変更して返す）。"""
+    while cells and not cells[-1]:
+        cells.pop()
+    return cells
+
+
+def detect_header(rows: list[tuple[int, list[str]]], scan: int) -> int | None:
+    """
+    先頭 scan 行のうちヘッダー行の位置（rows 上の添字）を返す。
+
+    表の上のタイトル行・注記行はたいてい 1 セルしか埋まらないので、
+    表の幅の大半を埋める最初の行をヘッダーとみなす。
+    """
+    head = rows[:scan]
+    widths = [sum(1 for cell in cells if cell) for _, cells in head]
+    if not widths or max(widths) < 2:
+        return None
+    needed = max(2, math.ceil(max(widths) * 0.6))
+    return next(i for i, width in enumerate(widths) if width >= needed)
 
 
 def _make_file_id(path: Path, used: set[str]) -> str: